@@ -1,15 +1,31 @@
 #####!/usr/bin/env python3
 import sys
 import os
+import time
 import linuxcnc
-import random  # For simulation dummy values
 
 from PyQt5 import QtCore, QtWidgets, QtGui
 from qtvcp.lib.keybindings import Keylookup
 from qtvcp.core import Status, Action, Info, Qhal
 from qtvcp import logger
 import hal
-from qtvcp.lib.qt_vismach.qt_vismach import *
+from qtvcp.widgets.gcode_analyzer import analyze_file, analyze_program, cached_analysis, store_analysis, load_analysis
+from qtvcp.widgets.parameter_file import ParameterFile, zero_point
+from qtvcp.widgets.analysis_cache import shared_cache, DEFAULT_BUDGET, DIRECTORY_NAME
+from qtvcp.widgets.stage_graph import StageGraph
+from qtvcp.widgets.analysis_worker import AnalysisRunner, THREAD
+from qtvcp.widgets.program_prefetch import ProgramPrefetcher
+from qtvcp.widgets.toolpath_view import ToolpathPlot
+from qtvcp.widgets.cycle_time import (MachineLimits, estimate_cycle_time, format_duration, load_cycle_time,
+                                      store_cycle_time)
+from qtvcp.widgets.program_eta import LineTimeIndex, EtaTracker
+from qtvcp.widgets.status_service import StatusService, cycle_time
+from qtvcp.widgets.dro_pipeline import DroPipeline
+from qtvcp.widgets.page_registry import PageRegistry
+from qtvcp.widgets.lazy_view import LazyView
+from qtvcp.widgets.mesh_batch import MeshBatch, translation, rotation
+from qtvcp.widgets.pose_buffer import PoseBuffer
+from qtvcp.widgets.toolpath_playback import PlaybackTimeline, ToolpathPlayback
 
 LOG = logger.getLogger(__name__)
 
@@ -22,6 +38,13 @@ QHAL = Qhal()
 
 
 class HandlerClass:
+    # Stages each CAM Wizard step (0-indexed) needs before it is shown
+    CAM_STEP_STAGES = {1: ('tools',), 2: ('zero',), 3: ('simulation',), 4: ('simulation', 'estimate', 'playback')}
+    # Key of the saved lathe model batches; change it when the model changes
+    MODEL_VERSION = 'lathe-1'
+    # Status service fields the DROs are computed from
+    DRO_FIELDS = ('actual_position', 'g5x_offset', 'g92_offset', 'tool_offset', 'spindle')
+
     def __init__(self, halcomp, widgets, paths):
         self.hal = halcomp
         self.w = widgets
@@ -36,15 +59,69 @@ class HandlerClass:
         # CAM Wizard step tracking (0-indexed for steps 1–5)
         self.current_cam_step = 0
 
-        # Simulation timer reference
-        self.simulationTimer = None
+        # Playback clock of the simulated program; the DROs, the Vismach
+        # pose and the backplot highlight all follow its time
+        self.playback = ToolpathPlayback()
+        self.playback.advanced.connect(self.simulateGCode)
+        self.simulationLine = None
+
+        # Currently loaded G-code file and its analysis summary
+        self.gcodeFile = None
+        self.programSummary = None
+        # Preview of the loaded program's toolpath in the Vismach view
+        self.toolpathPlot = ToolpathPlot()
+        # Vismach is imported and built when its container is first shown
+        self.vismachView = None
+        self.glWidget = None
+        # Timestamped tool pose and spindle speed the Vismach view renders
+        # from, smoothed between updates; repainted by poseAnimator
+        self.pose = PoseBuffer()
+        self.poseAnimator = None
+        # Axis limits for the cycle time estimate, and the last estimate
+        self.machineLimits = MachineLimits.from_ini(INFO.INI)
+        self.cycleTime = None
+        # Remaining time of the running program, from the per-line estimate
+        self.eta = EtaTracker()
+
+        # linuxcnc.stat polled on a background thread; DROs, the Status
+        # button and the backplots get only what changed
+        self.statusService = StatusService(cycle_time(INFO.INI))
+        self.programRunning = False
+        # Last program loaded into LinuxCNC, for pages built after the load
+        self.loadedFile = None
+
+        # Persistent cache of analysis results, budget from [DISPLAY] ANALYSIS_CACHE_MB
+        try:
+            budget = int(float(INFO.INI.find('DISPLAY', 'ANALYSIS_CACHE_MB')) * 1024 * 1024)
+        except (TypeError, ValueError):
+            budget = DEFAULT_BUDGET
+        self.analysisCache = shared_cache(os.path.join(self.PATHS.CONFIGPATH, DIRECTORY_NAME), budget)
+
+        # Files whose changes invalidate CAM Wizard results
+        self.toolTableFile = self.configFile('EMCIO', 'TOOL_TABLE')
+        self.parameterFile = self.configFile('RS274NGC', 'PARAMETER_FILE')
+        # Indexed, memoized view of the parameter file, read only; the
+        # OriginOffsetView changes offsets through LinuxCNC itself
+        self.parameters = ParameterFile(self.parameterFile)
+
+        # CAM Wizard work as a memoized dependency graph
+        self.camGraph = self.buildCamGraph()
+        # Stages still to compute for the current step, and the running job
+        # as (job id, stage, start time)
+        self.camPending = []
+        self.camJob = None
+        # Id of the running job that looks the program up in the cache
+        self.camLookup = None
 
     def initialized__(self):
         """
         Called once the UI widgets and HAL pins are instantiated.
-        Connect various buttons, set initial states, and embed the Vismach widget.
+        Connect various buttons, set initial states, and set up the lazily built Vismach view.
         """
         # --- Main Navigation ---
+        # Pages by name; the status page is built on its first visit
+        self.pages = PageRegistry(self.w.stackedWidget, self.w)
+        self.pages.add_builder('statusPage', self.buildStatusPage)
         self.w.btnControl.clicked.connect(lambda: self.showPage("controlPage"))
         self.w.btnCamWizard.clicked.connect(lambda: self.openCamWizard())
         self.w.btnTools.clicked.connect(lambda: self.showPage("toolsPage"))
@@ -69,6 +146,12 @@ class HandlerClass:
         self.w.btnNextStep4.clicked.connect(lambda: self.advanceCamStep(1))
         self.w.btnPrevStep5.clicked.connect(lambda: self.advanceCamStep(-1))
         self.w.btnFinishCamWizard.clicked.connect(self.finishCamWizard)
+        self.w.btnSimulationPlay.clicked.connect(self.toggleSimulation)
+        self.w.sldSimulation.valueChanged.connect(self.seekSimulation)
+        self.w.cmbSimulationSpeed.currentIndexChanged.connect(self.setSimulationSpeed)
+        self.playback.finished.connect(lambda: self.w.btnSimulationPlay.setText("Play"))
+        self.w.filemanager.fileSelected.connect(self.on_file_selected)
+        self.w.filemanager.fileHighlighted.connect(self.on_file_highlighted)
         try:
             self.w.filemanager.fileDoubleClicked.connect(self.loadGCodeFile)
         except AttributeError:
@@ -80,44 +163,67 @@ class HandlerClass:
         self.w.cmbJogIncrement.currentIndexChanged.connect(self.updateJogIncrement)
         self.w.btnAxisSelector.clicked.connect(self.selectAxis)
 
+        # --- Background CAM Wizard analysis ---
+        self.camRunner = AnalysisRunner(self.w)
+        self.camRunner.progress.connect(self.onCamJobProgress)
+        self.camRunner.finished.connect(self.onCamJobFinished)
+        self.camRunner.failed.connect(self.onCamJobFailed)
+        self.w.camProgressBar.hide()
+
+        # Speculative analysis of highlighted files, [DISPLAY] ANALYSIS_PREFETCH_JOBS at once
+        try:
+            prefetch_jobs = max(int(INFO.INI.find('DISPLAY', 'ANALYSIS_PREFETCH_JOBS')), 1)
+        except (TypeError, ValueError):
+            prefetch_jobs = 2
+        self.prefetcher = ProgramPrefetcher(self.analysisCache, self.w, max_jobs=prefetch_jobs)
+        self.prefetcher.ready.connect(self.onPrefetchReady)
+        self.prefetcher.progress.connect(self.onPrefetchProgress)
+        self.prefetcher.failed.connect(self.onPrefetchFailed)
+
+        # Counts the remaining time down between line changes while running
+        self.etaTimer = QtCore.QTimer(self.w)
+        self.etaTimer.timeout.connect(self.showEta)
+
         # --- STATUS Signal Connections ---
-        STATUS.connect('interp-run', self.on_program_start)
-        STATUS.connect('interp-idle', self.on_program_stop)
+        STATUS.connect('file-loaded', self.on_file_loaded)
+
+        # --- Status Service Subscriptions ---
+        self.statusService.subscribe('interp_state', self.on_interp_state)
+        self.statusService.subscribe('motion_line', lambda line: self.on_line_changed(None, line))
+        self.statusService.subscribe('paused', lambda paused: self.on_program_pause_changed(None, paused))
+        self.statusService.subscribe(('g5x_offset', 'g5x_index', 'g92_offset'), self.on_offsets_changed)
+        # DROs only set a new text when the displayed value changes
+        self.dro = DroPipeline()
+        self.dro.add('droX', getattr(self.w, 'droX', None))
+        self.dro.add('droZ', getattr(self.w, 'droZ', None))
+        self.dro.add('droSpindle', getattr(self.w, 'droSpindle', None), 1.0, '{:.0f} RPM')
+        # One DRO update per status snapshot, after the service's own delivery
+        self.statusService.changed.connect(self.on_status_changed)
+        for name in ('droX', 'droZ', 'droSpindle'):
+            # These DROs are fed by the status service only
+            dro = getattr(self.w, name, None)
+            try:
+                STATUS.disconnect_by_func(dro.update)
+            except (AttributeError, TypeError, ValueError):
+                pass
+        for name in ('touchgcodegraphics', 'gcodegraphics_simulation'):
+            view = getattr(self.w, name, None)
+            if hasattr(view, 'attachStatusService'):
+                view.attachStatusService(self.statusService)
+        self.statusService.start()
+
+        # Build deferred pages once the UI is idle; [DISPLAY] PAGE_PREWARM_MS <= 0 turns it off
+        try:
+            prewarm = int(INFO.INI.find('DISPLAY', 'PAGE_PREWARM_MS'))
+        except (TypeError, ValueError):
+            prewarm = 3000
+        if prewarm > 0:
+            self.pages.prewarm(prewarm)
 
-        # --- Embed Vismach GLWidget into designated container ---
+        # --- Vismach view, built the first time its container is shown ---
         container = self.w.findChild(QtWidgets.QWidget, "vismachWidget")
         if container:
-            layout = container.layout()
-            if layout is None:
-                layout = QtWidgets.QVBoxLayout(container)
-                container.setLayout(layout)
-            self.glWidget = GLWidget(container)
-            self.glWidget.set_latitudelimits(-180, 180)
-            layout.addWidget(self.glWidget)
-
-            # Create and initialize Capture objects
-            world = Capture()
-            world.capture()
-            tooltip = Capture()
-            tooltip.capture()
-            work = Capture()
-            work.capture()
-
-            # Load the lathe model
-            model = self.loadMachineModel()
-
-            # Assign model with world capture as a Collection
-            self.glWidget.model = Collection([model, world])
-            self.glWidget.distance = 600 * 3
-            self.glWidget.near = 600 * 0.01
-            self.glWidget.far = 600 * 10.0
-
-            try:
-                self.glWidget.tool2view = tooltip
-                self.glWidget.world2view = world
-                self.glWidget.work2view = work
-            except AttributeError:
-                LOG.warning("GLWidget does not support one or more view properties (tool2view, world2view, work2view).")
+            self.vismachView = LazyView(container, self.buildVismach, self.teardownVismach)
         else:
             LOG.warning("vismachWidget container not found in UI.")
 
@@ -136,6 +242,65 @@ class HandlerClass:
         else:
             LOG.warning("No valid GCode file selected.")
 
+    def buildVismach(self, container):
+        """
+        Imports Vismach and builds the 3D view with the lathe model inside
+        container; returns the GLWidget.
+        """
+        from qtvcp.lib.qt_vismach.qt_vismach import GLWidget, Capture, Collection, Translate, Rotate
+        from qtvcp.widgets.pose_view import PoseAnimator
+
+        start = time.perf_counter()
+        layout = container.layout()
+        if layout is None:
+            layout = QtWidgets.QVBoxLayout(container)
+            container.setLayout(layout)
+        self.glWidget = GLWidget(container)
+        self.glWidget.set_latitudelimits(-180, 180)
+        layout.addWidget(self.glWidget)
+
+        # Create and initialize Capture objects
+        world = Capture()
+        world.capture()
+        tooltip = Capture()
+        tooltip.capture()
+        work = Capture()
+        work.capture()
+
+        # Load the lathe model
+        model = self.loadMachineModel()
+
+        # Toolpath preview in program coordinates: Z along the spindle axis
+        # from the workpiece face, X (radius) towards the tool rest
+        toolpath = Translate([Rotate([self.toolpathPlot], 120, 1, 1, 1)], 175, 0, 100)
+
+        # Assign model with world capture as a Collection
+        self.glWidget.model = Collection([model, toolpath, world])
+        self.glWidget.distance = 600 * 3
+        self.glWidget.near = 600 * 0.01
+        self.glWidget.far = 600 * 10.0
+
+        try:
+            self.glWidget.tool2view = tooltip
+            self.glWidget.world2view = world
+            self.glWidget.work2view = work
+        except AttributeError:
+            LOG.warning("GLWidget does not support one or more view properties (tool2view, world2view, work2view).")
+        self.poseAnimator = PoseAnimator(self.glWidget, self.pose)
+        LOG.info("Vismach view built in %.0f ms", (time.perf_counter() - start) * 1000)
+        return self.glWidget
+
+    def teardownVismach(self, glWidget):
+        """
+        Drops the hidden Vismach view; it is built again when shown.
+        """
+        if self.glWidget is glWidget:
+            self.glWidget = None
+            if self.poseAnimator is not None:
+                self.poseAnimator.stop()
+                self.poseAnimator = None
+        LOG.info("Vismach view torn down while hidden.")
+
     def loadMachineModel(self):
         """
         Constructs a fully built lathe model using QtVismach primitives.
@@ -143,106 +308,160 @@ class HandlerClass:
         The model includes:
           - A large base.
           - A headstock assembly on the left side, featuring a headstock block,
-            a horizontally oriented spindle (animated via HalRotate), and drive dogs.
+            a horizontally oriented spindle (turned by the pose buffer), and drive dogs.
           - A tailstock assembly on the right side with a tailstock block and a tail center.
           - A tool rest fixture mounted on the base.
+          - A tool marker that follows the tool position in program coordinates.
           - A workpiece (horizontal cylinder) mounted between the headstock and tailstock.
 
-        The parts are created as individual primitives, colored, animated where appropriate,
-        and then assembled into a hierarchical Collection to ensure that child parts move
-        with their parents.
+        The static parts are batched into one pre-transformed triangle array per
+        colour; the spindle and drive dogs, which turn together, form a second
+        batch turned by the spindle angle of self.pose, and the tool marker is
+        a third batch moved to the pose's tool position.  The batches are saved
+        in the analysis cache directory and loaded from there on later starts.
         """
-        # --- Base ---
-        # A large, stable foundation
-        base = Box(-250, -100, 0, 250, 100, 50)
-        base = Color([0.5, 0.5, 0.5, 1.0], [base])
+        from qtvcp.lib.qt_vismach.qt_vismach import Collection
+        from qtvcp.widgets.pose_view import PoseRotate, PoseTranslate
+
+        directory = os.path.join(self.PATHS.CONFIGPATH, DIRECTORY_NAME)
+        start = time.perf_counter()
+        static = MeshBatch.cached(os.path.join(directory, 'lathe_static.npz'), self.MODEL_VERSION,
+                                  self.buildStaticParts)
+        turning = MeshBatch.cached(os.path.join(directory, 'lathe_spindle.npz'), self.MODEL_VERSION,
+                                   self.buildSpindleParts)
+        cutter = MeshBatch.cached(os.path.join(directory, 'lathe_tool.npz'), self.MODEL_VERSION,
+                                  self.buildToolParts)
+        spindle = PoseRotate([turning], self.pose, 0, 0, 1)
+        # Same placement as the toolpath preview: program (X, Z) -> model (175 + Z, X, 100)
+        tool = PoseTranslate([cutter], self.pose, lambda x, z: (175 + z, x, 100))
 
-        # --- Headstock Assembly ---
-        # Headstock Block: fixed structure on the left side
-        headstock_block = Box(-250, -50, 50, -200, 50, 150)
-        headstock_block = Color([0.3, 0.3, 0.3, 1.0], [headstock_block])
-
-        # Spindle: create as a vertical cylinder then rotate it to horizontal.
-        spindle = CylinderZ(0, 10, 80, 10)  # a cylinder along the Z-axis
-        spindle = Rotate([spindle], 90, 0, 1, 0)  # rotate 90 about Y-axis to make it horizontal
-        spindle = Translate([spindle], -225, 0, 100)  # position it within the headstock block
-        spindle = Color([0.8, 0.8, 0.8, 1.0], [spindle])
-        spindle = HalRotate([spindle], None, "spindle.sim", 360, 0, 0, 1)
+        # --- Assemble Complete Lathe Model ---
+        lathe_model = Collection([static, spindle, tool])
+        LOG.info("Lathe model loaded in %.0f ms: %s static, %s on the spindle, %s tool.",
+                 (time.perf_counter() - start) * 1000, static, turning, cutter)
+        return lathe_model
 
-        # Drive Dogs: small boxes mounted on the spindle periphery to drive the workpiece
-        drive_dogs = Box(-5, -3, 70, 5, 3, 80)
-        drive_dogs = Translate([drive_dogs], -225, 0, 100)  # align with spindle center
-        drive_dogs = Color([1, 1, 1, 1], [drive_dogs])
-        drive_dogs = HalRotate([drive_dogs], None, "spindle.sim", 360, 0, 0, 1)
+    def buildStaticParts(self, batch):
+        # --- Base ---
+        # A large, stable foundation
+        batch.add_box(-250, -100, 0, 250, 100, 50, (0.5, 0.5, 0.5, 1.0))
 
-        # Assemble the headstock assembly
-        head_assembly = Collection([headstock_block, spindle, drive_dogs])
+        # --- Headstock Block: fixed structure on the left side ---
+        batch.add_box(-250, -50, 50, -200, 50, 150, (0.3, 0.3, 0.3, 1.0))
 
         # --- Tailstock Assembly ---
         # Tailstock Block: structure on the right side
-        tailstock_block = Box(200, -30, 50, 250, 30, 130)
-        tailstock_block = Color([0.3, 0.3, 0.3, 1.0], [tailstock_block])
-
-        # Tail Center: a small horizontal cylinder in the tailstock block (create vertically then rotate)
-        tail_center = CylinderZ(0, 5, 20, 5)
-        tail_center = Rotate([tail_center], 90, 0, 1, 0)
-        tail_center = Translate([tail_center], 225, 0, 90)
-        tail_center = Color([0.8, 0.8, 0.8, 1.0], [tail_center])
-
-        # Assemble the tailstock assembly
-        tail_assembly = Collection([tailstock_block, tail_center])
+        batch.add_box(200, -30, 50, 250, 30, 130, (0.3, 0.3, 0.3, 1.0))
+        # Tail Center: a small horizontal cylinder in the tailstock block (created vertically then rotated)
+        batch.add_cylinder_z(0, 5, 20, 5, (0.8, 0.8, 0.8, 1.0), translation(225, 0, 90) @ rotation(90, 0, 1, 0))
 
         # --- Tool Rest ---
         # A fixture for supporting the cutting tool, mounted on the base.
-        tool_rest = Box(-50, 70, 60, 50, 90, 80)
-        tool_rest = Color([0.7, 0.7, 0.7, 1.0], [tool_rest])
+        batch.add_box(-50, 70, 60, 50, 90, 80, (0.7, 0.7, 0.7, 1.0))
 
         # --- Workpiece ---
-        # Create a workpiece as a horizontal cylinder that spans from the headstock to the tailstock.
-        workpiece = CylinderZ(0, 12, 400, 12)  # defined along the Z-axis initially
-        workpiece = Rotate([workpiece], 90, 0, 1, 0)  # rotate to horizontal orientation
-        workpiece = Translate([workpiece], -225, 0, 100)  # position between headstock and tailstock
-        workpiece = Color([0.9, 0.9, 0.9, 1.0], [workpiece])
+        # A horizontal cylinder that spans from the headstock to the tailstock.
+        batch.add_cylinder_z(0, 12, 400, 12, (0.9, 0.9, 0.9, 1.0), translation(-225, 0, 100) @ rotation(90, 0, 1, 0))
 
-        # --- Assemble Complete Lathe Model ---
-        lathe_model = Collection([base, head_assembly, tail_assembly, tool_rest, workpiece])
-        LOG.info(
-            "Fully constructed lathe model loaded: base, headstock (with spindle and drive dogs), tailstock, tool rest, and workpiece created.")
-        return lathe_model
+    def buildSpindleParts(self, batch):
+        # Spindle: a vertical cylinder rotated 90 degrees about Y to lie horizontally in the headstock
+        batch.add_cylinder_z(0, 10, 80, 10, (0.8, 0.8, 0.8, 1.0), translation(-225, 0, 100) @ rotation(90, 0, 1, 0))
+        # Drive Dogs: small boxes mounted on the spindle periphery to drive the workpiece
+        batch.add_box(-5, -3, 70, 5, 3, 80, (1.0, 1.0, 1.0, 1.0), translation(-225, 0, 100))
+
+    def buildToolParts(self, batch):
+        # Tool: a cone with its tip at the tool point, the body pointing away from the spindle axis
+        batch.add_cylinder_z(0, 0, 30, 6, (1.0, 0.6, 0.1, 1.0), rotation(-90, 1, 0, 0))
 
-    def simulateGCode(self):
+    def simulateGCode(self, t):
         """
-        Simulates execution of loaded GCode by updating DRO displays and simulation state.
-        Replace dummy values with actual simulation logic.
+        Shows the simulated program at program time t (seconds): the DROs,
+        the Vismach tool pose and the backplot highlight of the running line.
         """
-        x = random.uniform(-100, 100)
-        z = random.uniform(-50, 50)
-        spindle_speed = random.uniform(0, 3000)
-        try:
-            self.w.droX.setText("{:.2f}".format(x))
-            self.w.droZ.setText("{:.2f}".format(z))
-            self.w.droSpindle.setText("{:.0f} RPM".format(spindle_speed))
-        except AttributeError:
-            LOG.warning("One or more DRO widgets not defined in UI.")
-        if hasattr(self.glWidget, "updateSimulationState"):
-            self.glWidget.updateSimulationState(x=x, z=z, spindle=spindle_speed)
+        timeline = self.playback.timeline
+        if timeline is None:
+            return
+        point, segment = timeline.sample(t)
+        x, z = float(point[0]), float(point[2])
+        segment = int(segment)
+        spindle_speed = timeline.spindle(segment)
+        self.dro.update({'droX': x, 'droZ': z, 'droSpindle': spindle_speed})
+        self.updatePose(x, z, spindle_speed)
+        line = timeline.line(segment)
+        if line != self.simulationLine:
+            self.simulationLine = line
+            STATUS.emit('gcode-line-selected', line)
+        slider = self.w.sldSimulation
+        slider.blockSignals(True)
+        slider.setValue(int(round(slider.maximum() * t / timeline.total)) if timeline.total else 0)
+        slider.blockSignals(False)
+
+    def loadPlayback(self, cycle):
+        """
+        Places the analyzed toolpath on the estimated program clock for
+        playback; returns the timeline.
+        """
+        summary = self.programSummary
+        timeline = None
+        if cycle is not None and summary is not None and summary.toolpath is not None:
+            timeline = PlaybackTimeline.from_cycle(summary.toolpath, cycle, self.machineLimits,
+                                                   summary.css_max_rpm)
+        LOG.info("Simulation playback: %s", timeline)
+        self.playback.load(timeline)
+        self.simulationLine = None
+        self.w.btnSimulationPlay.setText("Play")
+        self.w.sldSimulation.blockSignals(True)
+        self.w.sldSimulation.setValue(0)
+        self.w.sldSimulation.blockSignals(False)
+        return timeline
 
     def startSimulation(self):
         """
-        Starts a timer to update the simulation periodically.
+        Plays the simulated program from the current playback time.
         """
-        self.simulationTimer = QtCore.QTimer()
-        self.simulationTimer.timeout.connect(self.simulateGCode)
-        self.simulationTimer.start(1000)
-        LOG.info("Simulation timer started.")
+        if self.playback.timeline is None:
+            LOG.warning("No toolpath estimate to simulate yet.")
+            return
+        self.playback.play()
+        self.w.btnSimulationPlay.setText("Pause")
+        LOG.info("Simulation playing at %gx.", self.playback.speed())
 
     def stopSimulation(self):
         """
-        Stops the simulation timer.
+        Stops the simulation and rewinds it to the program start.
+        """
+        if self.playback.running:
+            self.playback.stop()
+            self.pose.clear()
+            # Back to the machine's position
+            self.dro.invalidate()
+            self.updateDRO()
+            LOG.info("Simulation stopped.")
+        self.w.btnSimulationPlay.setText("Play")
+
+    def toggleSimulation(self):
+        if self.playback.playing:
+            self.playback.pause()
+            self.w.btnSimulationPlay.setText("Play")
+        else:
+            self.startSimulation()
+
+    def seekSimulation(self, value):
+        """
+        Scrubs the simulation to the slider position.
         """
-        if self.simulationTimer:
-            self.simulationTimer.stop()
-            LOG.info("Simulation timer stopped.")
+        if self.playback.timeline is None:
+            return
+        # Jump, rather than animate, to the new position
+        self.pose.clear()
+        self.playback.seek(self.playback.total * value / self.w.sldSimulation.maximum())
+
+    def setSimulationSpeed(self, index):
+        speed = self.w.cmbSimulationSpeed.itemText(index).rstrip('x')
+        try:
+            self.playback.set_speed(float(speed))
+        except ValueError:
+            LOG.error("Invalid simulation speed: %s", speed)
 
     # --- CAM Wizard Methods ---
     def openCamWizard(self):
@@ -254,6 +473,209 @@ class HandlerClass:
         self.w.camWizardStack.setCurrentIndex(self.current_cam_step)
         self.updateCamWizardSideMenu()
 
+    def buildCamGraph(self):
+        """
+        Models the CAM Wizard work as stages of a dependency graph.
+        Inputs are the identities of the loaded program, the tool table and
+        the parameter (offsets) file; a stage only reruns when one of the
+        inputs it depends on has changed.
+        """
+        graph = StageGraph()
+        graph.add_input('file', None)
+        graph.add_input('tooltable', None)
+        graph.add_input('offsets', None)
+        graph.add_stage('analysis', lambda f: self.processGCode(), ('file',))
+        graph.add_stage('tools', lambda tools, t: self.loadTools(tools), ('analysis', 'tooltable'))
+        graph.add_stage('zero', lambda tools, o: self.extractZeroPoint(), ('analysis', 'offsets'))
+        graph.add_stage('simulation', lambda tools, zero: self.loadSimulation(), ('analysis', 'zero'))
+        graph.add_stage('estimate', lambda tools: self.estimateCycleTime(), ('analysis',))
+        graph.add_stage('eta', lambda cycle: self.buildEtaIndex(cycle), ('estimate',))
+        graph.add_stage('playback', lambda cycle: self.loadPlayback(cycle), ('estimate',))
+        # Stages computed off the GUI thread: stage -> method starting the job
+        self.camJobs = {'analysis': self.startAnalysisJob}
+        return graph
+
+    def configFile(self, section, option):
+        """
+        Returns the absolute path of a file named in the INI, or None.
+        """
+        name = INFO.INI.find(section, option)
+        if not name:
+            return None
+        return os.path.join(self.PATHS.CONFIGPATH, os.path.expanduser(name))
+
+    def fileIdentity(self, path):
+        """
+        Returns (path, size, mtime) of a file, or None if it does not exist.
+        """
+        if not path:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (path, st.st_size, st.st_mtime_ns)
+
+    def refreshCamInputs(self):
+        """
+        Updates the CAM Wizard graph inputs; changed inputs invalidate
+        the stages that depend on them.  Work on a program that is no longer
+        current is cancelled.
+        """
+        if self.camGraph.set_input('file', self.fileIdentity(self.currentGCodeFile())):
+            self.cancelCamWork()
+        self.camGraph.set_input('tooltable', self.fileIdentity(self.toolTableFile))
+        self.camGraph.set_input('offsets', self.fileIdentity(self.parameterFile))
+
+    def runCamStages(self, step):
+        """
+        Schedules the stages a step needs; memoized results cost nothing,
+        heavy stages run in the background and the rest follow once they finish.
+        """
+        self.refreshCamInputs()
+        self.camPending = []
+        self.scheduleCamStages(self.CAM_STEP_STAGES.get(step, ()))
+
+    def scheduleCamStages(self, stages):
+        """
+        Adds stages (and what they depend on) to the pending CAM work.
+        """
+        for stage in stages:
+            for name in self.camGraph.plan(stage):
+                if name not in self.camPending:
+                    self.camPending.append(name)
+        self.runNextCamStage()
+
+    def runNextCamStage(self):
+        """
+        Computes pending CAM Wizard stages until one has to wait for a job.
+        """
+        while self.camPending:
+            name = self.camPending[0]
+            if self.camGraph.is_valid(name):
+                self.camPending.pop(0)
+                continue
+            if self.camJob is not None:
+                # Waiting for a background job; it continues the queue
+                return
+            if name in self.camJobs:
+                self.camGraph.last_recomputed = []
+                self.camJobs[name]()
+                if self.camJob is not None:
+                    return
+            else:
+                self.camGraph.get(name)
+            for stage, elapsed in self.camGraph.last_recomputed:
+                LOG.info("CAM Wizard stage %s recomputed in %.1f ms", stage, elapsed * 1000)
+        self.w.camProgressBar.hide()
+
+    def startAnalysisJob(self):
+        """
+        Starts parsing the loaded program in a worker process, unless the
+        result can be taken from the analysis cache right away.
+        """
+        gcode_file = self.currentGCodeFile()
+        start = time.perf_counter()
+        prefetched = self.prefetcher.result(gcode_file)
+        if prefetched is not None:
+            LOG.info("Using prefetched analysis of %s", gcode_file)
+            self.programSummary = prefetched
+            self.camGraph.put('analysis', prefetched.tools, time.perf_counter() - start)
+            return
+        if self.prefetcher.pending(gcode_file):
+            # Adopt the running prefetch instead of parsing twice
+            self.camJob = ('prefetch', 'analysis', start)
+            self.w.camProgressBar.setValue(0)
+            self.w.camProgressBar.show()
+            return
+        cached = None
+        if gcode_file and os.path.isfile(gcode_file):
+            # A touched or copied file is hashed on the worker, not here
+            cached = load_analysis(self.analysisCache, gcode_file, rehash=False)
+        if cached is None and gcode_file and os.path.isfile(gcode_file):
+            self.camLookup = self.camRunner.submit(cached_analysis, self.analysisCache, gcode_file, kind=THREAD)
+            self.camJob = (self.camLookup, 'analysis', start)
+            self.w.camProgressBar.setValue(0)
+            self.w.camProgressBar.show()
+            return
+        self.camGraph.put('analysis', self.processGCode(), time.perf_counter() - start)
+
+    def submitAnalysisJob(self, gcode_file):
+        """
+        Parses gcode_file in a worker process, for the running 'analysis' stage.
+        """
+        job = self.camRunner.submit(analyze_program, gcode_file)
+        self.camJob = (job, 'analysis', self.camJob[2])
+        LOG.info("Analyzing GCode file in background: %s", gcode_file)
+
+    def onCamJobProgress(self, job, fraction):
+        if self.camJob is not None and job == self.camJob[0]:
+            self.w.camProgressBar.setValue(int(fraction * 100))
+
+    def onPrefetchProgress(self, path, fraction):
+        if self.camJob is not None and self.camJob[0] == 'prefetch' and path == self.currentGCodeFile():
+            self.w.camProgressBar.setValue(int(fraction * 100))
+
+    def onPrefetchReady(self, path, summary):
+        if self.camJob is None or self.camJob[0] != 'prefetch' or path != self.currentGCodeFile():
+            return
+        # The prefetcher already writes the result to the analysis cache
+        self.programSummary = summary
+        self.completeCamJob(summary.tools)
+
+    def onPrefetchFailed(self, path, message):
+        if self.camJob is not None and self.camJob[0] == 'prefetch' and path == self.currentGCodeFile():
+            LOG.error("CAM Wizard analysis of %s failed: %s", path, message)
+            self.cancelCamWork()
+
+    def onCamJobFinished(self, job, result):
+        if self.camJob is None or job != self.camJob[0]:
+            return
+        if self.camJob[1] == 'analysis':
+            if job == self.camLookup:
+                self.camLookup = None
+                if result is None:
+                    # Not in the cache under any identity
+                    self.submitAnalysisJob(self.currentGCodeFile())
+                    return
+                LOG.info("GCode analysis taken from cache: %s", result)
+            else:
+                self.camRunner.background(store_analysis, self.analysisCache, result)
+                LOG.info("Analyzed GCode file: %s", result)
+            self.programSummary = result
+            result = result.tools
+        self.completeCamJob(result)
+
+    def completeCamJob(self, value):
+        """
+        Records the result of the running background stage and continues
+        with the pending ones.
+        """
+        _, stage, start = self.camJob
+        self.camJob = None
+        self.camGraph.last_recomputed = []
+        self.camGraph.put(stage, value, time.perf_counter() - start)
+        LOG.info("CAM Wizard stage %s computed in background in %.1f ms",
+                 stage, (time.perf_counter() - start) * 1000)
+        self.runNextCamStage()
+
+    def onCamJobFailed(self, job, message):
+        if self.camJob is None or job != self.camJob[0]:
+            return
+        LOG.error("CAM Wizard stage %s failed: %s", self.camJob[1], message)
+        self.cancelCamWork()
+
+    def cancelCamWork(self):
+        """
+        Cancels in-flight CAM Wizard work and forgets pending stages.
+        """
+        if self.camJob is not None:
+            LOG.info("Cancelling CAM Wizard stage %s", self.camJob[1])
+        self.camRunner.cancel()
+        self.camJob = None
+        self.camPending = []
+        self.w.camProgressBar.hide()
+
     def showCamStep(self, step):
         """
         Jumps to a specific CAM Wizard step.
@@ -262,43 +684,24 @@ class HandlerClass:
             self.current_cam_step = step
             self.w.camWizardStack.setCurrentIndex(step)
             self.updateCamWizardSideMenu()
-            LOG.info("CAM Wizard jumped to step %d", step + 1)
-            if step == 1:
-                tools = self.processGCode()
-                self.loadTools(tools)
-            elif step == 2:
-                zero = self.extractZeroPoint()
-                LOG.info("Zero Point: %s", zero)
-            elif step == 3:
-                self.loadSimulation()
+            LOG.info("CAM Wizard at step %d", step + 1)
+            self.runCamStages(step)
 
     def advanceCamStep(self, delta):
         """
         Advances (or goes back) one step in the CAM Wizard.
         """
+        if delta < 0:
+            self.cancelCamWork()
         new_step = self.current_cam_step + delta
-        if new_step < 0:
-            new_step = 0
-        elif new_step >= self.w.camWizardStack.count():
-            new_step = self.w.camWizardStack.count() - 1
-        self.current_cam_step = new_step
-        self.w.camWizardStack.setCurrentIndex(new_step)
-        self.updateCamWizardSideMenu()
-        LOG.info("CAM Wizard advanced to step %d", new_step + 1)
-        if new_step == 1:
-            tools = self.processGCode()
-            self.loadTools(tools)
-        elif new_step == 2:
-            zero = self.extractZeroPoint()
-            LOG.info("Zero Point: %s", zero)
-        elif new_step == 3:
-            self.loadSimulation()
+        self.showCamStep(max(0, min(new_step, self.w.camWizardStack.count() - 1)))
 
     def finishCamWizard(self):
         """
         Finishes the CAM Wizard, resets it for future use, and moves to the status page.
         """
         LOG.info("CAM Wizard finished. Resetting wizard and switching to status page.")
+        self.stopSimulation()
         self.current_cam_step = 0
         self.w.camWizardStack.setCurrentIndex(0)
         self.updateCamWizardSideMenu()
@@ -319,17 +722,46 @@ class HandlerClass:
             else:
                 btn.setStyleSheet("background-color: #454955; color: white;")
 
-    def processGCode(self):
+    def currentGCodeFile(self):
         """
-        Loads a GCode file (from a FileManager widget) and extracts tool information.
-        Dummy implementation: returns a list of tool IDs.
+        Returns the path of the program the CAM Wizard works on, or None.
         """
+        if self.gcodeFile:
+            return self.gcodeFile
         try:
-            gcode_file = self.w.filemanager.getFile()
+            return self.w.filemanager.getFile()
         except AttributeError:
-            gcode_file = "dummy.ngc"
-        LOG.info("Loaded GCode file: %s", gcode_file)
-        return [1, 2, 3]
+            return None
+
+    def processGCode(self):
+        """
+        Analyzes the loaded GCode file in a single streaming pass and returns
+        the tool numbers it uses, in order of first selection.
+        The full analysis is kept in self.programSummary; results of files
+        analyzed before are taken from the analysis cache without parsing.
+        """
+        gcode_file = self.currentGCodeFile()
+        if not gcode_file or not os.path.isfile(gcode_file):
+            LOG.warning("No GCode file loaded; nothing to analyze.")
+            self.programSummary = None
+            return []
+        cached = load_analysis(self.analysisCache, gcode_file)
+        if cached is not None:
+            self.programSummary = cached
+            LOG.info("GCode analysis taken from cache: %s", self.programSummary)
+            return self.programSummary.tools
+        try:
+            self.programSummary = analyze_file(gcode_file, toolpath=True)
+        except (OSError, ValueError) as e:
+            LOG.error("Error analyzing GCode file %s: %s", gcode_file, e)
+            self.programSummary = None
+            return []
+        try:
+            store_analysis(self.analysisCache, self.programSummary)
+        except OSError as e:
+            LOG.warning("Could not cache GCode analysis: %s", e)
+        LOG.info("Analyzed GCode file: %s", self.programSummary)
+        return self.programSummary.tools
 
     def loadTools(self, tools):
         """
@@ -338,26 +770,86 @@ class HandlerClass:
         """
         LOG.info("Loading tools into toolchanger: %s", tools)
         self.tools = tools
+        return tools
 
     def extractZeroPoint(self):
         """
-        Extracts the zero point from the GCode file.
-        Dummy implementation returns (0,0,0).
+        Extracts the zero point of the GCode file: the work offset it selects
+        (G54-G59.3, or the active one) resolved against the parameter file,
+        with G10 L2 settings from the program applied.
         """
         LOG.info("Extracting Zero Point from GCode...")
-        return (0.0, 0.0, 0.0)
+        zero = zero_point(self.programSummary, self.parameters)
+        LOG.info("Zero Point: %s", zero)
+        return zero
+
+    def on_offsets_changed(self, value):
+        """
+        Work offsets changed in LinuxCNC, e.g. edited in the OriginOffsetView
+        (which sends its own G10 L2).  Re-reads the parameter file once
+        LinuxCNC has written it, so the zero point stage reruns.
+        """
+        if self.parameters.refresh():
+            self.camGraph.set_input('offsets', self.fileIdentity(self.parameterFile))
 
     def loadSimulation(self):
         """
-        Loads simulation paths for the GCode.
-        Dummy implementation creates a random path.
+        Shows the toolpath of the analyzed GCode in the Vismach view.
+        """
+        toolpath = self.programSummary.toolpath if self.programSummary is not None else None
+        LOG.info("Loading simulation of GCode paths: %s", toolpath)
+        self.toolpathPlot.set_toolpath(toolpath)
+        if self.glWidget is not None:
+            self.glWidget.update()
+        return toolpath
+
+    def estimateCycleTime(self):
         """
-        LOG.info("Loading simulation of GCode paths...")
-        path = [(random.uniform(-100, 100), random.uniform(-50, 50), random.uniform(0, 300)) for _ in range(20)]
-        if hasattr(self.glWidget, "simulatePath"):
-            self.glWidget.simulatePath(path)
+        Estimates the run time of the analyzed GCode from the machine's axis
+        limits and shows the total with a per-tool breakdown.  Estimates are
+        kept in the analysis cache.
+        """
+        summary = self.programSummary
+        if summary is None or summary.toolpath is None:
+            self.cycleTime = None
+            self.w.lblCycleTime.setText("Estimated cycle time: -")
+            return None
+        start = time.perf_counter()
+        cycle = None
+        if summary.path:
+            cycle = load_cycle_time(self.analysisCache, summary.path, self.machineLimits, rehash=False)
+        if cycle is not None and len(cycle.segment_time) == len(summary.toolpath):
+            self.cycleTime = cycle
+            LOG.info("Cycle time estimate %s from the cache", self.cycleTime)
         else:
-            LOG.warning("GLWidget does not support simulatePath()")
+            self.cycleTime = estimate_cycle_time(summary.toolpath, self.machineLimits,
+                                                 summary.line_count + 1, summary.css_max_rpm)
+            LOG.info("Cycle time estimate %s in %.1f ms", self.cycleTime, (time.perf_counter() - start) * 1000)
+            if summary.path:
+                self.camRunner.background(store_cycle_time, self.analysisCache, summary.path,
+                                          self.machineLimits, self.cycleTime)
+        tools = ", ".join("T{}: {}".format(tool, format_duration(seconds))
+                          for tool, seconds in self.cycleTime.per_tool.items() if tool >= 0)
+        text = "Estimated cycle time: {}".format(format_duration(self.cycleTime.total))
+        self.w.lblCycleTime.setText(text + (" ({})".format(tools) if tools else ""))
+        return self.cycleTime
+
+    def buildEtaIndex(self, cycle):
+        """
+        Indexes the cumulative estimated time per program line.
+        """
+        index = LineTimeIndex(cycle.per_line) if cycle is not None else None
+        if self.eta.running:
+            self.eta.index = index
+        return index
+
+    def showEta(self):
+        remaining = self.eta.remaining()
+        if remaining is None:
+            self.w.lblEta.setText("Remaining: -")
+            return
+        self.w.lblEta.setText("Remaining: {} (elapsed {})".format(
+            format_duration(remaining), format_duration(self.eta.actual())))
 
     # --- STATUS Button Methods ---
     def updateStatusButton(self):
@@ -372,9 +864,8 @@ class HandlerClass:
     def isProgramRunning(self):
         """
         Returns True if a program is running.
-        Dummy implementation returns False.
         """
-        return False
+        return self.programRunning
 
     def goToStatusPage(self):
         """
@@ -386,22 +877,111 @@ class HandlerClass:
         else:
             LOG.info("No program running; Status button remains disabled.")
 
+    def on_interp_state(self, state):
+        running = state != linuxcnc.INTERP_IDLE
+        if running == self.programRunning:
+            return
+        self.programRunning = running
+        if running:
+            self.on_program_start(state)
+        else:
+            self.on_program_stop(state)
+
     def on_program_start(self, state, **kwargs):
         self.w.btnStatus.setEnabled(True)
+        # The DROs and the pose show the machine again
+        self.stopSimulation()
+        # An index memoized for an older version of the program must not be used
+        self.refreshCamInputs()
+        self.eta.start(self.camGraph.value('eta'))
+        if self.eta.index is None:
+            # The index follows as soon as the analysis is done
+            self.scheduleCamStages(('eta',))
+        self.etaTimer.start(1000)
+        self.showEta()
 
     def on_program_stop(self, state, **kwargs):
         self.w.btnStatus.setEnabled(False)
+        self.eta.stop()
+        self.etaTimer.stop()
+        self.showEta()
+
+    def on_line_changed(self, obj, line):
+        if self.eta.running:
+            self.eta.update(line)
+            self.showEta()
+
+    def on_program_pause_changed(self, obj, paused):
+        if self.eta.running:
+            self.eta.pause(paused)
+
+    def on_file_highlighted(self, filename):
+        if self.camJob is not None and self.camJob[0] == 'prefetch' and filename != self.currentGCodeFile():
+            # The prefetch the wizard waits for is about to be cancelled
+            self.cancelCamWork()
+        self.prefetcher.prefetch(filename)
+
+    def on_file_selected(self, filename):
+        """
+        A different program was chosen in the file manager; drop work on the old one.
+        """
+        if filename != self.gcodeFile:
+            self.cancelCamWork()
+            self.gcodeFile = filename
+            self.programSummary = None
+            # Invalidates the stages memoized for the old program
+            self.refreshCamInputs()
+            self.prefetcher.prefetch(filename)
+
+    def on_file_loaded(self, obj, filename):
+        self.loadedFile = filename
+        self.on_file_selected(filename)
 
     def showPage(self, pageName):
         """
-        Switches the displayed page in the main QStackedWidget by matching the objectName.
+        Switches the displayed page in the main QStackedWidget, building it on its first visit.
         """
-        for i in range(self.w.stackedWidget.count()):
-            widget = self.w.stackedWidget.widget(i)
-            if widget.objectName() == pageName:
-                self.w.stackedWidget.setCurrentIndex(i)
-                LOG.debug("Switched to page: %s", pageName)
-                return
+        if self.pages.show(pageName):
+            LOG.debug("Switched to page: %s", pageName)
+
+    def buildStatusPage(self, page):
+        """
+        Builds the program view, G-code listing, camera and machine log of
+        the status page.  They are imported and created here rather than in
+        the .ui file so startup does not pay for them.
+        """
+        from qtvcp.widgets.gcode_editor import GcodeDisplay
+        from qtvcp.widgets.camview_widget import CamView
+        from qtvcp.widgets.machine_log import MachineLog
+        from qtvcp.widgets.touch_gcode_graphics import TouchGCodeGraphics
+
+        display = GcodeDisplay(page)
+        display.setObjectName("gcode_display")
+        graphics = TouchGCodeGraphics(page)
+        graphics.setObjectName("touchgcodegraphics")
+        # Parsed in the background and shared with the simulation backplot
+        graphics.setProgressiveLoad(True)
+        camview = CamView(page)
+        camview.setObjectName("camview")
+        camview.setMinimumSize(300, 300)
+        machinelog = MachineLog(page)
+        machinelog.setObjectName("machinelog")
+        self.w.gridLayout.addWidget(display, 0, 0)
+        self.w.gridLayout.addWidget(graphics, 1, 0)
+        self.w.gridLayout.addWidget(camview, 0, 1)
+        self.w.gridLayout.addWidget(machinelog, 1, 1)
+        for widget in (display, graphics, camview, machinelog):
+            # What qtvcp does for the widgets of the .ui file at startup;
+            # registered widgets get _hal_cleanup() at shutdown
+            widget.hal_init(HAL_NAME=widget.objectName(), QT_OBJECT_=widget, HAL_GCOMP_=self.hal,
+                            PATHS_=self.PATHS, QTVCP_INSTANCE_=self.w, PREFS_=self.w.PREFS_)
+            self.w.registerHalWidget(widget)
+            setattr(self.w, widget.objectName(), widget)
+        graphics.attachStatusService(self.statusService)
+        if self.loadedFile:
+            # The 'file-loaded' signal came before these widgets existed
+            display.load_program(None, self.loadedFile)
+            graphics.load_program(None, self.loadedFile)
 
     # --- Control Page Functions (Lathe Manual Control) ---
     def jogAxis(self, axis, direction):
@@ -414,9 +994,40 @@ class HandlerClass:
         # Placeholder for ACTION.SET_SPINDLE_SPEED command
         pass
 
+    def on_status_changed(self, changes):
+        # While a simulation is loaded the DROs follow its clock instead
+        if self.playback.running:
+            return
+        if any(field in changes for field in self.DRO_FIELDS):
+            self.updateDRO()
+
     def updateDRO(self):
-        # Placeholder: update DRO widgets with current simulated values.
-        pass
+        """
+        Shows the tool position relative to the active work offset, and the
+        spindle speed, from the status service's snapshot.
+        """
+        get = self.statusService.get
+        values = {}
+        position = get('actual_position')
+        if position is not None:
+            offsets = [get(name) or (0.0,) * 9 for name in ('g5x_offset', 'g92_offset', 'tool_offset')]
+            values['droX'] = position[0] - sum(offset[0] for offset in offsets)
+            values['droZ'] = position[2] - sum(offset[2] for offset in offsets)
+        spindles = get('spindle')
+        if spindles:
+            values['droSpindle'] = spindles[0]['speed']
+        self.dro.update(values)
+        if 'droX' in values:
+            self.updatePose(values['droX'], values['droZ'], values.get('droSpindle'))
+
+    def updatePose(self, x, z, rpm=None):
+        """
+        Records a tool position and spindle speed for the Vismach view, which
+        renders it smoothly at display rate rather than at the update rate.
+        """
+        self.pose.push(x, z, rpm)
+        if self.poseAnimator is not None:
+            self.poseAnimator.poke()
 
     def measureLaser(self):
         LOG.info("Laser micrometer measurement triggered.")
@@ -532,6 +1143,11 @@ class HandlerClass:
             color = self.w.dro_label_1.palette().color(QtGui.QPalette.Foreground).name()
             self.w.PREFS_.putpref('DRO_Color', color, str, 'CUSTOM_FORM_ENTRIES')
         self.stopSimulation()
+        self.statusService.stop()
+        LOG.debug("DRO updates: %s", self.dro.stats())
+        self.camRunner.shutdown()
+        self.prefetcher.shutdown()
+        self.analysisCache.flush()
         LOG.info("IntuiGUI closing cleanup called.")
 
     def __getitem__(self, item):
@@ -0,0 +1,45 @@
+# The widgets are deployed into qtvcp/widgets; the tests import them from
+# this tree instead of the installed copies.  qtvcp itself comes from the
+# LinuxCNC installation.
+
+import os
+import time
+
+import pytest
+import qtvcp.widgets
+
+WIDGETS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'widgets')
+qtvcp.widgets.__path__.insert(0, WIDGETS)
+
+
+@pytest.fixture(scope='session')
+def qapp():
+    from PyQt5.QtCore import QCoreApplication
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+@pytest.fixture
+def program(tmp_path):
+    """
+    Writes a G-code program and returns its path.
+    """
+    def write(text, name='program.ngc'):
+        path = tmp_path / name
+        path.write_text(text)
+        return str(path)
+    return write
+
+
+@pytest.fixture
+def wait_for(qapp):
+    """
+    Runs the event loop until condition() holds or timeout passes, and
+    returns condition().
+    """
+    def wait(condition, timeout=10.0):
+        end = time.monotonic() + timeout
+        while not condition() and time.monotonic() < end:
+            qapp.processEvents()
+            time.sleep(0.01)
+        return condition()
+    return wait
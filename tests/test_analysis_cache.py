@@ -0,0 +1,76 @@
+import os
+import shutil
+
+from qtvcp.widgets.analysis_cache import AnalysisCache
+
+PROGRAM = 'G18 G21\nG0 X10 Z2\nG1 Z-10 F100\nM30\n'
+
+
+def make_cache(tmp_path, max_bytes=1 << 20):
+    return AnalysisCache(str(tmp_path / 'cache'), max_bytes)
+
+
+def touch(path, seconds=10):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + seconds * 10 ** 9))
+
+
+def test_touched_file_moves_its_entry(tmp_path, program):
+    cache = make_cache(tmp_path)
+    path = program(PROGRAM)
+    cache.put_json(path, 'summary.json', {'tools': [1]})
+    touch(path)
+    # The GUI thread only matches the current identity
+    assert cache.get_json(path, 'summary.json', rehash=False) is None
+    assert cache.get_json(path, 'summary.json') == {'tools': [1]}
+    assert len(cache.index) == 1
+    assert cache.get_json(path, 'summary.json', rehash=False) == {'tools': [1]}
+
+
+def test_copy_shares_the_results(tmp_path, program):
+    cache = make_cache(tmp_path)
+    path = program(PROGRAM)
+    cache.put(path, 'toolpath.bin', b'points')
+    copy = str(tmp_path / 'copy.ngc')
+    shutil.copy(path, copy)
+    assert cache.get(copy, 'toolpath.bin') == b'points'
+    assert len(cache.index) == 2
+    # Each keeps its own entry
+    cache.put(copy, 'toolpath.bin', b'other')
+    assert cache.get(path, 'toolpath.bin') == b'points'
+
+
+def test_changed_content_misses(tmp_path, program):
+    cache = make_cache(tmp_path)
+    path = program(PROGRAM)
+    cache.put(path, 'toolpath.bin', b'points')
+    program(PROGRAM.replace('X10', 'X20'))
+    touch(path)
+    assert cache.get(path, 'toolpath.bin') is None
+    assert cache.misses == 1
+
+
+def test_eviction_keeps_the_budget_and_the_new_entry(tmp_path, program):
+    cache = make_cache(tmp_path, max_bytes=2500)
+    paths = [program('G0 X{}\nM30\n'.format(i), 'p{}.ngc'.format(i)) for i in range(3)]
+    for path in paths[:2]:
+        cache.put(path, 'blob', b'x' * 1000)
+    # The first program was used last: the second one goes
+    assert cache.get(paths[0], 'blob') is not None
+    cache.put(paths[2], 'blob', b'x' * 1000)
+    assert cache.total_bytes() <= 2500
+    assert cache.get(paths[1], 'blob') is None
+    assert cache.get(paths[0], 'blob') is not None
+    assert cache.get(paths[2], 'blob') is not None
+    # A blob over the whole budget is still kept, alone
+    cache.put(paths[1], 'blob', b'x' * 3000)
+    assert [e['path'] for e in cache.index.values()] == [os.path.realpath(paths[1])]
+
+
+def test_index_survives_a_new_instance(tmp_path, program):
+    cache = make_cache(tmp_path)
+    path = program(PROGRAM)
+    cache.put(path, 'blob', b'data')
+    cache.get(path, 'blob')
+    cache.flush()
+    assert make_cache(tmp_path).get(path, 'blob') == b'data'
@@ -0,0 +1,55 @@
+from qtvcp.widgets.analysis_worker import AnalysisRunner, THREAD, WIZARD_CHANNEL
+from qtvcp.widgets.gcode_analyzer import AnalysisCancelled
+
+
+def answer(value, progress=None, cancelled=None):
+    progress(1.0)
+    return value
+
+
+def wait_forever(progress=None, cancelled=None):
+    while not cancelled():
+        pass
+    raise AnalysisCancelled('job')
+
+
+def fail(progress=None, cancelled=None):
+    raise ValueError('broken program')
+
+
+def record(runner):
+    events = []
+    runner.finished.connect(lambda job, value: events.append(('finished', job, value)))
+    runner.failed.connect(lambda job, message: events.append(('failed', job, message)))
+    return events
+
+
+def test_results_arrive_after_submit_returns(qapp, wait_for):
+    runner = AnalysisRunner(threads=1)
+    events = record(runner)
+    try:
+        # Done before submit() hands out the id: still reported later
+        job = runner.submit(answer, 42, kind=THREAD)
+        assert events == []
+        assert wait_for(lambda: events)
+        assert events == [('finished', job, 42)]
+        job = runner.submit(fail, kind=THREAD)
+        assert wait_for(lambda: len(events) == 2)
+        assert events[1] == ('failed', job, 'broken program')
+    finally:
+        runner.shutdown()
+
+
+def test_cancelled_jobs_report_nothing(qapp, wait_for):
+    runner = AnalysisRunner(threads=2)
+    events = record(runner)
+    try:
+        job = runner.submit(wait_forever, kind=THREAD)
+        assert runner.busy(WIZARD_CHANNEL)
+        runner.cancel(WIZARD_CHANNEL)
+        assert not runner.is_active(job) and not runner.busy(WIZARD_CHANNEL)
+        other = runner.submit(answer, 'next', kind=THREAD)
+        assert wait_for(lambda: events)
+        assert events == [('finished', other, 'next')]
+    finally:
+        runner.shutdown()
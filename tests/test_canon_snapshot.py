@@ -0,0 +1,58 @@
+import pytest
+
+from qtvcp.widgets.analysis_cache import AnalysisCache
+from qtvcp.widgets.canon_snapshot import CanonSnapshot, load_canon, store_canon
+
+
+class Canon:
+    pass
+
+
+def make_canon(n=50):
+    points = [(0.1 * i, 0.0, -0.2 * i, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0) for i in range(n + 1)]
+    canon = Canon()
+    canon.traverse = []
+    canon.feed = [(10 + i, points[i], points[i + 1], 100.0, [0.0, 0.0, 0.0]) for i in range(n)]
+    canon.arcfeed = [(99, points[0], points[-1], 50.0, [0.0, 0.0, -0.0])]
+    canon.dwells = [(7, (1.0, 0.5, 0.0), 1.0, 2.0, 3.0, 0)]
+    canon.tool_list = [1, 4]
+    return canon
+
+
+def test_round_trip_restores_every_list(tmp_path):
+    canon = make_canon()
+    snapshot = CanonSnapshot.from_canon(canon)
+    blob = tmp_path / 'canon.bin'
+    blob.write_bytes(snapshot.to_bytes())
+    restored = CanonSnapshot.load(str(blob))
+    for name, records in snapshot.lists.items():
+        assert restored.lists[name] == records
+    feed = restored.lists['feed']
+    assert isinstance(feed[0][1], tuple) and isinstance(feed[0][4], list)
+    # Points shared between neighbouring segments are built once
+    assert feed[1][1] is feed[0][2]
+    target = Canon()
+    restored.apply(target)
+    assert target.feed == canon.feed and target.traverse == []
+    assert len(restored) == 51
+
+
+def test_non_numeric_lists_are_not_stored(tmp_path):
+    canon = make_canon()
+    canon.dwells = [(7, 'red', 1.0, 2.0, 3.0, 0)]
+    with pytest.raises(ValueError):
+        CanonSnapshot.from_canon(canon).to_bytes()
+    cache = AnalysisCache(str(tmp_path / 'cache'))
+    program = tmp_path / 'a.ngc'
+    program.write_text('G0 X1\nM2\n')
+    store_canon(cache, str(program), 'key', CanonSnapshot.from_canon(canon))
+    assert load_canon(cache, str(program), 'key') is None
+
+
+def test_cache_is_keyed_by_configuration(tmp_path):
+    cache = AnalysisCache(str(tmp_path / 'cache'))
+    program = tmp_path / 'a.ngc'
+    program.write_text('G0 X1\nM2\n')
+    store_canon(cache, str(program), 'one', CanonSnapshot.from_canon(make_canon()))
+    assert load_canon(cache, str(program), 'two') is None
+    assert load_canon(cache, str(program), 'one', rehash=False).lists['tool_list'] == [1, 4]
@@ -0,0 +1,107 @@
+import math
+
+import numpy as np
+import pytest
+
+from qtvcp.widgets.analysis_cache import AnalysisCache
+from qtvcp.widgets.cycle_time import (CycleTime, MachineLimits, estimate_cycle_time, load_cycle_time,
+                                      store_cycle_time)
+from qtvcp.widgets.toolpath import FEED, FLAG_FEED_PER_REV, RAPID, ToolpathBuilder
+
+
+def limits(velocity=50.0, acceleration=100.0):
+    return MachineLimits((velocity,) * 3, (acceleration,) * 3, velocity)
+
+
+def feed_path(*moves):
+    """
+    moves: (end, line, feed mm/min, flags, spindle, tool) from the origin.
+    """
+    builder = ToolpathBuilder()
+    for end, line, feed, flags, spindle, tool in moves:
+        builder.add(end, FEED, line, feed, spindle, flags, tool)
+    return builder.finish()
+
+
+def test_trapezoid_and_triangle_profiles():
+    # 100 mm at 10 mm/s, 100 mm/s^2: 0.1 s to reach speed at either end
+    path = feed_path(((100.0, 0.0, 0.0), 1, 600.0, 0, 0.0, 1))
+    assert estimate_cycle_time(path, limits()).total == pytest.approx(10.1)
+    # 1 mm never reaches 10 mm/s at 10 mm/s^2: peak sqrt(a * L)
+    path = feed_path(((1.0, 0.0, 0.0), 1, 600.0, 0, 0.0, 1))
+    assert estimate_cycle_time(path, limits(acceleration=10.0)).total == pytest.approx(2 / math.sqrt(10))
+    # Unlimited acceleration: length / speed
+    assert estimate_cycle_time(path, MachineLimits()).total == pytest.approx(0.1)
+
+
+def test_corners_slow_down_and_straight_joints_do_not():
+    straight = feed_path(((50.0, 0.0, 0.0), 1, 600.0, 0, 0.0, 1),
+                         ((100.0, 0.0, 0.0), 2, 600.0, 0, 0.0, 1))
+    assert estimate_cycle_time(straight, limits()).total == pytest.approx(10.1)
+    corner = feed_path(((50.0, 0.0, 0.0), 1, 600.0, 0, 0.0, 1),
+                       ((50.0, 0.0, 50.0), 2, 600.0, 0, 0.0, 1))
+    assert 10.1 < estimate_cycle_time(corner, limits()).total < 10.2
+    # Reversing stops: two full trapezoids of 50 mm
+    back = feed_path(((50.0, 0.0, 0.0), 1, 600.0, 0, 0.0, 1),
+                     ((0.0, 0.0, 0.0), 2, 600.0, 0, 0.0, 1))
+    assert estimate_cycle_time(back, limits()).total == pytest.approx(10.2)
+
+
+def test_feed_per_revolution_and_rapids():
+    # F0.2 mm/rev at 600 rpm: 2 mm/s
+    path = feed_path(((20.0, 0.0, 0.0), 1, 0.2, FLAG_FEED_PER_REV, 600.0, 1))
+    assert estimate_cycle_time(path, MachineLimits()).total == pytest.approx(10.0)
+    builder = ToolpathBuilder()
+    builder.add((0.0, 0.0, 100.0), RAPID, 1, 0.0, 0.0, 0, 1)
+    assert estimate_cycle_time(builder.finish(), limits(velocity=20.0, acceleration=math.inf)).total \
+        == pytest.approx(5.0)
+
+
+def test_time_per_tool_and_line_with_dwells():
+    builder = ToolpathBuilder()
+    builder.add((10.0, 0.0, 0.0), FEED, 1, 600.0, 0.0, 0, 1)
+    builder.add_dwell(2, 1.5)
+    builder.add((20.0, 0.0, 0.0), FEED, 3, 600.0, 0.0, 0, 2)
+    cycle = estimate_cycle_time(builder.finish(), MachineLimits(), line_count=5)
+    assert cycle.total == pytest.approx(3.5)
+    assert cycle.dwell == pytest.approx(1.5)
+    assert cycle.per_tool == pytest.approx({1: 2.5, 2: 1.0})
+    assert cycle.per_line.tolist() == pytest.approx([0.0, 1.0, 1.5, 1.0, 0.0])
+
+
+def test_estimate_round_trip_and_cache(tmp_path, program):
+    path = feed_path(((100.0, 0.0, 0.0), 1, 600.0, 0, 0.0, 1))
+    cycle = estimate_cycle_time(path, limits())
+    copy = CycleTime.from_bytes(cycle.to_bytes())
+    assert copy.total == cycle.total and copy.dwell == cycle.dwell
+    assert copy.per_tool == cycle.per_tool
+    assert np.array_equal(copy.per_line, cycle.per_line)
+    assert np.array_equal(copy.segment_time, cycle.segment_time)
+
+    cache = AnalysisCache(str(tmp_path / 'cache'))
+    name = program('G1 X100 F600\nM30\n')
+    store_cycle_time(cache, name, limits(), cycle)
+    assert load_cycle_time(cache, name, limits()).total == cycle.total
+    # Other machine limits, other estimate
+    assert load_cycle_time(cache, name, limits(velocity=10.0)) is None
+
+
+class Ini:
+    def __init__(self, values):
+        self.values = values
+
+    def find(self, section, option):
+        return self.values.get((section, option))
+
+
+def test_limits_from_an_inch_ini():
+    ini = Ini({('TRAJ', 'LINEAR_UNITS'): 'inch', ('TRAJ', 'MAX_LINEAR_VELOCITY'): '2',
+               ('AXIS_X', 'MAX_VELOCITY'): '1', ('AXIS_X', 'MAX_ACCELERATION'): '10',
+               ('DISPLAY', 'MAX_SPINDLE_0_SPEED'): '3000'})
+    machine = MachineLimits.from_ini(ini)
+    assert machine.max_velocity[0] == pytest.approx(25.4)
+    assert machine.max_acceleration[0] == pytest.approx(254.0)
+    assert math.isinf(machine.max_velocity[2])
+    assert machine.default_velocity == pytest.approx(50.8)
+    assert machine.max_spindle == 3000.0
+    assert machine.key() != MachineLimits().key()
@@ -0,0 +1,46 @@
+from qtvcp.widgets.dro_pipeline import DroPipeline, TEXT_CACHE_SIZE
+
+
+class Label:
+    def __init__(self):
+        self.texts = []
+
+    def setText(self, text):
+        self.texts.append(text)
+
+
+def test_only_changed_texts_are_set():
+    x, z = Label(), Label()
+    dro = DroPipeline()
+    dro.add('x', x)
+    dro.add('z', z, resolution=0.001, fmt='{:.3f}')
+    dro.add('missing', None)
+    assert set(dro.channels) == {'x', 'z'}
+    dro.update({'x': 1.0, 'z': -2.0, 'missing': 3.0})
+    # Below the display resolution: nothing to paint
+    dro.update({'x': 1.001, 'z': -2.0, 'rpm': 500})
+    dro.update({'x': 1.006, 'z': None})
+    assert x.texts == ['1.00', '1.01']
+    assert z.texts == ['-2.000']
+    assert dro.stats() == {'updates': 5, 'changed': 3, 'suppressed': 2}
+
+
+def test_invalidate_sets_every_text_again():
+    x = Label()
+    dro = DroPipeline()
+    dro.add('x', x)
+    dro.update({'x': 0.5})
+    dro.invalidate()
+    dro.update({'x': 0.5})
+    assert x.texts == ['0.50', '0.50']
+
+
+def test_text_cache_stays_bounded():
+    x = Label()
+    dro = DroPipeline()
+    dro.add('x', x)
+    for i in range(3 * TEXT_CACHE_SIZE):
+        dro.update({'x': i * 0.01})
+    channel = dro.channels['x']
+    assert len(channel._texts) <= TEXT_CACHE_SIZE
+    assert x.texts[-1] == '{:.2f}'.format((3 * TEXT_CACHE_SIZE - 1) * 0.01)
@@ -0,0 +1,107 @@
+import random
+
+import numpy as np
+import pytest
+
+from qtvcp.widgets.gcode_analyzer import analyze_file, GCodeAnalyzer, InexactProgram
+from qtvcp.widgets.toolpath import ToolpathBuilder
+
+# What a program for this lathe usually looks like: diameter mode, constant
+# surface speed, feed per revolution, arcs by radius and G33 threading.
+LATHE_PROGRAM = """\
+%
+(facing and turning, 40 mm bar)
+G7 G18 G21 G40 G49 G80 G90 G54
+G64 P0.01
+T1 M6 G43
+G96 D2500 S180 M3 M8
+G95 F0.2
+G0 X42 Z2
+G1 Z0
+X-0.5
+G0 X40 Z1
+G1 X36 Z0 F0.15
+Z-30
+G2 X40 Z-32 R2
+G1 Z-50
+G0 X42 Z2
+G97 S800
+T2 M6 G43
+G33 X36 Z-20 K1.5
+G0 X42
+Z2
+M5 M9
+G0 X60 Z50
+M30
+%
+"""
+
+
+def test_lathe_program_previews_exactly(program):
+    # Falling back to the interpreter must stay the exception
+    summary = analyze_file(program(LATHE_PROGRAM), toolpath=True, exact=True)
+    assert summary.unsupported is None
+    assert summary.tools == [1, 2]
+    assert summary.work_offsets == ['G54']
+    assert summary.css_used
+
+
+@pytest.mark.parametrize('line, word', [
+    ('G76 P1.5 Z-20 I-1 J0.1 K0.9', 'G76'),
+    ('G71 Q1 D1 I0.5 R1', 'G71'),
+    ('#1 = 5', '#1'),
+    ('O100 sub', 'O100'),
+    ('G1 X[2 * 3]', '['),
+])
+def test_inexact_constructs_stop_the_preview(program, line, word):
+    text = 'G7 G18 G21\nG0 X40 Z2\n{}\nM30\n'.format(line)
+    with pytest.raises(InexactProgram) as raised:
+        analyze_file(program(text), toolpath=True, exact=True)
+    assert raised.value.lineno == 3
+    assert raised.value.word == word
+
+
+# Lines the block scanner must hand to the line parser, or read the same way
+ODD_LINES = [
+    'X 1', '1X', 'X1-2', 'X.', 'X-', 'X+.', 'X1..2', 'X.5 Z-.25', 'Z+3', 'X-0.',
+    'X12345678901234567890123', 'X1X2', 'G1X1Z1', 'G01 X2', 'G2 X4 Z-2 R2',
+    'G3 X2 Z-4 I0 K-1', 'G91 X1', 'G90', 'G95 F.1', 'G94 F100', 'S500 M3', 'M5',
+    'T0202', 'N10 G0 X5', 'X1 (comment) Z2', 'X3 ; comment', 'Z0.000001',
+]
+
+
+def analyze_lines(path):
+    """
+    The same analysis as analyze_file(), one line at a time.
+    """
+    builder = ToolpathBuilder()
+    analyzer = GCodeAnalyzer(path, builder)
+    with open(path, 'rb') as f:
+        for lineno, raw in enumerate(f, 1):
+            if not analyzer.feed_line(raw, lineno):
+                break
+    summary = analyzer.finish()
+    summary.line_count = lineno
+    summary.toolpath = builder.finish()
+    return summary
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_blocks_are_analyzed_like_lines(program, seed):
+    rng = random.Random(seed)
+    lines = ['G7 G18 G21 G90 T1 M6 S500 M3 F100', 'G0 X10 Z5']
+    for i in range(2000):
+        if rng.random() < 0.9:
+            lines.append('{} X{:.3f} Z{:.4f}'.format(rng.choice(('G1', 'G0', '')), rng.uniform(-50, 50), rng.uniform(-50, 5)))
+        else:
+            lines.append(rng.choice(ODD_LINES))
+    path = program('\n'.join(lines) + '\nM30\n')
+
+    expected = analyze_lines(path)
+    summary = analyze_file(path, toolpath=True)
+    got = summary.to_dict()
+    for name, value in expected.to_dict().items():
+        if name not in ('size', 'mtime'):
+            assert got[name] == pytest.approx(value), name
+    for name in ('points', 'kind', 'line', 'feed', 'spindle', 'flags', 'tool'):
+        np.testing.assert_allclose(getattr(summary.toolpath, name), getattr(expected.toolpath, name), err_msg=name)
@@ -0,0 +1,62 @@
+import numpy as np
+
+from qtvcp.widgets.line_ranges import LineRanges
+
+
+def segments_of(lines, line):
+    return [i for i, n in enumerate(lines) if n == line]
+
+
+def as_list(found):
+    if isinstance(found, slice):
+        return list(range(found.start, found.stop))
+    return found.tolist()
+
+
+def test_lines_in_order_map_to_slices():
+    lines = [1, 1, 2, 4, 4, 4, 7]
+    ranges = LineRanges(lines, line_count=10)
+    assert ranges.order is None and len(ranges) == 10
+    for line in range(-1, 12):
+        found = ranges.segments(line)
+        assert isinstance(found, slice)
+        assert as_list(found) == segments_of(lines, line)
+        assert ranges.count(line) == len(segments_of(lines, line))
+
+
+def test_lines_out_of_order_keep_segment_order():
+    # A subroutine at lines 20-22 called twice from the main program
+    lines = [1, 2, 20, 21, 22, 3, 20, 21, 22, 4, 2]
+    ranges = LineRanges(lines)
+    assert ranges.order is not None and len(ranges) == 23
+    for line in range(25):
+        assert as_list(ranges.segments(line)) == segments_of(lines, line)
+        assert ranges.count(line) == len(segments_of(lines, line))
+
+
+def test_random_lists_against_a_scan():
+    rng = np.random.default_rng(1)
+    lines = rng.integers(0, 300, 5000)
+    ranges = LineRanges(lines)
+    for line in rng.integers(-5, 310, 100).tolist():
+        assert as_list(ranges.segments(line)) == segments_of(lines.tolist(), line)
+
+
+def test_empty_lists():
+    ranges = LineRanges([])
+    assert len(ranges) == 0 and ranges.count(0) == 0
+    assert as_list(ranges.segments(0)) == []
+
+
+class Canon:
+    traverse = [(1, None, None), (5, None, None)]
+    feed = [(3, None, None), (2, None, None)]
+    arcfeed = None
+
+
+def test_ranges_of_a_canon():
+    ranges = LineRanges.from_canon(Canon(), line_count=8)
+    assert set(ranges) == {'traverse', 'feed', 'arcfeed'}
+    assert as_list(ranges['feed'].segments(2)) == [1]
+    assert ranges['traverse'].count(5) == 1
+    assert len(ranges['arcfeed']) == 8 and ranges['arcfeed'].count(1) == 0
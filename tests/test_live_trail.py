@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('OpenGL')
+
+from qtvcp.widgets.live_trail import LiveTrail  # noqa: E402
+
+RED = (255, 0, 0, 255)
+GREEN = (0, 255, 0, 255)
+
+
+def zigzag(n):
+    # No three points in a line, so none are merged
+    return [(float(i), float(i % 2), 0.0) for i in range(n)]
+
+
+def test_straight_moves_are_merged():
+    trail = LiveTrail(capacity=16)
+    for x in range(4):
+        assert trail.append((x, 0.0, 0.0), RED)
+    assert len(trail) == 2 and trail.merged == 2
+    assert trail.points[1].tolist() == [3.0, 0.0, 0.0]
+    # The same position again, another colour, a move back
+    assert not trail.append((3.0, 0.0, 0.0), RED)
+    trail.append((4.0, 0.0, 0.0), GREEN)
+    trail.append((1.0, 0.0, 0.0), GREEN)
+    assert len(trail) == 4 and trail.merged == 2
+
+
+def test_full_buffer_thins_its_older_half():
+    trail = LiveTrail(capacity=8)
+    points = zigzag(9)
+    for p in points:
+        trail.append(p, RED)
+    assert trail.decimations == 1
+    # Even points 0, 2 and the last one (3) of the older half, then the rest
+    kept = [p[0] for p in trail.points[:len(trail)].tolist()]
+    assert kept == [0.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0]
+
+
+def test_long_runs_stay_bounded_and_in_order():
+    rng = np.random.default_rng(0)
+    trail = LiveTrail(capacity=100)
+    points = zigzag(5000)
+    colors = [RED if c else GREEN for c in rng.integers(0, 2, len(points))]
+    for p, color in zip(points, colors):
+        trail.append(p, color)
+        assert len(trail) <= trail.capacity
+    x = trail.points[:len(trail), 0]
+    assert x[0] == 0.0 and x[-1] == 4999.0
+    assert np.all(np.diff(x) > 0)
+    # Each kept point still has the colour it was drawn in
+    for xi, color in zip(x.astype(int).tolist(), trail.colors[:len(trail)].tolist()):
+        assert tuple(color) == colors[xi]
+    # The newest points are all there
+    assert x[-40:].tolist() == list(range(4960, 5000))
+    trail.clear()
+    assert len(trail) == 0
@@ -0,0 +1,62 @@
+import os
+
+from qtvcp.widgets.gcode_analyzer import analyze_file
+from qtvcp.widgets.parameter_file import ParameterFile, work_offset_param, zero_point
+
+# Active system G55; G54 at X1 Z3, G55 at X10 Z30
+VARS = """\
+5220\t2.000000
+5221\t1.000000
+5222\t2.000000
+5223\t3.000000
+5241\t10.000000
+5242\t20.000000
+5243\t30.000000
+"""
+
+
+def write_vars(tmp_path, text, later=0):
+    path = tmp_path / 'sim.var'
+    path.write_text(text)
+    if later:
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + later * 10 ** 9))
+    return str(path)
+
+
+def test_file_is_read_again_only_when_it_changes(tmp_path):
+    parameters = ParameterFile(write_vars(tmp_path, VARS))
+    assert parameters.refresh()
+    assert not parameters.refresh()
+    assert parameters.active_system() == 2
+    assert parameters.work_offset(2)[:3] == (10.0, 20.0, 30.0)
+    assert parameters.reads == 1
+    write_vars(tmp_path, VARS.replace('5241\t10.', '5241\t11.'), later=1)
+    assert parameters.work_offset(2)[0] == 11.0
+    assert parameters.reads == 2
+
+
+def test_missing_file_reads_as_zero(tmp_path):
+    parameters = ParameterFile(str(tmp_path / 'none.var'))
+    assert not parameters.refresh()
+    assert parameters.active_system() == 1
+    assert parameters.work_offset(1) == (0.0,) * 9
+
+
+def test_parameter_numbers():
+    assert work_offset_param(1, 'X') == 5221
+    assert work_offset_param(2, 'Z') == 5243
+    assert work_offset_param(9, 'W') == 5389
+
+
+def test_zero_point_follows_the_program(tmp_path, program):
+    parameters = ParameterFile(write_vars(tmp_path, VARS))
+    # No program: the active system
+    assert zero_point(None, parameters) == (10.0, 20.0, 30.0)
+    summary = analyze_file(program('G54\nG0 X1 Z1\nM30\n'))
+    assert zero_point(summary, parameters) == (1.0, 2.0, 3.0)
+    # G10 L2 setting the program's own system wins over the file
+    summary = analyze_file(program('G10 L2 P1 X5\nG54\nG0 X1 Z1\nM30\n'))
+    assert zero_point(summary, parameters) == (5.0, 2.0, 3.0)
+    summary = analyze_file(program('G10 L2 P3 X5\nG54\nG0 X1 Z1\nM30\n'))
+    assert zero_point(summary, parameters) == (1.0, 2.0, 3.0)
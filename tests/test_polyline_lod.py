@@ -0,0 +1,69 @@
+import math
+
+import numpy as np
+
+from qtvcp.widgets.polyline_lod import PolylineLod
+
+
+def arc_segments(n, first_line=1, center=(0.0, 0.0, 0.0), radius=1.0, feed=10.0):
+    """
+    A half circle in the XZ plane as n canon feed segments.
+    """
+    angle = np.linspace(0.0, math.pi, n + 1)
+    points = [(center[0] + radius * math.cos(a), 0.0, center[2] + radius * math.sin(a)) for a in angle]
+    return [(first_line + i, points[i], points[i + 1], feed) for i in range(n)]
+
+
+def distance_to(points, segments):
+    a = np.array([s[1] for s in segments])
+    b = np.array([s[2] for s in segments])
+    ab = b - a
+    best = []
+    for p in points:
+        t = np.clip(np.einsum('ij,ij->i', p - a, ab) / np.einsum('ij,ij->i', ab, ab), 0.0, 1.0)
+        d = p - (a + ab * t[:, None])
+        best.append(np.sqrt(np.einsum('ij,ij->i', d, d)).min())
+    return np.array(best)
+
+
+def test_levels_stay_within_their_tolerance():
+    segments = arc_segments(2000)
+    lod = PolylineLod(segments, base_tolerance=1e-5)
+    assert len(lod) > 2
+    original = np.array([s[2] for s in segments])
+    previous = len(segments)
+    for level in range(1, len(lod)):
+        coarse = lod.segments_at(level)
+        assert len(coarse) < previous
+        previous = len(coarse)
+        assert distance_to(original, coarse).max() <= lod.tolerance(level) + 1e-12
+        # The chain still starts and ends where it did, joined up
+        assert coarse[0][1] == segments[0][1] and coarse[-1][2] == segments[-1][2]
+        assert all(a[2] == b[1] for a, b in zip(coarse, coarse[1:]))
+        # A simplified segment keeps the line and feed of the segment it ends with
+        for entry in coarse:
+            source = segments[entry[0] - 1]
+            assert entry[2] == source[2] and entry[3] == source[3]
+
+
+def test_separate_chains_are_not_joined():
+    first = arc_segments(500)
+    second = arc_segments(500, first_line=1001, center=(5.0, 0.0, 0.0))
+    lod = PolylineLod(first + second, base_tolerance=1e-4)
+    coarse = lod.segments_at(len(lod) - 1)
+    # No segment spans the gap between the two arcs
+    assert all(abs(s[2][0] - s[1][0]) < 2.5 for s in coarse)
+    ends = {s[2] for s in coarse}
+    assert first[-1][2] in ends and second[-1][2] in ends
+    assert second[0][1] in {s[1] for s in coarse}
+
+
+def test_level_for_an_error_budget():
+    lod = PolylineLod(arc_segments(2000), base_tolerance=1e-5, step=4.0)
+    assert lod.level_for(0.0) == 0
+    assert lod.level_for(1e-5) == 1
+    assert lod.level_for(4.5e-5) == 2
+    assert lod.segments_at(99) is lod.segments_at(len(lod) - 1)
+    # Too short to simplify
+    short = PolylineLod(arc_segments(1))
+    assert len(short) == 1 and short.segments_at(3) == short.segments
@@ -0,0 +1,53 @@
+import pytest
+
+from qtvcp.widgets.pose_buffer import PoseBuffer
+
+
+def steady_buffer(interval=0.1, count=30):
+    """
+    A buffer fed at a steady rate, moving X 1 mm per sample.
+    """
+    poses = PoseBuffer(clock=lambda: 0.0)
+    for i in range(count):
+        poses.push(float(i), 0.0, t=i * interval)
+    return poses
+
+
+def test_poses_are_interpolated_one_interval_behind():
+    poses = steady_buffer()
+    assert poses.delay == pytest.approx(0.1, rel=1e-2)
+    delay = poses.delay
+    x, z = poses.position(2.05 + delay)
+    assert x == pytest.approx(20.5) and z == 0.0
+    # Before the oldest sample kept
+    assert poses.position(0.0) == (14.0, 0.0)
+
+
+def test_late_samples_are_extrapolated_briefly():
+    poses = steady_buffer()
+    last = 2.9 + poses.delay
+    assert poses.position(last + 0.1)[0] == pytest.approx(30.0)
+    # Held after max_extrapolation
+    assert poses.position(last + 5.0)[0] == pytest.approx(29.0 + poses.max_extrapolation * 10)
+    assert poses.moving(2.95) and not poses.moving(10.0)
+
+
+def test_same_timestamp_keeps_the_newer_pose():
+    poses = PoseBuffer(clock=lambda: 0.0)
+    assert poses.position() is None
+    poses.push(1.0, 2.0, t=1.0)
+    poses.push(3.0, 4.0, t=1.0)
+    assert len(poses) == 1 and poses.position(5.0) == (3.0, 4.0)
+
+
+def test_spindle_angle_is_integrated_from_rpm():
+    poses = PoseBuffer(clock=lambda: 0.0)
+    poses.set_rpm(60.0, t=0.0)
+    # One turn per second
+    assert poses.angle(0.25) == pytest.approx(90.0)
+    poses.set_rpm(120.0, t=0.5)
+    assert poses.angle(0.75) == pytest.approx(0.0)
+    assert poses.moving(100.0)
+    poses.set_rpm(0.0, t=1.0)
+    assert poses.angle(9.0) == pytest.approx(180.0)
+    assert not poses.moving(9.0)
@@ -0,0 +1,65 @@
+import pytest
+
+from qtvcp.widgets.program_eta import EtaTracker, LineTimeIndex
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_line_time_index():
+    index = LineTimeIndex([0.0, 2.0, 3.0, 5.0])
+    assert len(index) == 4 and index.total == 10.0
+    assert [index.elapsed(n) for n in (-1, 0, 1, 2, 3, 4, 9)] == [0.0, 0.0, 0.0, 2.0, 5.0, 10.0, 10.0]
+    assert index.line_time(2) == 3.0 and index.line_time(7) == 0.0
+    assert index.remaining(3) == 5.0
+
+
+def test_remaining_time_counts_down_through_a_line():
+    clock = Clock()
+    eta = EtaTracker(clock=clock)
+    assert eta.remaining() is None
+    eta.start(LineTimeIndex([0.0, 4.0, 6.0]))
+    assert eta.remaining() == 10.0
+    eta.update(1)
+    clock.now += 3.0
+    assert eta.remaining() == 7.0
+    # Running over the line's estimate holds at the next line's start
+    clock.now += 3.0
+    assert eta.remaining() == 6.0
+    eta.stop()
+    assert eta.remaining() is None
+
+
+def test_feed_hold_stops_the_clock():
+    clock = Clock()
+    eta = EtaTracker(clock=clock)
+    eta.start(LineTimeIndex([10.0]))
+    clock.now += 2.0
+    eta.pause(True)
+    clock.now += 30.0
+    assert eta.remaining() == 8.0 and eta.actual() == 2.0
+    eta.pause(False)
+    clock.now += 1.0
+    assert eta.remaining() == 7.0 and eta.actual() == 3.0
+
+
+def test_slow_running_scales_the_rest_of_the_program():
+    clock = Clock()
+    eta = EtaTracker(smoothing=1.0, min_elapsed=5.0, clock=clock)
+    eta.start(LineTimeIndex([10.0, 10.0, 10.0]))
+    # Twice the estimate for the first line
+    clock.now += 20.0
+    eta.update(1)
+    assert eta.factor == pytest.approx(2.0)
+    assert eta.remaining() == pytest.approx(40.0)
+    # Too little of the estimate passed to correct it yet
+    short = EtaTracker(min_elapsed=15.0, clock=clock)
+    short.start(LineTimeIndex([10.0, 10.0]))
+    clock.now += 20.0
+    short.update(1)
+    assert short.factor == 1.0
@@ -0,0 +1,78 @@
+import os
+
+import pytest
+
+from qtvcp.widgets.analysis_cache import AnalysisCache
+from qtvcp.widgets.program_prefetch import ProgramPrefetcher, file_stamp
+
+PROGRAM = 'G18 G21\nT1 M6\nG0 X10 Z2\nG1 Z-10 F100\nM30\n'
+
+
+@pytest.fixture
+def prefetcher(qapp, tmp_path):
+    prefetcher = ProgramPrefetcher(AnalysisCache(str(tmp_path / 'cache')), max_jobs=1, nice=0)
+    yield prefetcher
+    prefetcher.shutdown()
+
+
+def rewrite(program, text):
+    path = program(text)
+    st = os.stat(path)
+    # A later modification time even on coarse file system clocks
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    return path
+
+
+def test_result_follows_the_file_contents(prefetcher, program, wait_for):
+    ready = []
+    prefetcher.ready.connect(lambda path, summary: ready.append(path))
+    path = program(PROGRAM)
+    prefetcher.prefetch(path)
+    assert prefetcher.pending(path)
+    assert wait_for(lambda: prefetcher.result(path) is not None)
+    assert ready == [path] and prefetcher.started == 1
+    assert prefetcher.result(path).tools == [1]
+    # Highlighting it again changes nothing
+    prefetcher.prefetch(path)
+    assert not prefetcher.pending(path)
+
+    rewrite(program, PROGRAM.replace('T1', 'T2'))
+    assert prefetcher.result(path) is None
+    prefetcher.prefetch(path)
+    assert wait_for(lambda: prefetcher.result(path) is not None)
+    assert prefetcher.result(path).tools == [2]
+
+
+def test_cached_analysis_is_not_parsed_again(prefetcher, program, wait_for, tmp_path):
+    path = program(PROGRAM)
+    prefetcher.prefetch(path)
+    assert wait_for(lambda: prefetcher.result(path) is not None)
+    prefetcher.runner.shutdown()
+    prefetcher.cache.flush()
+    other = ProgramPrefetcher(AnalysisCache(str(tmp_path / 'cache')), max_jobs=1, nice=0)
+    try:
+        other.prefetch(path)
+        assert wait_for(lambda: other.result(path) is not None)
+        assert other.hits == 1 and other.started == 0
+    finally:
+        other.shutdown()
+
+
+def test_result_of_old_contents_is_not_published(prefetcher, program, wait_for):
+    ready = []
+    prefetcher.ready.connect(lambda path, summary: ready.append(summary))
+    path = program(PROGRAM)
+    stamp = file_stamp(path)
+    prefetcher._jobs['old'] = (path, stamp)
+    rewrite(program, PROGRAM.replace('T1', 'T2'))
+    # The job finishing on the contents it started from
+    prefetcher._on_finished('old', 'summary of T1')
+    assert 'summary of T1' not in ready and prefetcher.result(path) is None
+    assert prefetcher.pending(path)
+    assert wait_for(lambda: prefetcher.result(path) is not None)
+    assert prefetcher.result(path).tools == [2]
+
+
+def test_missing_file_has_no_stamp(tmp_path):
+    assert file_stamp(str(tmp_path / 'gone.ngc')) is None
+    assert file_stamp(None) is None
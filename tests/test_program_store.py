@@ -0,0 +1,42 @@
+from qtvcp.widgets.canon_snapshot import CanonSnapshot
+from qtvcp.widgets.program_store import ProgramStore
+
+PROGRAM = 'G18 G21\nG0 X10 Z2\nG1 Z-10 F100\nX12\nM30\n'
+
+
+def test_views_share_one_entry_per_program_and_config(qapp, program):
+    store = ProgramStore()
+    path = program(PROGRAM)
+    first = store.acquire(path, info_blob='info', load=False, config='a')
+    assert store.acquire(path, info_blob='info', load=False, config='a') is first
+    assert store.acquire(path, info_blob='info', load=False, config='b') is not first
+    assert first.refs == 2 and not first.loading
+    store.release(first)
+    assert first in store.entries()
+    store.release(first)
+    assert first not in store.entries()
+
+
+def test_interpreted_canon_and_derived_data_are_shared(qapp, program):
+    store = ProgramStore()
+    path = program(PROGRAM)
+    entry = store.acquire(path, load=False)
+    entry.canon = CanonSnapshot({'feed': []})
+    builds = []
+    assert entry.derived('index', lambda: builds.append(1) or 'built') == 'built'
+    assert entry.derived('index', lambda: builds.append(1) or 'again') == 'built'
+    assert builds == [1]
+    # A progressive view joining later takes the canon instead of parsing
+    assert store.acquire(path) is entry
+    assert not entry.loading and entry.summary is None
+
+
+def test_progressive_load_starts_once(qapp, program, wait_for):
+    store = ProgramStore()
+    path = program(PROGRAM)
+    entry = store.acquire(path, load=False)
+    assert not entry.loading
+    assert store.acquire(path) is entry and entry.loading
+    assert store.acquire(path) is entry
+    assert wait_for(lambda: entry.summary is not None)
+    assert entry.unsupported is None and len(entry.toolpath()) == 3
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from qtvcp.widgets.segment_index import SegmentIndex, _ray_segment_distance
+
+
+def brute_force(starts, ends, origin, direction, radius):
+    """
+    Distance and ray parameter of the closest segment within radius, or None.
+    """
+    direction = np.asarray(direction, dtype=np.float64)
+    direction = direction / np.linalg.norm(direction)
+    distance, t = _ray_segment_distance(np.asarray(origin, dtype=np.float64), direction, starts, ends)
+    close = np.flatnonzero(distance <= radius)
+    if not len(close):
+        return None
+    best = close[np.lexsort((t[close], distance[close]))[0]]
+    return distance[best], t[best]
+
+
+def lathe_path(rng, n):
+    # A polyline in the XZ plane, as a lathe program draws it
+    points = np.zeros((n + 1, 3))
+    points[:, 0] = np.cumsum(rng.uniform(-1.0, 1.0, n + 1))
+    points[:, 2] = np.cumsum(rng.uniform(-1.0, 0.5, n + 1))
+    return points[:-1], points[1:]
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_pick_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    starts, ends = lathe_path(rng, 2000)
+    index = SegmentIndex(starts, ends, np.arange(len(starts)) + 10)
+    low, high = starts.min(axis=0), starts.max(axis=0)
+    hits = 0
+    for i in range(200):
+        if i % 4 < 2:
+            # Near a segment, or between close ones
+            k = rng.integers(len(starts))
+            target = starts[k] + rng.uniform() * (ends[k] - starts[k]) + rng.normal(scale=0.3, size=3)
+        else:
+            target = rng.uniform(low, high)
+        if i % 2:
+            # Looking straight down the Y axis, as the lathe view does
+            direction = np.array([0.0, -1.0, 0.0])
+        else:
+            direction = rng.normal(size=3)
+        origin = target - 100.0 * direction / np.linalg.norm(direction)
+        radius = rng.uniform(0.05, 1.0)
+        expected = brute_force(starts, ends, origin, direction, radius)
+        picked = index.pick(origin, direction, radius)
+        if expected is None:
+            assert picked is None
+            continue
+        hits += 1
+        line, segment = picked
+        assert line == segment + 10
+        distance, t = _ray_segment_distance(origin, direction / np.linalg.norm(direction),
+                                            starts[segment:segment + 1], ends[segment:segment + 1])
+        # Segments sharing a vertex may tie: compare what was picked, not which
+        assert distance[0] == pytest.approx(expected[0], abs=1e-9)
+        assert t[0] == pytest.approx(expected[1], abs=1e-6)
+    assert hits > 80
+
+
+def test_empty_and_degenerate_input():
+    assert SegmentIndex(np.zeros((0, 3)), np.zeros((0, 3)), []).pick((0, 0, 1), (0, 0, -1), 1.0) is None
+    # One point-like segment, and a ray without direction
+    index = SegmentIndex([(1.0, 0.0, 1.0)], [(1.0, 0.0, 1.0)], [7])
+    assert index.pick((1.0, 5.0, 1.0), (0.0, -1.0, 0.0), 0.1) == (7, 0)
+    assert index.pick((1.0, 5.0, 1.0), (0.0, 0.0, 0.0), 0.1) is None
+    assert index.pick((3.0, 5.0, 1.0), (0.0, -1.0, 0.0), 0.1) is None
+
+
+class Canon:
+    traverse = [(1, (0.0, 0.0, 0.0), (1.0, 0.0, 0.0))]
+    feed = [(2, (1.0, 0.0, 0.0), (1.0, 0.0, -2.0), 100.0)]
+    arcfeed = []
+
+
+def test_index_of_a_canon():
+    index = SegmentIndex.from_canon(Canon())
+    assert len(index) == 2
+    assert index.pick((1.0, 3.0, -1.0), (0.0, -1.0, 0.0), 0.1) == (2, 1)
@@ -0,0 +1,73 @@
+import pytest
+
+from qtvcp.widgets.stage_graph import StageGraph
+
+
+def make_graph(calls):
+    """
+    program -> analysis -> tools, and analysis + offsets -> zero.
+    """
+    def stage(name, func):
+        def run(*args):
+            calls.append(name)
+            return func(*args)
+        return run
+
+    graph = StageGraph()
+    graph.add_input('program', 'a.ngc')
+    graph.add_input('offsets')
+    graph.add_stage('analysis', stage('analysis', lambda p: p.upper()), ('program',))
+    graph.add_stage('tools', stage('tools', lambda a: [a]), ('analysis',))
+    graph.add_stage('zero', stage('zero', lambda a, o: (a, o)), ('analysis', 'offsets'))
+    return graph
+
+
+def test_stages_are_computed_once():
+    calls = []
+    graph = make_graph(calls)
+    assert graph.get('tools') == ['A.NGC']
+    assert graph.get('tools') == ['A.NGC']
+    assert calls == ['analysis', 'tools']
+    assert [name for name, _ in graph.last_recomputed] == []
+
+
+def test_changed_input_invalidates_its_dependents_only():
+    calls = []
+    graph = make_graph(calls)
+    graph.set_input('offsets', 1)
+    graph.get('tools')
+    graph.get('zero')
+    del calls[:]
+    assert graph.set_input('offsets', 2)
+    assert graph.is_valid('tools') and not graph.is_valid('zero')
+    assert graph.get('zero') == ('A.NGC', 2)
+    assert calls == ['zero']
+    # The same value changes nothing
+    assert not graph.set_input('offsets', 2)
+    assert graph.is_valid('zero')
+
+    assert graph.set_input('program', 'b.ngc')
+    assert not graph.is_valid('tools') and not graph.is_valid('zero')
+    assert graph.get('zero') == ('B.NGC', 2)
+    assert [name for name, _ in graph.last_recomputed] == ['analysis', 'zero']
+
+
+def test_plan_and_put_compute_stages_elsewhere():
+    calls = []
+    graph = make_graph(calls)
+    graph.set_input('offsets', 0)
+    assert graph.plan('zero') == ['analysis', 'zero']
+    graph.put('analysis', 'FROM WORKER', 0.5)
+    assert graph.plan('zero') == ['zero']
+    assert graph.get('zero') == ('FROM WORKER', 0)
+    assert calls == ['zero']
+    assert graph.timings['analysis'] == 0.5
+
+
+def test_missing_inputs_and_unknown_nodes():
+    graph = make_graph([])
+    with pytest.raises(KeyError):
+        graph.get('zero')
+    with pytest.raises(ValueError):
+        graph.add_stage('eta', len, ('feeds',))
+    assert graph.value('tools', 'none') == 'none'
@@ -0,0 +1,60 @@
+import math
+
+import numpy as np
+import pytest
+
+from qtvcp.widgets.toolpath import (ARC, ARC_TOLERANCE, FEED, PLANE_XZ, RAPID, Toolpath,
+                                    ToolpathBuilder)
+
+
+def build_path():
+    builder = ToolpathBuilder()
+    builder.add((10.0, 0.0, 2.0), RAPID, 1, 0.0, 500.0, 0, 1)
+    builder.add((10.0, 0.0, -10.0), FEED, 2, 100.0, 500.0, 0, 1)
+    # Half circle around (10, 0, -15) in the XZ plane
+    builder.add_arc((10.0, 0.0, -20.0), (10.0, 0.0, -15.0), PLANE_XZ, True, 1, 3, 80.0, 500.0, 0, 1)
+    builder.add_dwell(4, 1.5)
+    builder.extend(np.array([[12.0, 0.0, -20.0], [12.0, 0.0, 2.0]]), FEED, [5, 6], 120.0, 600.0, 0, 2)
+    return builder.finish()
+
+
+def test_arcs_are_tessellated_within_tolerance():
+    path = build_path()
+    arc = path.kind == ARC
+    assert arc.sum() > 4
+    assert np.all(path.line[arc] == 3)
+    ends = path.ends[arc].astype(np.float64)
+    radius = np.hypot(ends[:, 0] - 10.0, ends[:, 2] + 15.0)
+    assert np.allclose(radius, 5.0, atol=1e-5)
+    # Chords cut the arc by no more than the tolerance
+    chord = np.diff(np.vstack((path.starts[arc][:1], ends)), axis=0)
+    sagitta = 5.0 - np.sqrt(25.0 - (np.linalg.norm(chord, axis=1) / 2) ** 2)
+    assert sagitta.max() <= ARC_TOLERANCE + 1e-6
+    assert path.lengths()[arc].sum() == pytest.approx(5.0 * math.pi, rel=1e-3)
+    assert tuple(path.points[-1]) == (12.0, 0.0, 2.0)
+    assert list(path.tool[-2:]) == [2, 2]
+
+
+def test_round_trip_through_bytes_and_files(tmp_path):
+    path = build_path()
+    blob = tmp_path / 'toolpath.bin'
+    blob.write_bytes(path.to_bytes())
+    for loaded in (Toolpath.load(path.to_bytes()), Toolpath.load(str(blob))):
+        assert len(loaded) == len(path)
+        for name in ('points', 'kind', 'line', 'feed', 'spindle', 'flags', 'tool',
+                     'dwell_line', 'dwell_time'):
+            assert np.array_equal(getattr(loaded, name), getattr(path, name)), name
+            assert getattr(loaded, name).dtype == getattr(path, name).dtype
+    assert Toolpath.load(Toolpath().to_bytes()).points.shape == (0, 3)
+
+
+def test_taken_parts_join_into_the_whole():
+    builder = ToolpathBuilder()
+    builder.add((1.0, 0.0, 0.0), FEED, 1, 10.0, 0.0, 0, 1)
+    first = builder.take()
+    builder.add_arc((3.0, 0.0, 0.0), (2.0, 0.0, 0.0), PLANE_XZ, False, 1, 2, 10.0, 0.0, 0, 1)
+    second = builder.take()
+    whole = builder.finish()
+    assert len(first) == 1 and tuple(second.points[0]) == (1.0, 0.0, 0.0)
+    assert np.array_equal(whole.points, Toolpath.concatenate([first, second]).points)
+    assert len(whole) == len(first) + len(second)
@@ -0,0 +1,83 @@
+import math
+
+import pytest
+
+from qtvcp.widgets.toolpath import FEED, FLAG_CSS, Toolpath, ToolpathBuilder
+from qtvcp.widgets.toolpath_playback import MAX_SPEED, PlaybackTimeline, ToolpathPlayback
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def timeline():
+    """
+    Two 10 mm moves of 1 s and 3 s with a 2 s dwell between them.
+    """
+    builder = ToolpathBuilder()
+    builder.add((10.0, 0.0, 0.0), FEED, 1, 600.0, 500.0, 0, 1)
+    builder.add_dwell(2, 2.0)
+    builder.add((10.0, 0.0, -10.0), FEED, 3, 200.0, 500.0, 0, 1)
+    return PlaybackTimeline(builder.finish(), [1.0, 3.0])
+
+
+def test_segments_and_dwells_on_the_program_clock():
+    line = timeline()
+    assert line.total == 6.0
+    assert line.begin.tolist() == [0.0, 3.0]
+    points, segments = line.sample([0.5, 1.0, 2.0, 4.5, 99.0])
+    assert segments.tolist() == [0, 0, 0, 1, 1]
+    assert points.tolist() == [[5.0, 0.0, 0.0], [10.0, 0.0, 0.0], [10.0, 0.0, 0.0],
+                               [10.0, 0.0, -5.0], [10.0, 0.0, -10.0]]
+    assert line.line(1) == 3 and line.line(-1) == 0
+
+
+def test_constant_surface_speed_sets_the_rpm():
+    builder = ToolpathBuilder(start=(10.0, 0.0, 0.0))
+    builder.add((10.0, 0.0, -5.0), FEED, 1, 100.0, 200.0 * math.pi, FLAG_CSS, 1)
+    line = PlaybackTimeline(builder.finish(), [1.0], rpm_cap=5.0)
+    # 200 pi mm/min at 10 mm radius is 10 rpm, capped at 5
+    assert line.spindle(0) == pytest.approx(5.0)
+
+
+def test_empty_toolpath():
+    line = PlaybackTimeline(Toolpath(), [])
+    points, segments = line.sample([0.0, 1.0])
+    assert segments.tolist() == [-1, -1]
+    assert points.tolist() == [[0.0, 0.0, 0.0]] * 2
+
+
+def test_playback_clock(qapp):
+    clock = Clock()
+    playback = ToolpathPlayback(clock=clock)
+    times = []
+    playback.advanced.connect(times.append)
+    playback.load(timeline())
+    playback.play()
+    clock.now += 1.0
+    assert playback.time() == 1.0
+    playback.set_speed(1000)
+    assert playback.speed() == MAX_SPEED
+    clock.now += 0.02
+    assert playback.time() == pytest.approx(3.0)
+    playback.pause()
+    clock.now += 10.0
+    assert playback.time() == pytest.approx(3.0) and not playback.playing
+    playback.seek(-4.0)
+    assert playback.time() == 0.0 and times[-1] == 0.0
+
+    finished = []
+    playback.finished.connect(lambda: finished.append(True))
+    playback.play()
+    clock.now += 1.0
+    playback._frame()
+    assert finished == [True] and playback.time() == 6.0
+    # Playing again starts over
+    playback.play()
+    assert playback.time() == 0.0
+    playback.stop()
+    assert not playback.running
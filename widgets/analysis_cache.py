@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+
+# Persistent on-disk cache for G-code analysis results.
+#
+# Entries are keyed by the identity of the program file: its real path, size
+# and modification time, backed by a content hash.  A file that was touched or
+# copied without changing its content still hits the cache.  Every entry is a
+# directory of named blobs (JSON documents, array files); an index with last
+# use times allows LRU eviction under a disk budget.  Cache hits only update
+# the use times in memory; the index is written a few seconds later, once
+# for all hits in between.
+#
+# Matching a touched or copied file reads and hashes all of it.  Callers on
+# the GUI thread pass rehash=False, which only matches the file's current
+# identity, and leave the full lookup to a worker.
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+from qtvcp import logger
+
+LOG = logger.getLogger(__name__)
+
+# Default disk budget in bytes
+DEFAULT_BUDGET = 256 * 1024 * 1024
+
+INDEX_NAME = 'index.json'
+# Directory of the cache inside the configuration directory
+DIRECTORY_NAME = 'analysis_cache'
+_HASH_BLOCK = 1 << 20
+# Delay before use times updated by cache hits are written, seconds
+INDEX_SAVE_DELAY = 5.0
+
+
+def content_hash(path):
+    """
+    Returns the hex digest of the file's content, read in large blocks.
+    """
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(_HASH_BLOCK)
+            if not block:
+                break
+            h.update(block)
+    return h.hexdigest()
+
+
+def _atomic_write(target, data):
+    tmp = '{}.tmp{}'.format(target, os.getpid())
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, target)
+
+
+class AnalysisCache:
+    """
+    Cache of named analysis results per program file.
+
+    get()/put() work on raw bytes, get_json()/put_json() on JSON-able
+    objects.  blob_path() gives the file of a blob for readers that want to
+    open or memory-map it directly.  The cache may be used from several
+    threads.  Call flush() before exiting to keep the latest use times.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_BUDGET):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._index = None
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._save_timer = None
+
+    # --- index handling ---
+    @property
+    def index(self):
+        if self._index is None:
+            try:
+                with open(os.path.join(self.directory, INDEX_NAME), 'r') as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {}
+        return self._index
+
+    def _save_index(self):
+        os.makedirs(self.directory, exist_ok=True)
+        _atomic_write(os.path.join(self.directory, INDEX_NAME),
+                      json.dumps(self.index, indent=1).encode())
+        self._dirty = False
+
+    def _touch(self, key):
+        """
+        Marks an entry used; the index is written after INDEX_SAVE_DELAY.
+        """
+        self.index[key]['used'] = time.time()
+        self._dirty = True
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(INDEX_SAVE_DELAY, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self):
+        """
+        Writes use times still pending to the index.
+        """
+        with self._lock:
+            self._save_timer = None
+            if not self._dirty:
+                return
+            try:
+                self._save_index()
+            except OSError as e:
+                LOG.warning('Cannot write analysis cache index: {}'.format(e))
+
+    def _identity(self, path):
+        path = os.path.realpath(path)
+        st = os.stat(path)
+        key = hashlib.sha1('{}\0{}\0{}'.format(path, st.st_size, st.st_mtime_ns).encode()).hexdigest()
+        return key, path, st
+
+    def _lookup(self, path, create=False, digest=None, rehash=True):
+        """
+        Returns the index key of the entry for path, or None.
+        A stale key whose content hash still matches is moved to the new key;
+        with rehash=False the file is never read and such keys are missed.
+        """
+        try:
+            key, real, st = self._identity(path)
+        except OSError:
+            return None
+        index = self.index
+        if key in index:
+            return key
+        if not rehash:
+            return None
+        # Only hash the file if there is an entry it could match.
+        candidates = [k for k, e in index.items() if e['size'] == st.st_size]
+        if digest is None and (candidates or create):
+            digest = content_hash(real)
+        for k in candidates:
+            if index[k]['hash'] == digest:
+                old = os.path.join(self.directory, k)
+                new = os.path.join(self.directory, key)
+                if index[k]['path'] == real:
+                    # Same file, only touched: move the entry
+                    entry = index.pop(k)
+                    os.replace(old, new)
+                else:
+                    # A copy of another program: share its results
+                    entry = dict(index[k], names=list(index[k]['names']))
+                    shutil.copytree(old, new, dirs_exist_ok=True)
+                entry.update(path=real, mtime_ns=st.st_mtime_ns, used=time.time())
+                index[key] = entry
+                self._save_index()
+                LOG.debug('Analysis cache re-keyed {} by content hash'.format(real))
+                return key
+        if not create:
+            return None
+        index[key] = {'path': real, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+                      'hash': digest, 'bytes': 0, 'used': time.time(), 'names': []}
+        os.makedirs(os.path.join(self.directory, key), exist_ok=True)
+        return key
+
+    def _prehash(self, path):
+        """
+        Content hash of path if its lookup needs one, else None.  Computed
+        before taking the lock, so other threads need not wait for it.
+        """
+        try:
+            key, real, st = self._identity(path)
+            if key in self.index or not any(e['size'] == st.st_size for e in list(self.index.values())):
+                return None
+            return content_hash(real)
+        except OSError:
+            return None
+
+    # --- public API ---
+    def blob_path(self, path, name, rehash=True):
+        """
+        Returns the file holding blob 'name' for program 'path', or None.
+        rehash=False skips the content hash lookup (see _lookup()).
+        """
+        digest = self._prehash(path) if rehash else None
+        with self._lock:
+            key = self._lookup(path, digest=digest, rehash=rehash)
+            if key is None or name not in self.index[key]['names']:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touch(key)
+            return os.path.join(self.directory, key, name)
+
+    def get(self, path, name, rehash=True):
+        blob = self.blob_path(path, name, rehash)
+        if blob is None:
+            return None
+        try:
+            with open(blob, 'rb') as f:
+                return f.read()
+        except OSError as e:
+            LOG.warning('Analysis cache blob unreadable {}: {}'.format(blob, e))
+            return None
+
+    def put(self, path, name, data):
+        """
+        Stores data (bytes) as blob 'name' for program 'path'.
+        """
+        # Hash a new file before taking the lock, readers need not wait for it
+        digest = None
+        try:
+            key, real, _ = self._identity(path)
+            if key not in self.index:
+                digest = content_hash(real)
+        except OSError as e:
+            LOG.warning('Cannot cache analysis of {}: {}'.format(path, e))
+            return
+        with self._lock:
+            try:
+                key = self._lookup(path, create=True, digest=digest)
+            except OSError as e:
+                LOG.warning('Cannot cache analysis of {}: {}'.format(path, e))
+                return
+            entry = self.index[key]
+            target = os.path.join(self.directory, key, name)
+            if name in entry['names']:
+                entry['bytes'] -= os.path.getsize(target)
+            else:
+                entry['names'].append(name)
+            _atomic_write(target, data)
+            entry['bytes'] += len(data)
+            entry['used'] = time.time()
+            self.evict(keep=key)
+            self._save_index()
+
+    def get_json(self, path, name, rehash=True):
+        data = self.get(path, name, rehash)
+        if data is None:
+            return None
+        try:
+            return json.loads(data.decode())
+        except ValueError:
+            return None
+
+    def put_json(self, path, name, obj):
+        self.put(path, name, json.dumps(obj).encode())
+
+    def total_bytes(self):
+        return sum(e['bytes'] for e in self.index.values())
+
+    def evict(self, keep=None):
+        """
+        Removes least recently used entries until the cache fits its budget.
+        The entry 'keep' is never removed.
+        """
+        index = self.index
+        total = self.total_bytes()
+        if total <= self.max_bytes:
+            return
+        for key in sorted(index, key=lambda k: index[k]['used']):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= index[key]['bytes']
+            del index[key]
+            shutil.rmtree(os.path.join(self.directory, key), ignore_errors=True)
+            LOG.debug('Analysis cache evicted {}'.format(key))
+
+    def clear(self):
+        with self._lock:
+            self._index = {}
+            self._dirty = False
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def shared_cache(directory, max_bytes=DEFAULT_BUDGET):
+    """
+    Returns the one AnalysisCache of a directory in this process, so the
+    handler and widgets using the same cache share its index.  The budget
+    is set by the first caller.
+    """
+    key = os.path.realpath(directory)
+    with _shared_lock:
+        cache = _shared.get(key)
+        if cache is None:
+            cache = _shared[key] = AnalysisCache(directory, max_bytes)
+        return cache
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+
+# Background worker pool for CAM wizard analysis.
+#
+# CPU-heavy jobs (G-code parsing) run in worker processes so they do not
+# contend for the GIL with the GUI and the OpenGL views; light or I/O bound
+# jobs run on a thread pool.  Results and progress come back to the GUI
+# thread as Qt signals.  Jobs belong to a channel; cancelling a channel drops
+# its pending results at once and makes running jobs stop at their next
+# cancellation check.
+#
+# Worker processes are started from a fork server (or spawned), never
+# forked from the GUI process itself: by the time the first job runs the
+# GUI has threads of its own, and forking a threaded process can deadlock
+# the child on a lock held by one of them.
+#
+# Job functions must be module level (picklable) and accept the keyword
+# arguments 'progress' (callable taking a 0..1 fraction) and 'cancelled'
+# (callable returning True once the job should stop, after which the job
+# raises AnalysisCancelled).
+
+import itertools
+import multiprocessing
+import os
+import queue
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from PyQt5.QtCore import QObject, Qt, QTimer, pyqtSignal
+
+from qtvcp import logger
+from qtvcp.widgets.gcode_analyzer import AnalysisCancelled
+
+LOG = logger.getLogger(__name__)
+
+PROCESS = 'process'
+THREAD = 'thread'
+
+# Number of independent cancellation channels
+CHANNELS = 4
+WIZARD_CHANNEL = 0
+
+# Modules the fork server imports once, so each worker starts with them
+_PRELOAD = ['qtvcp.widgets.gcode_analyzer']
+
+# (generations, progress queue) of the runner a worker process belongs to
+_worker_state = None
+
+
+def _start_method():
+    return 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+def _init_worker(generations, progress, nice=0):
+    """
+    Worker process initializer: keeps the shared state of its runner.
+    """
+    global _worker_state
+    _worker_state = (generations, progress)
+    if nice:
+        os.nice(nice)
+
+
+def _run_job(job_id, channel, generation, func, args, state=None):
+    """
+    Runs func(*args) inside a worker, wiring up progress and cancellation.
+    state is the runner's (generations, progress queue); jobs in a worker
+    process pass None and use the state the process was started with.
+    """
+    generations, progress_queue = state if state is not None else _worker_state
+    last = [0.0]
+
+    def progress(fraction):
+        if fraction - last[0] >= 0.01 or fraction >= 1.0:
+            last[0] = fraction
+            progress_queue.put((job_id, fraction))
+
+    def cancelled():
+        return generations[channel] != generation
+
+    return func(*args, progress=progress, cancelled=cancelled)
+
+
+class AnalysisRunner(QObject):
+    progress = pyqtSignal(int, float)
+    finished = pyqtSignal(int, object)
+    failed = pyqtSignal(int, str)
+    # Internal: a future completed (emitted from a pool thread)
+    _done = pyqtSignal(int, object)
+
+    def __init__(self, parent=None, processes=1, threads=2, nice=0):
+        """
+        nice lowers the scheduling priority of the worker processes, e.g. for
+        speculative work.
+        """
+        super(AnalysisRunner, self).__init__(parent)
+        self._ctx = multiprocessing.get_context(_start_method())
+        if self._ctx.get_start_method() == 'forkserver':
+            # Workers forked from a preloaded server start as cheaply as fork
+            self._ctx.set_forkserver_preload(_PRELOAD)
+        self._generations = self._ctx.Array('l', CHANNELS, lock=False)
+        self._progress_queue = self._ctx.SimpleQueue()
+        self._process_count = processes
+        self._nice = nice
+        self._thread_count = threads
+        self._processes = None
+        self._threads = None
+        self._ids = itertools.count(1)
+        # job id -> (channel, future)
+        self._active = {}
+        # Queued even when emitted on this thread: a job that is already done
+        # when submit() adds its callback must not report before submit()
+        # has returned its id
+        self._done.connect(self._on_done, Qt.QueuedConnection)
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._poll_progress)
+
+    def _pool(self, kind):
+        if kind == PROCESS:
+            if self._processes is None:
+                self._processes = ProcessPoolExecutor(
+                    self._process_count, mp_context=self._ctx,
+                    initializer=_init_worker, initargs=(self._generations, self._progress_queue, self._nice))
+            return self._processes
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(self._thread_count, thread_name_prefix='analysis')
+        return self._threads
+
+    def submit(self, func, *args, kind=PROCESS, channel=WIZARD_CHANNEL):
+        """
+        Queues func(*args) and returns the job id used in the signals.
+        """
+        job_id = next(self._ids)
+        generation = self._generations[channel]
+        # Shared memory cannot be pickled; worker processes got it at start
+        state = None if kind == PROCESS else (self._generations, self._progress_queue)
+        future = self._pool(kind).submit(_run_job, job_id, channel, generation, func, args, state)
+        self._active[job_id] = (channel, future)
+        future.add_done_callback(lambda f, j=job_id: self._done.emit(j, f))
+        if not self._timer.isActive():
+            self._timer.start(100)
+        return job_id
+
+    def cancel(self, channel=WIZARD_CHANNEL):
+        """
+        Cancels all jobs of a channel; none of them will emit a signal.
+        """
+        self._generations[channel] += 1
+        for job_id, (ch, future) in list(self._active.items()):
+            if ch == channel:
+                future.cancel()
+                del self._active[job_id]
+                LOG.debug('Analysis job {} cancelled'.format(job_id))
+
+    def background(self, func, *args):
+        """
+        Runs func(*args) on the thread pool without tracking or signals,
+        e.g. for writing results to disk.
+        """
+        return self._pool(THREAD).submit(func, *args)
+
+    def is_active(self, job_id):
+        return job_id in self._active
+
+    def busy(self, channel=WIZARD_CHANNEL):
+        return any(ch == channel for ch, _ in self._active.values())
+
+    def _on_done(self, job_id, future):
+        if self._active.pop(job_id, None) is None:
+            # Cancelled while running; drop the result
+            return
+        if not self._active:
+            self._timer.stop()
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is None:
+            self.finished.emit(job_id, future.result())
+        elif not isinstance(error, AnalysisCancelled):
+            LOG.error('Analysis job {} failed: {}'.format(job_id, error))
+            self.failed.emit(job_id, str(error))
+
+    def _poll_progress(self):
+        latest = {}
+        try:
+            while not self._progress_queue.empty():
+                job_id, fraction = self._progress_queue.get()
+                latest[job_id] = fraction
+        except (OSError, EOFError, queue.Empty):
+            pass
+        for job_id, fraction in latest.items():
+            if job_id in self._active:
+                self.progress.emit(job_id, fraction)
+
+    def shutdown(self):
+        for channel in range(CHANNELS):
+            self.cancel(channel)
+        self._timer.stop()
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)
+        if self._threads is not None:
+            self._threads.shutdown(wait=False, cancel_futures=True)
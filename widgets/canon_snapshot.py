@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+
+# Interpreted preview geometry of a program, apart from its canon.
+#
+# A glcanon canon collects what the interpreter produced in plain lists:
+# traverse, feed and arcfeed hold (line, start, end, ...) tuples, dwells
+# and the tool list their own records.  A snapshot keeps these lists, so
+# another view of the same program can take them over instead of running
+# the interpreter again.  Serialized, every tuple field of a list becomes
+# one array, in the aligned format of toolpath files, so a snapshot kept in
+# the analysis cache is memory-mapped on a later load and only turned back
+# into tuples.
+
+import gc
+
+import numpy as np
+
+from qtvcp import logger
+from qtvcp.widgets.toolpath import pack_arrays, unpack_arrays
+
+LOG = logger.getLogger(__name__)
+
+# canon attributes held by a snapshot
+CANON_LISTS = ('traverse', 'feed', 'arcfeed', 'dwells', 'tool_list')
+# Lists counted as the program's segments
+SEGMENT_LISTS = ('traverse', 'feed', 'arcfeed')
+
+# Cache blob of a snapshot: format version, configuration key
+CANON_BLOB = 'canon.v{}.{}.bin'
+CANON_VERSION = 1
+
+_MAGIC = b'CANONSN1'
+# Field kinds, from the first record of a list: int, float, tuple, list
+_KINDS = ((bool, None), (int, 'i'), (float, 'f'), (tuple, 't'), (list, 'l'))
+# Field index of lists whose records are plain numbers
+_WHOLE = '*'
+
+
+def _kind(value):
+    for kind, code in _KINDS:
+        if isinstance(value, kind):
+            return code
+    return None
+
+
+def _unique_rows(rows):
+    """
+    Distinct rows of a float array, compared bytewise, and the index of
+    every row among them.
+    """
+    rows = np.ascontiguousarray(rows, dtype=np.float64)
+    keys = rows.view(np.dtype((np.void, rows.dtype.itemsize * rows.shape[1]))).ravel()
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    return rows[first], inverse.astype(np.int64).ravel()
+
+
+def _columns(name, records):
+    """
+    Splits records (all alike: tuples of numbers and number sequences, or
+    numbers) into (key, array) pairs: name.field.kind for numbers, and
+    for sequences (kind and width, e.g. t9) indices into one pool of
+    distinct rows per width, name.pool.width.  A segment's start is the end of the one before, so
+    pooling stores (and later builds) each point once.
+    """
+    if not records:
+        # An empty list, kept so it is restored empty
+        return [(name, np.zeros(0, dtype=np.int64))]
+    first = records[0]
+    if _kind(first) in ('i', 'f'):
+        fields = [(_WHOLE, _kind(first), records)]
+    else:
+        if not isinstance(first, tuple) or len(set(map(len, records))) != 1:
+            raise ValueError('canon list {} has records of different shapes'.format(name))
+        fields = [(str(i), _kind(value), column) for i, (value, column) in enumerate(zip(first, zip(*records)))]
+    columns = []
+    sequences = {}
+    for index, kind, column in fields:
+        if kind is None:
+            raise ValueError('canon list {} field {} is not numeric'.format(name, index))
+        key = '{}.{}.{}'.format(name, index, kind)
+        if kind in ('i', 'f'):
+            columns.append((key, np.asarray(column, dtype=np.int64 if kind == 'i' else np.float64)))
+        else:
+            rows = np.asarray(column, dtype=np.float64)
+            if rows.ndim != 2:
+                raise ValueError('canon list {} field {} is not numeric'.format(name, index))
+            sequences.setdefault(rows.shape[1], []).append((key + str(rows.shape[1]), rows))
+    for width, parts in sequences.items():
+        pool, inverse = _unique_rows(np.concatenate([rows for _, rows in parts]))
+        columns.append(('{}.pool.{}'.format(name, width), pool))
+        for i, (key, rows) in enumerate(parts):
+            columns.append((key, inverse[i * len(rows):(i + 1) * len(rows)]))
+    return columns
+
+
+def _records(columns, pools):
+    """
+    Rebuilds the records of one list from its (field, kind, array) columns
+    and its pools of distinct rows {width: array}.
+    """
+    built = {}
+    values = []
+    for index, kind, array in sorted(columns, key=lambda c: -1 if c[0] == _WHOLE else int(c[0])):
+        if index == _WHOLE:
+            return array.tolist()
+        if kind[0] in 'tl':
+            rows = built.get(kind)
+            if rows is None:
+                rows = pools[int(kind[1:])].tolist()
+                if kind[0] == 't':
+                    rows = list(map(tuple, rows))
+                built[kind] = rows
+            values.append(list(map(rows.__getitem__, array.tolist())))
+        else:
+            values.append(array.tolist())
+    return list(zip(*values))
+
+
+class CanonSnapshot:
+    def __init__(self, lists):
+        """
+        lists: {canon attribute: list of records}, shared, never modified.
+        """
+        self.lists = lists
+
+    def __len__(self):
+        return sum(len(self.lists.get(name, ())) for name in SEGMENT_LISTS)
+
+    def __repr__(self):
+        return '<CanonSnapshot {} segments>'.format(len(self))
+
+    @classmethod
+    def from_canon(cls, canon):
+        lists = {}
+        for name in CANON_LISTS:
+            records = getattr(canon, name, None)
+            if isinstance(records, list):
+                lists[name] = records
+        return cls(lists)
+
+    def apply(self, canon):
+        """
+        Gives canon the snapshot's lists, as if it had interpreted the program.
+        """
+        for name, records in self.lists.items():
+            setattr(canon, name, records)
+
+    def to_bytes(self):
+        """
+        Serializes the lists; ValueError if a list holds other than numbers.
+        """
+        arrays = []
+        for name, records in self.lists.items():
+            arrays.extend(_columns(name, records))
+        return pack_arrays(_MAGIC, arrays)
+
+    @classmethod
+    def load(cls, source):
+        """
+        Loads a snapshot written by to_bytes() from bytes or a file name
+        (memory-mapped).
+        """
+        columns = {}
+        pools = {}
+        for key, array in unpack_arrays(_MAGIC, source).items():
+            if '.' not in key:
+                columns[key] = []
+                continue
+            name, index, kind = key.rsplit('.', 2)
+            if index == 'pool':
+                pools.setdefault(name, {})[int(kind)] = array
+            else:
+                columns.setdefault(name, []).append((index, kind, array))
+        # Millions of new tuples, none of them in a cycle: keep the collector
+        # from walking them again and again while they are built
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return cls({name: _records(c, pools.get(name, {})) if c else [] for name, c in columns.items()})
+        finally:
+            if enabled:
+                gc.enable()
+
+
+def store_canon(cache, path, key, snapshot):
+    """
+    Writes the snapshot of the program at path, interpreted with the
+    configuration digest key, to an AnalysisCache.
+    """
+    try:
+        data = snapshot.to_bytes()
+    except ValueError as e:
+        LOG.debug('Interpreted preview of {} not cached: {}'.format(path, e))
+        return
+    cache.put(path, CANON_BLOB.format(CANON_VERSION, key), data)
+
+
+def load_canon(cache, path, key, rehash=True):
+    """
+    Returns the cached snapshot of the program at path for key, or None.
+    rehash is as for AnalysisCache.get().
+    """
+    blob = cache.blob_path(path, CANON_BLOB.format(CANON_VERSION, key), rehash)
+    if blob is None:
+        return None
+    try:
+        return CanonSnapshot.load(blob)
+    except (OSError, ValueError, KeyError) as e:
+        LOG.warning('Cached preview of {} unreadable: {}'.format(path, e))
+        return None
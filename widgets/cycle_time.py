@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+
+# Cycle time estimation over a Toolpath.
+#
+# Every segment gets a trapezoidal velocity profile limited by the machine's
+# axis velocities and accelerations from the INI file, the programmed feed
+# (per minute, per revolution, inverse time, G96 constant surface speed)
+# and the corner speeds at its ends.  The usual forward/backward pass that
+# makes corner speeds reachable is a min-plus recurrence on squared speeds,
+# which numpy solves with minimum.accumulate, so the whole estimate is a
+# fixed number of array operations however long the program is.
+#
+# Estimates are stored in the analysis cache next to the program summary,
+# one blob per set of machine limits, so reopening a program does not
+# estimate it again.
+
+import hashlib
+import io
+import math
+import zipfile
+
+import numpy as np
+
+from qtvcp import logger
+from qtvcp.widgets.gcode_analyzer import SUMMARY_VERSION
+from qtvcp.widgets.toolpath import RAPID, ARC, FLAG_FEED_PER_REV, FLAG_CSS, FLAG_INVERSE_TIME
+
+LOG = logger.getLogger(__name__)
+
+INCH = 25.4
+# Path deviation (mm) allowed at corners when blending
+JUNCTION_DEVIATION = 0.05
+# Segments shorter than this (mm) take no time
+MIN_LENGTH = 1e-9
+# Squared speed gain (mm^2/s^2) standing in for unlimited acceleration
+UNLIMITED_GAIN = 1e12
+
+# Cache blob of an estimate, named by SUMMARY_VERSION and MachineLimits.key()
+CYCLE_BLOB = 'cycle.v{}.{}.npz'
+
+
+def _ini_float(ini, section, option, default=None):
+    try:
+        return float(ini.find(section, option))
+    except (TypeError, ValueError):
+        return default
+
+
+class MachineLimits:
+    """
+    Velocity (mm/s) and acceleration (mm/s^2) limits of the X, Y and Z axes,
+    the trajectory velocity limit and the spindle speed limit (rpm).
+    """
+
+    def __init__(self, max_velocity=(math.inf,) * 3, max_acceleration=(math.inf,) * 3,
+                 max_linear_velocity=math.inf, default_velocity=None, max_spindle=math.inf):
+        self.max_velocity = np.array(max_velocity, dtype=np.float64)
+        self.max_acceleration = np.array(max_acceleration, dtype=np.float64)
+        self.max_linear_velocity = max_linear_velocity
+        # Feed assumed for moves without an F word
+        self.default_velocity = default_velocity or max_linear_velocity
+        self.max_spindle = max_spindle
+
+    def __repr__(self):
+        return '<MachineLimits vel={} acc={} linear={}>'.format(
+            self.max_velocity.tolist(), self.max_acceleration.tolist(), self.max_linear_velocity)
+
+    def key(self):
+        """
+        Short digest of all limits; estimates are cached under it.
+        """
+        values = np.concatenate((self.max_velocity, self.max_acceleration,
+                                 [self.max_linear_velocity, self.default_velocity, self.max_spindle]))
+        return hashlib.blake2b(values.astype(np.float64).tobytes(), digest_size=8).hexdigest()
+
+    @classmethod
+    def from_ini(cls, ini):
+        """
+        Reads the limits from an INI object with find(section, option), such
+        as INFO.INI.  Axes without a section are unlimited.
+        """
+        units = str(ini.find('TRAJ', 'LINEAR_UNITS') or 'mm').strip().lower()
+        scale = INCH if units in ('inch', 'in', 'imperial') else 1.0
+        velocity = [_ini_float(ini, 'AXIS_' + axis, 'MAX_VELOCITY', math.inf) * scale for axis in 'XYZ']
+        acceleration = [_ini_float(ini, 'AXIS_' + axis, 'MAX_ACCELERATION', math.inf) * scale for axis in 'XYZ']
+        linear = _ini_float(ini, 'TRAJ', 'MAX_LINEAR_VELOCITY', math.inf) * scale
+        default = _ini_float(ini, 'TRAJ', 'DEFAULT_LINEAR_VELOCITY')
+        return cls(velocity, acceleration, linear,
+                   default * scale if default else None,
+                   _ini_float(ini, 'DISPLAY', 'MAX_SPINDLE_0_SPEED', math.inf))
+
+
+class CycleTime:
+    """
+    Result of estimate_cycle_time().
+
+    total is in seconds; per_tool maps tool numbers (-1: none) to seconds,
+    per_line is an array of seconds indexed by program line, and
+    segment_time holds the time of every toolpath segment.
+    """
+
+    def __init__(self, total, per_tool, per_line, segment_time, dwell):
+        self.total = total
+        self.per_tool = per_tool
+        self.per_line = per_line
+        self.segment_time = segment_time
+        self.dwell = dwell
+
+    def __repr__(self):
+        return '<CycleTime {} ({} dwell)>'.format(format_duration(self.total), format_duration(self.dwell))
+
+    def to_bytes(self):
+        buf = io.BytesIO()
+        np.savez(buf, total=self.total, dwell=self.dwell, per_line=self.per_line,
+                 segment_time=self.segment_time,
+                 tools=np.array(list(self.per_tool), dtype=np.int64),
+                 tool_time=np.array(list(self.per_tool.values()), dtype=np.float64))
+        return buf.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data):
+        with np.load(io.BytesIO(data)) as f:
+            per_tool = dict(zip(f['tools'].tolist(), f['tool_time'].tolist()))
+            return cls(float(f['total']), per_tool, f['per_line'], f['segment_time'], float(f['dwell']))
+
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    if hours:
+        return '{}:{:02d}:{:02d}'.format(hours, rest // 60, rest % 60)
+    return '{}:{:02d}'.format(rest // 60, rest % 60)
+
+
+def _axis_limit(share, limits):
+    """
+    Largest path speed/acceleration that keeps every axis within its limit,
+    given the absolute unit direction components (N, 3) of the segments.
+    """
+    with np.errstate(divide='ignore'):
+        return np.minimum(np.minimum(limits[0] / share[:, 0], limits[1] / share[:, 1]), limits[2] / share[:, 2])
+
+
+def _reachable(cap, gain):
+    """
+    Squared junction speeds w <= cap such that w[j + 1] <= w[j] + gain[j]
+    and w[j] <= w[j + 1] + gain[j]: the forward and backward planner passes.
+    """
+    # Forward: w[j] = min_k<=j (cap[k] + S[j] - S[k]) with S the prefix sum of gain
+    s = np.concatenate(([0.0], np.cumsum(gain)))
+    w = s + np.minimum.accumulate(cap - s)
+    # Backward, the same on the reversed sequence
+    r = np.concatenate(([0.0], np.cumsum(gain[::-1])))
+    w = np.minimum(w, (r + np.minimum.accumulate(w[::-1] - r))[::-1])
+    return np.maximum(w, 0.0)
+
+
+def estimate_cycle_time(toolpath, limits, line_count=None, css_max_rpm=None):
+    """
+    Estimates the run time of a Toolpath on a machine with the given
+    MachineLimits.  line_count sizes the per-line array; css_max_rpm is the
+    G96 D limit, if the program sets one.
+    """
+    n = len(toolpath)
+    line_count = max(line_count or 0, int(toolpath.line.max()) + 1 if n else 0,
+                     int(toolpath.dwell_line.max()) + 1 if len(toolpath.dwell_line) else 0)
+    segment_time = np.zeros(n)
+
+    if n:
+        points = toolpath.points.astype(np.float64)
+        delta = np.diff(points, axis=0)
+        length = np.sqrt(np.einsum('ij,ij->i', delta, delta))
+        moving = np.flatnonzero(length > MIN_LENGTH)
+    else:
+        moving = np.zeros(0, dtype=np.intp)
+
+    if len(moving):
+        L = length[moving]
+        unit = delta[moving] / L[:, None]
+        kind = toolpath.kind[moving]
+        flags = toolpath.flags[moving]
+        feed = toolpath.feed[moving].astype(np.float64)
+        share = np.abs(unit)
+        vmax = np.minimum(_axis_limit(share, limits.max_velocity), limits.max_linear_velocity)
+        accel = _axis_limit(share, limits.max_acceleration)
+
+        # Programmed speed, mm/s
+        velocity = feed / 60.0
+        spindle = toolpath.spindle[moving].astype(np.float64)
+        css = (flags & FLAG_CSS) != 0
+        if css.any():
+            # rpm from surface speed at the segment's mean radius (X)
+            radius = np.abs(points[moving, 0] + points[moving + 1, 0]) / 2.0
+            rpm_cap = min(css_max_rpm or math.inf, limits.max_spindle)
+            with np.errstate(divide='ignore'):
+                rpm = np.minimum(spindle / (2 * math.pi * radius), rpm_cap)
+            spindle = np.where(css, rpm, spindle)
+        per_rev = (flags & FLAG_FEED_PER_REV) != 0
+        velocity = np.where(per_rev, feed * spindle / 60.0, velocity)
+        inverse = (flags & FLAG_INVERSE_TIME) != 0
+        velocity = np.where(inverse, L * feed / 60.0, velocity)
+        velocity = np.where(velocity > 0, velocity, limits.default_velocity)
+        velocity = np.where(kind == RAPID, vmax, np.minimum(velocity, vmax))
+        if not np.isfinite(velocity).all():
+            LOG.warning('Unlimited velocity in cycle time estimate; check the INI limits')
+            velocity = np.where(np.isfinite(velocity), velocity, limits.default_velocity)
+
+        # Corner speed caps (squared) at the junctions between moving segments
+        cos = np.einsum('ij,ij->i', unit[:-1], unit[1:]).clip(-1.0, 1.0)
+        a_corner = np.minimum(accel[:-1], accel[1:])
+        half = np.sqrt(0.5 * (1.0 + cos))            # sin of half the deflection angle
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corner = a_corner * JUNCTION_DEVIATION * half / (1.0 - half)
+        # Chords of one arc: centripetal limit from the chord radius
+        lines = toolpath.line[moving]
+        same_arc = np.flatnonzero((kind[:-1] == ARC) & (kind[1:] == ARC) & (lines[:-1] == lines[1:]))
+        if len(same_arc):
+            angle = np.maximum(np.arccos(cos[same_arc]), 1e-9)
+            corner[same_arc] = a_corner[same_arc] * 0.5 * (L[same_arc] + L[same_arc + 1]) / angle
+        # Full stops at tool changes and at dwells between two moves
+        tool = toolpath.tool[moving]
+        stop = tool[:-1] != tool[1:]
+        if len(toolpath.dwell_line):
+            dwells = np.sort(toolpath.dwell_line)
+            before = np.searchsorted(dwells, lines[:-1], side='right')
+            stop |= np.searchsorted(dwells, lines[1:], side='right') > before
+        cap = np.minimum(np.minimum(velocity[:-1], velocity[1:]) ** 2, corner)
+        cap[stop] = 0.0
+        cap = np.concatenate(([0.0], cap, [0.0]))
+        # Unlimited acceleration: any speed change is reachable
+        gain = np.where(np.isfinite(accel), 2.0 * accel * L, UNLIMITED_GAIN)
+        w = _reachable(cap, gain)
+
+        # Trapezoid (or triangle) per segment
+        v0 = np.sqrt(w[:-1])
+        v1 = np.sqrt(w[1:])
+        vm = velocity
+        with np.errstate(divide='ignore', invalid='ignore'):
+            d_acc = (vm * vm - w[:-1]) / (2.0 * accel)
+            d_dec = (vm * vm - w[1:]) / (2.0 * accel)
+            cruise = L - d_acc - d_dec
+            t_trap = (vm - v0) / accel + (vm - v1) / accel + cruise / vm
+            vp = np.sqrt(np.maximum((2.0 * accel * L + w[:-1] + w[1:]) / 2.0, 0.0))
+            t_tri = (2.0 * vp - v0 - v1) / accel
+        t = np.where(cruise >= 0, t_trap, t_tri)
+        # Unlimited acceleration: constant speed
+        t = np.where(np.isfinite(accel), t, L / vm)
+        segment_time[moving] = t
+
+    per_line = np.bincount(toolpath.line, weights=segment_time, minlength=line_count) if n \
+        else np.zeros(line_count)
+    dwell = float(toolpath.dwell_time.sum())
+    if len(toolpath.dwell_line):
+        per_line += np.bincount(toolpath.dwell_line, weights=toolpath.dwell_time.astype(np.float64),
+                                minlength=line_count)
+
+    per_tool = {}
+    if n:
+        # Sum over the runs of segments cut with the same tool
+        starts = np.concatenate(([0], np.flatnonzero(toolpath.tool[1:] != toolpath.tool[:-1]) + 1))
+        sums = np.add.reduceat(segment_time, starts)
+        for tool, seconds in zip(toolpath.tool[starts].tolist(), sums.tolist()):
+            per_tool[tool] = per_tool.get(tool, 0.0) + seconds
+    if len(toolpath.dwell_line):
+        # A dwell belongs to the tool of the last move before it
+        index = np.searchsorted(toolpath.line, toolpath.dwell_line, side='right') - 1
+        tools = np.where(index >= 0, toolpath.tool[np.maximum(index, 0)], -1) if n \
+            else np.full(len(index), -1)
+        for tool, seconds in zip(tools.tolist(), toolpath.dwell_time.tolist()):
+            per_tool[tool] = per_tool.get(tool, 0.0) + seconds
+
+    total = float(segment_time.sum()) + dwell
+    return CycleTime(total, per_tool, per_line, segment_time, dwell)
+
+
+def store_cycle_time(cache, path, limits, cycle):
+    """
+    Writes the estimate of the program at path, made with limits, to an
+    AnalysisCache.
+    """
+    cache.put(path, CYCLE_BLOB.format(SUMMARY_VERSION, limits.key()), cycle.to_bytes())
+
+
+def load_cycle_time(cache, path, limits, rehash=True):
+    """
+    Returns the cached estimate of the program at path for limits, or None.
+    rehash is as for AnalysisCache.get().
+    """
+    data = cache.get(path, CYCLE_BLOB.format(SUMMARY_VERSION, limits.key()), rehash)
+    if data is None:
+        return None
+    try:
+        return CycleTime.from_bytes(data)
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+        LOG.warning('Cached cycle time of {} unreadable: {}'.format(path, e))
+        return None
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+# Diff-only DRO updates.
+#
+# Each DRO channel quantizes its value to the display resolution and only
+# formats and sets a new text when the quantized value changed; texts of
+# recent values are cached.  All channels of one status snapshot are
+# updated in one call, so Qt paints the changed labels together, and
+# updates that would not change any text are only counted.
+
+from qtvcp import logger
+
+LOG = logger.getLogger(__name__)
+
+# Formatted texts kept per channel
+TEXT_CACHE_SIZE = 64
+
+
+class DroChannel:
+    def __init__(self, widget, resolution=0.01, fmt='{:.2f}'):
+        """
+        widget: label with setText(); fmt formats a value rounded to resolution.
+        """
+        self.widget = widget
+        self.resolution = resolution
+        self.fmt = fmt
+        self.step = None
+        self._texts = {}
+
+    def text(self, step):
+        text = self._texts.get(step)
+        if text is None:
+            if len(self._texts) >= TEXT_CACHE_SIZE:
+                self._texts.clear()
+            text = self._texts[step] = self.fmt.format(step * self.resolution)
+        return text
+
+    def set(self, value):
+        """
+        Shows value; returns False if the displayed text stays the same.
+        """
+        step = int(round(value / self.resolution))
+        if step == self.step:
+            return False
+        self.step = step
+        self.widget.setText(self.text(step))
+        return True
+
+    def invalidate(self):
+        self.step = None
+
+
+class DroPipeline:
+    def __init__(self):
+        self.channels = {}
+        self.updates = 0
+        self.changed = 0
+        self.suppressed = 0
+
+    def add(self, name, widget, resolution=0.01, fmt='{:.2f}'):
+        if widget is None:
+            LOG.warning('DRO widget for {} not defined in UI.'.format(name))
+            return
+        self.channels[name] = DroChannel(widget, resolution, fmt)
+
+    def update(self, values):
+        """
+        Applies {channel name: value} of one status snapshot.
+        """
+        for name, value in values.items():
+            channel = self.channels.get(name)
+            if channel is None or value is None:
+                continue
+            self.updates += 1
+            if channel.set(value):
+                self.changed += 1
+            else:
+                self.suppressed += 1
+
+    def invalidate(self):
+        """
+        Forces the next update to set every text, e.g. after a font change.
+        """
+        for channel in self.channels.values():
+            channel.invalidate()
+
+    def stats(self):
+        return {'updates': self.updates, 'changed': self.changed, 'suppressed': self.suppressed}
@@ -0,0 +1,952 @@
+#!/usr/bin/env python3
+
+# Streaming G-code analyzer for the IntuiGUI CAM wizard.
+#
+# The analyzer reads a program in a single pass and keeps only the modal
+# state and a few running aggregates, so memory stays flat no matter how
+# large the program is.  It does not execute O-word flow control or
+# evaluate parameter expressions; words whose value is an expression are
+# skipped, which is good enough for the tool list, offsets and extents that
+# the wizard shows before a program is run.  The first construct it does not
+# execute (flow control, parameters, canned cycles and other codes the
+# interpreter expands into motion) is recorded in the summary, so a preview
+# can tell when its toolpath is not what the interpreter would produce.
+#
+# The file is read in blocks and each block is scanned with NumPy first.
+# Runs of plain motion lines (G0-G3 with axis, arc, feed and speed words,
+# the bulk of a CAM program) are tokenized, parsed and applied to the modal
+# state as arrays; every other line goes through the line-by-line state
+# machine, which both paths share.
+
+import math
+import os
+import re
+
+import numpy as np
+
+from qtvcp import logger
+from qtvcp.widgets.toolpath import (ToolpathBuilder, Toolpath, RAPID, FEED, ARC, FLAG_FEED_PER_REV,
+                                    FLAG_CSS, FLAG_INVERSE_TIME, PLANE_XY, PLANE_XZ, PLANE_YZ)
+
+LOG = logger.getLogger(__name__)
+
+INCH = 25.4
+SURFACE_FOOT = 12 * INCH
+
+# A single word: letter followed by a plain number.  Words whose value is a
+# parameter or an expression ('#', '[') are not matched and therefore ignored.
+_WORD_RE = re.compile(rb'([A-Z])\s*([-+]?(?:\d+\.?\d*|\.\d+))')
+_COMMENT_RE = re.compile(rb'\([^)]*\)')
+# The same comments, in a block of lines
+_BLOCK_COMMENT_RE = re.compile(rb'\([^)\n]*\)')
+_BLOCK_SEMICOLON_RE = re.compile(rb';[^\n]*')
+
+# Non-modal codes whose axis words must not be treated as motion.
+_NO_MOTION_CODES = frozenset((40, 100, 280, 281, 300, 301, 530, 920, 921, 922, 923))
+
+# Codes whose motion or offsets the interpreter computes and the analyzer
+# does not: splines, G10, G28/G30, G33.1, probing, cutter compensation,
+# G53, the lathe and drilling cycles and G92.
+_INEXACT_CODES = frozenset((50, 51, 52, 100, 280, 300, 331, 382, 383, 384, 385, 410, 411, 420, 421,
+                            530, 700, 710, 711, 720, 721, 730, 740, 760,
+                            810, 820, 830, 840, 850, 860, 870, 880, 890, 920, 923))
+# O-words, parameters and expressions
+_INEXACT_RE = re.compile(rb'O\s*(?:<[^>]*>|\d*)|#\s*(?:<[^>]*>|\d*)|\[')
+
+# G-code (x10) -> work offset name
+_WORK_OFFSETS = {
+    540: 'G54', 550: 'G55', 560: 'G56', 570: 'G57', 580: 'G58',
+    590: 'G59', 591: 'G59.1', 592: 'G59.2', 593: 'G59.3',
+}
+
+# Plane -> (first axis index, second axis index, normal axis index,
+#           letter of first centre offset, letter of second centre offset)
+_PLANES = {
+    170: (0, 1, 2, 'I', 'J'),
+    180: (2, 0, 1, 'K', 'I'),
+    190: (1, 2, 0, 'J', 'K'),
+}
+
+# Plane -> plane code of the toolpath arc table
+_PLANE_CODES = {170: PLANE_XY, 180: PLANE_XZ, 190: PLANE_YZ}
+
+_EMPTY = {}
+
+# Cap on the number of distinct spindle/feed words remembered.
+MAX_DISTINCT_WORDS = 256
+
+# Bytes read per block; progress, cancellation and chunks go per block
+BLOCK_SIZE = 1 << 20
+# Shortest run of plain lines worth handling as arrays
+MIN_RUN = 32
+# Longest number (characters) the block scan parses
+MAX_NUMBER = 24
+
+# Words of plain lines, in the column order of the block scan tables
+_FAST_LETTERS = b'GMNXYZIJKRFS'
+_G, _M, _N, _X, _Y, _Z, _I, _J, _K, _R, _F, _S = range(len(_FAST_LETTERS))
+_LETTER_COLUMN = {letter: _FAST_LETTERS.index(letter.encode()) for letter in 'IJK'}
+# Byte classes of the block scan; letters are _LETTER + their column
+_OTHER, _SPACE, _NEWLINE, _NUMBER, _SIGN, _LETTER = range(6)
+_CLASS = np.zeros(256, dtype=np.uint8)
+_CLASS[np.frombuffer(b'0123456789.', dtype=np.uint8)] = _NUMBER
+_CLASS[np.frombuffer(b'+-', dtype=np.uint8)] = _SIGN
+_CLASS[np.frombuffer(b' \t\r', dtype=np.uint8)] = _SPACE
+_CLASS[ord('\n')] = _NEWLINE
+_CLASS[np.frombuffer(_FAST_LETTERS, dtype=np.uint8)] = _LETTER + np.arange(len(_FAST_LETTERS))
+# Motion codes (x10) a plain line may hold, and M codes it may not
+_FAST_MOTION = (0, 10, 20, 30)
+_STATE_MCODES = (2, 6, 30)
+
+# Cap on the number of G10 offset settings remembered.
+MAX_OFFSET_SETTINGS = 64
+
+# Bumped whenever ProgramSummary gains fields, so stale cached summaries
+# are not used.
+SUMMARY_VERSION = 4
+SUMMARY_BLOB = 'summary.v{}.json'.format(SUMMARY_VERSION)
+TOOLPATH_BLOB = 'toolpath.v{}.bin'.format(SUMMARY_VERSION)
+
+
+def _scan_block(data):
+    """
+    Tokenizes a block of upper-case, comment-free lines ending in a newline.
+
+    Returns (ends, plain, table): the offset of each line's newline, which
+    lines are plain motion lines, and a (letters, lines) table of the words
+    of the plain lines, NaN where a line has no such word.
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    cls = np.take(_CLASS, buf)
+    ends = np.flatnonzero(cls == _NEWLINE)
+    n = len(ends)
+    plain = np.ones(n, dtype=bool)
+    plain[np.searchsorted(ends, np.flatnonzero(cls == _OTHER))] = False
+
+    numeric = (cls - np.uint8(_NUMBER)) < 2
+    run_start = np.flatnonzero(numeric[1:] & ~numeric[:-1]) + 1
+    run_end = np.flatnonzero(numeric[:-1] & ~numeric[1:]) + 1
+    if numeric[0]:
+        # A number at the start of the block has no letter
+        plain[0] = False
+        run_end = run_end[1:]
+    # Numbers not right after a letter (e.g. 'X 1', '1X') and signs inside
+    # a number ('1-2') are left to the line parser's regex
+    plain[np.searchsorted(ends, run_start[cls[run_start - 1] < _LETTER])] = False
+    plain[np.searchsorted(ends, np.flatnonzero((cls[1:] == _SIGN) & numeric[:-1]) + 1)] = False
+
+    letters = np.flatnonzero(cls >= _LETTER)
+    line = np.searchsorted(ends, letters)
+    column = cls[letters].astype(np.intp) - _LETTER
+    start = letters + 1
+    # Index of the last letter at or before every byte
+    owner = np.full(len(buf), -1, dtype=np.intp)
+    owner[letters] = np.arange(len(letters))
+    np.maximum.accumulate(owner, out=owner)
+    width = np.zeros(len(letters), dtype=np.intp)
+    after = cls[run_start - 1] >= _LETTER
+    width[owner[run_start[after] - 1]] = (run_end - run_start)[after]
+    bad = (width == 0) | (width > MAX_NUMBER)
+    width[bad] = 0
+
+    # Digits after the decimal point, from the position of the (single) dot
+    decimals = np.zeros(len(letters), dtype=np.intp)
+    dot = np.flatnonzero(buf == 46)
+    word = owner[dot]
+    inside = (word >= 0) & (dot < start[word] + width[word])
+    dot, word = dot[inside], word[inside]
+    bad[word[np.bincount(word, minlength=len(letters))[word] > 1]] = True
+    decimals[word] = start[word] + width[word] - dot - 1
+
+    # Numbers from their digits, column by column: mantissa / 10 ** decimals
+    # is exact to the last bit for up to 15 digits
+    pad = np.concatenate((buf, np.zeros(MAX_NUMBER, dtype=np.uint8)))
+    mantissa = np.zeros(len(letters))
+    lead = []
+    for i in range(int(width.max()) if len(letters) else 0):
+        digit = pad[start + i] - np.uint8(48)
+        is_digit = (digit < 10) & (i < width)
+        mantissa = np.where(is_digit, mantissa * 10 + digit, mantissa)
+        if i < 2:
+            lead.append(is_digit)
+    if lead:
+        # '.', '-', '+.': no digits at all
+        bad |= (width == 1) & ~lead[0]
+        if len(lead) > 1:
+            bad |= (width == 2) & ~lead[0] & ~lead[1]
+    bad |= mantissa >= 2 ** 53
+    values = mantissa / np.power(10.0, decimals)
+    values[pad[start] == 45] *= -1.0
+    plain[line[bad]] = False
+
+    # One word per letter and line, and only the motion G-codes
+    key = line * len(_FAST_LETTERS) + column
+    plain[np.flatnonzero(np.bincount(key, minlength=n * len(_FAST_LETTERS)) > 1) // len(_FAST_LETTERS)] = False
+    g = column == _G
+    plain[line[g][~np.isin(np.round(values[g] * 10), _FAST_MOTION)]] = False
+    m = column == _M
+    plain[line[m][np.isin(np.trunc(values[m]), _STATE_MCODES)]] = False
+
+    table = np.full((len(_FAST_LETTERS), n), np.nan)
+    keep = plain[line]
+    table[column[keep], line[keep]] = values[keep]
+    return ends, plain, table
+
+
+def _fill(values, initial):
+    """
+    Forward-fills the NaNs of values, starting from initial.
+    """
+    index = np.where(np.isnan(values), -1, np.arange(len(values)))
+    np.maximum.accumulate(index, out=index)
+    return np.where(index >= 0, values[np.maximum(index, 0)], initial)
+
+
+class AnalysisCancelled(Exception):
+    """
+    Raised when an analysis is cancelled before it completes.
+    """
+
+
+class InexactProgram(Exception):
+    """
+    Raised by an exact analysis at a program the analyzer cannot follow
+    the way the interpreter does; lineno and word locate the first
+    construct it does not execute.
+    """
+
+    def __init__(self, path, lineno, word):
+        super(InexactProgram, self).__init__('{}:{}: {}'.format(path, lineno, word))
+        self.path = path
+        self.lineno = lineno
+        self.word = word
+
+
+class ProgramSummary:
+    """
+    Result of a single analysis pass over a G-code program.
+    All lengths are in millimetres, feeds in the program's feed units.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.size = 0
+        self.mtime = 0.0
+        self.line_count = 0
+        # Distinct tool numbers in order of first selection (T words)
+        self.tools = []
+        # Tool changes as (line number, tool number) for each M6
+        self.tool_changes = []
+        # Distinct S and F words in order of first use (capped)
+        self.spindle_speeds = []
+        self.feed_rates = []
+        self.max_spindle = 0.0
+        self.max_feed = 0.0
+        self.css_used = False
+        # Spindle speed limit (D word) of the last G96
+        self.css_max_rpm = 0.0
+        # Sum of all G4 dwells, seconds
+        self.dwell_time = 0.0
+        # Work offsets (G54..G59.3) in order of first use
+        self.work_offsets = []
+        # G10 L2/L20 words as (line number, L, P, {axis letter: value})
+        self.offset_settings = []
+        # Axis extents of all programmed motion as (x, y, z) tuples
+        self.extents_min = None
+        self.extents_max = None
+        self.rapid_count = 0
+        self.feed_count = 0
+        self.arc_count = 0
+        self.rapid_distance = 0.0
+        self.feed_distance = 0.0
+        # (line number, word) of the first construct not executed (O-word,
+        # parameter, expression or a code in _INEXACT_CODES), or None if the
+        # toolpath follows the program exactly
+        self.unsupported = None
+        # Toolpath buffer, if one was built; not part of to_dict()
+        self.toolpath = None
+
+    def to_dict(self):
+        data = dict(self.__dict__)
+        data.pop('toolpath', None)
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        summary = cls()
+        for key, value in data.items():
+            if hasattr(summary, key):
+                setattr(summary, key, value)
+        # Tuples do not survive a JSON round trip
+        if summary.extents_min is not None:
+            summary.extents_min = tuple(summary.extents_min)
+            summary.extents_max = tuple(summary.extents_max)
+        summary.tool_changes = [tuple(c) for c in summary.tool_changes]
+        summary.offset_settings = [tuple(s) for s in summary.offset_settings]
+        if summary.unsupported is not None:
+            summary.unsupported = tuple(summary.unsupported)
+        return summary
+
+    def __repr__(self):
+        return '<ProgramSummary {} lines={} tools={} offsets={}>'.format(
+            self.path, self.line_count, self.tools, self.work_offsets)
+
+
+class GCodeAnalyzer:
+    """
+    Single-pass modal state machine over G-code lines.
+
+    Feed lines with feed_line() (bytes, without needing the trailing newline)
+    and call finish() to get the ProgramSummary.  If a ToolpathBuilder is
+    given every move is added to it as well.
+    """
+
+    def __init__(self, path=None, builder=None):
+        self.summary = ProgramSummary(path)
+        self.builder = builder
+        self.pos = [0.0, 0.0, 0.0]
+        self.absolute = True
+        self.arc_absolute = False
+        self.scale = 1.0
+        self.diameter_mode = False
+        self.motion = 0
+        self.plane = 180
+        self.tool = None
+        # Tool loaded by the last M6; None until the program uses M6
+        self.spindle_tool = None
+        self.feed = 0.0
+        self.speed = 0.0
+        self.flags = 0
+        self.ended = False
+        self._tools_seen = set()
+        self._speeds_seen = set()
+        self._feeds_seen = set()
+        self._offsets_seen = set()
+        self._codes = {}
+        self._moved = False
+        self._min = [math.inf, math.inf, math.inf]
+        self._max = [-math.inf, -math.inf, -math.inf]
+
+    def _extend(self, p):
+        mn = self._min
+        mx = self._max
+        for i in (0, 1, 2):
+            v = p[i]
+            if v < mn[i]:
+                mn[i] = v
+            if v > mx[i]:
+                mx[i] = v
+
+    def _code(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = int(round(float(value) * 10))
+        return code
+
+    def feed_line(self, raw, lineno):
+        """
+        Process one raw program line.  Returns False once the program has
+        ended (M2/M30), True otherwise.
+        """
+        if self.ended:
+            return False
+        line = raw.upper()
+        if b'(' in line:
+            line = _COMMENT_RE.sub(b'', line)
+        if b';' in line:
+            line = line.split(b';', 1)[0]
+        if self.summary.unsupported is None:
+            match = _INEXACT_RE.search(line)
+            if match is not None:
+                self.summary.unsupported = (lineno, match.group().decode('ascii', 'replace'))
+        words = _WORD_RE.findall(line)
+        if not words:
+            return True
+
+        x = y = z = None
+        params = None
+        gcodes = None
+        mcodes = None
+        for letter, value in words:
+            if letter == b'X':
+                x = float(value)
+            elif letter == b'Z':
+                z = float(value)
+            elif letter == b'G':
+                if gcodes is None:
+                    gcodes = [self._code(value)]
+                else:
+                    gcodes.append(self._code(value))
+            elif letter == b'Y':
+                y = float(value)
+            elif letter == b'M':
+                if mcodes is None:
+                    mcodes = [int(float(value))]
+                else:
+                    mcodes.append(int(float(value)))
+            elif params is None:
+                params = {letter: float(value)}
+            else:
+                params[letter] = float(value)
+
+        no_motion = False
+        if gcodes is not None:
+            if self.summary.unsupported is None and not _INEXACT_CODES.isdisjoint(gcodes):
+                code = next(g for g in gcodes if g in _INEXACT_CODES)
+                self.summary.unsupported = (lineno, 'G{:g}'.format(code / 10))
+            no_motion = self._modal(gcodes)
+            if 100 in gcodes and params is not None:
+                self._offset_setting(params, x, y, z, lineno)
+            if 40 in gcodes and params is not None:
+                self._dwell(params, lineno)
+        if params is not None:
+            self._words(params)
+        if mcodes is not None:
+            self._mcodes(mcodes, lineno)
+
+        # --- motion ---
+        if (x is not None or y is not None or z is not None) \
+                and not no_motion and self.motion is not None:
+            self._move(x, y, z, params or _EMPTY, lineno)
+        return not self.ended
+
+    def feed_block(self, data, lineno):
+        """
+        Processes a block of complete lines (bytes ending in a newline), the
+        first of which is line lineno.  Returns (lines processed, running):
+        processing stops after the line that ends the program.
+        """
+        data = data.upper()
+        if b'(' in data:
+            data = _BLOCK_COMMENT_RE.sub(b'', data)
+        if b';' in data:
+            data = _BLOCK_SEMICOLON_RE.sub(b'', data)
+        ends, plain, table = _scan_block(data)
+        n = len(ends)
+        ends = ends.tolist()
+        feed_line = self.feed_line
+        done = 0
+        for stop in np.flatnonzero(~plain).tolist() + [n]:
+            if stop - done >= MIN_RUN:
+                self._feed_run(table[:, done:stop], lineno + done)
+            else:
+                for i in range(done, stop):
+                    feed_line(data[ends[i - 1] + 1 if i else 0:ends[i] + 1], lineno + i)
+            if stop < n and not feed_line(data[ends[stop - 1] + 1 if stop else 0:ends[stop] + 1], lineno + stop):
+                return stop + 1, False
+            done = stop + 1
+        return n, True
+
+    def _feed_run(self, table, lineno):
+        """
+        Applies a run of plain lines, given as their scan table, to the
+        modal state: the same as feeding them one by one, as arrays.
+        """
+        summary = self.summary
+        count = table.shape[1]
+        motion = _fill(np.round(table[_G] * 10), -1 if self.motion is None else self.motion)
+        feed = _fill(table[_F], self.feed)
+        speed = _fill(table[_S], self.speed)
+        for values, seen, found, peak in ((table[_S], self._speeds_seen, summary.spindle_speeds, 'max_spindle'),
+                                          (table[_F], self._feeds_seen, summary.feed_rates, 'max_feed')):
+            values = values[~np.isnan(values)]
+            if not len(values):
+                continue
+            setattr(summary, peak, max(getattr(summary, peak), float(values.max())))
+            unique, first = np.unique(values, return_index=True)
+            for value in unique[np.argsort(first)].tolist():
+                if len(seen) >= MAX_DISTINCT_WORDS:
+                    break
+                if value not in seen:
+                    seen.add(value)
+                    found.append(value)
+        self.motion = None if motion[-1] < 0 else int(motion[-1])
+        self.feed = float(feed[-1])
+        self.speed = float(speed[-1])
+
+        axes = table[[_X, _Y, _Z]]
+        rows = np.flatnonzero(~np.isnan(axes).all(axis=0) & (motion >= 0))
+        if not len(rows):
+            return
+        scale = self.scale
+        words = axes[:, rows] * scale
+        if self.diameter_mode:
+            words[0] = axes[0, rows] * scale / 2.0
+        start = np.array(self.pos, dtype=np.float64)
+        if self.absolute:
+            end = np.stack([_fill(words[i], start[i]) for i in range(3)], axis=1)
+        else:
+            end = np.stack([np.cumsum(np.concatenate(([start[i]], np.nan_to_num(words[i]))))[1:]
+                            for i in range(3)], axis=1)
+        begin = np.concatenate((start[None], end[:-1]))
+        code = motion[rows]
+        length = np.sqrt(((end - begin) ** 2).sum(axis=1))
+        rapid = code == 0
+        arc = (code == 20) | (code == 30)
+        kind = np.where(rapid, RAPID, FEED).astype(np.uint8)
+        points = [end]
+
+        arcs = None
+        index = np.flatnonzero(arc)
+        if len(index):
+            center, ok, arc_length, bulge = self._arc_run(begin[index], end[index], table[:, rows[index]],
+                                                          code[index] == 20)
+            length[index[ok]] = arc_length
+            kind[index[ok]] = ARC
+            points.append(bulge)
+            arcs = (index[ok], center, _PLANE_CODES[self.plane], code[index[ok]] == 20, 1)
+
+        summary.rapid_count += int(rapid.sum())
+        summary.feed_count += int(len(rows) - rapid.sum())
+        summary.arc_count += int(arc.sum())
+        summary.rapid_distance += float(length[rapid].sum())
+        summary.feed_distance += float(length[~rapid].sum())
+
+        if self.builder is not None:
+            tool = self.spindle_tool if self.spindle_tool is not None else self.tool
+            feed = feed[rows] if self.flags & FLAG_INVERSE_TIME else feed[rows] * scale
+            speed = speed[rows]
+            if self.flags & FLAG_CSS:
+                speed = speed * (SURFACE_FOOT if scale != 1.0 else 1000.0)
+            self.builder.extend(end, kind, lineno + rows, feed, speed, self.flags,
+                                -1 if tool is None else tool, arcs)
+
+        if not self._moved:
+            self._moved = True
+            points.append(start[None])
+        points = np.concatenate(points)
+        low, high = points.min(axis=0), points.max(axis=0)
+        self._min = [min(a, b) for a, b in zip(self._min, low.tolist())]
+        self._max = [max(a, b) for a, b in zip(self._max, high.tolist())]
+        self.pos = tuple(end[-1].tolist())
+
+    def _arc_run(self, start, end, words, clockwise):
+        """
+        arc_center() and _arc() for a run of arcs in the current plane.
+        Returns the centres of the resolvable arcs, which arcs those are,
+        their lengths and the axis extremes they pass.
+        """
+        a1, a2, an, l1, l2 = _PLANES[self.plane]
+        scale = self.scale
+        s1, s2, e1, e2 = start[:, a1], start[:, a2], end[:, a1], end[:, a2]
+        r = words[_R] * scale
+        with np.errstate(divide='ignore', invalid='ignore'):
+            d1, d2 = e1 - s1, e2 - s2
+            chord = np.hypot(d1, d2)
+            h = np.sqrt(np.maximum(r * r - chord * chord / 4.0, 0.0))
+            side = np.where(clockwise, -1.0, 1.0)
+            side = np.where(r < 0, -side, side)
+            r1 = (s1 + e1) / 2.0 - side * h * d2 / chord
+            r2 = (s2 + e2) / 2.0 + side * h * d1 / chord
+        o1, o2 = words[_LETTER_COLUMN[l1]], words[_LETTER_COLUMN[l2]]
+        by_radius = ~np.isnan(r)
+        ok = np.where(by_radius, (chord != 0.0) & ~(np.abs(r) < chord / 2.0 - 1e-9),
+                      ~(np.isnan(o1) & np.isnan(o2)))
+        o1, o2 = np.nan_to_num(o1) * scale, np.nan_to_num(o2) * scale
+        if not self.arc_absolute:
+            o1, o2 = s1 + o1, s2 + o2
+        c1 = np.where(by_radius, r1, o1)[ok]
+        c2 = np.where(by_radius, r2, o2)[ok]
+        s1, s2, e1, e2, clockwise = s1[ok], s2[ok], e1[ok], e2[ok], clockwise[ok]
+        start = start[ok]
+        center = start.copy()
+        center[:, a1] = c1
+        center[:, a2] = c2
+
+        radius = np.hypot(s1 - c1, s2 - c2)
+        a0 = np.arctan2(s2 - c2, s1 - c1)
+        two_pi = 2 * math.pi
+        sweep = np.where(clockwise, (a0 - np.arctan2(e2 - c2, e1 - c1)) % two_pi,
+                         (np.arctan2(e2 - c2, e1 - c1) - a0) % two_pi)
+        sweep = np.where(sweep < 1e-9, two_pi, sweep)
+        length = np.hypot(radius * sweep, end[ok, an] - start[:, an])
+        # Axis-aligned extremes passed by the arcs
+        bulge = []
+        for k in range(4):
+            ang = k * math.pi / 2.0
+            rel = np.where(clockwise, (a0 - ang) % two_pi, (ang - a0) % two_pi)
+            hit = rel <= sweep
+            p = start[hit].copy()
+            p[:, a1] = c1[hit] + radius[hit] * math.cos(ang)
+            p[:, a2] = c2[hit] + radius[hit] * math.sin(ang)
+            bulge.append(p)
+        return center, ok, length, np.concatenate(bulge)
+
+    def _modal(self, gcodes):
+        """
+        Applies the modal G-codes of a line.  Returns True if the line holds
+        a non-modal code that consumes the axis words.
+        """
+        summary = self.summary
+        no_motion = False
+        for g in gcodes:
+            if g in (0, 10, 20, 30, 330, 331):
+                self.motion = g
+            elif g == 800:
+                self.motion = None
+            elif g == 900:
+                self.absolute = True
+            elif g == 910:
+                self.absolute = False
+            elif g == 901:
+                self.arc_absolute = True
+            elif g == 911:
+                self.arc_absolute = False
+            elif g == 200:
+                self.scale = INCH
+            elif g == 210:
+                self.scale = 1.0
+            elif g == 70:
+                self.diameter_mode = True
+            elif g == 80:
+                self.diameter_mode = False
+            elif g in _PLANES:
+                self.plane = g
+            elif g == 960:
+                summary.css_used = True
+                self.flags |= FLAG_CSS
+            elif g == 970:
+                self.flags &= ~FLAG_CSS
+            elif g == 930:
+                self.flags = (self.flags & ~FLAG_FEED_PER_REV) | FLAG_INVERSE_TIME
+            elif g == 940:
+                self.flags &= ~(FLAG_FEED_PER_REV | FLAG_INVERSE_TIME)
+            elif g == 950:
+                self.flags = (self.flags & ~FLAG_INVERSE_TIME) | FLAG_FEED_PER_REV
+            elif g in _WORK_OFFSETS:
+                name = _WORK_OFFSETS[g]
+                if name not in self._offsets_seen:
+                    self._offsets_seen.add(name)
+                    summary.work_offsets.append(name)
+            elif g in _NO_MOTION_CODES:
+                no_motion = True
+        return no_motion
+
+    def _words(self, params):
+        """
+        Records tool, spindle and feed words.
+        """
+        summary = self.summary
+        t = params.get(b'T')
+        if t is not None:
+            self.tool = int(t)
+            if self.tool not in self._tools_seen:
+                self._tools_seen.add(self.tool)
+                summary.tools.append(self.tool)
+        s = params.get(b'S')
+        if s is not None:
+            self.speed = s
+            if s > summary.max_spindle:
+                summary.max_spindle = s
+            if s not in self._speeds_seen and len(self._speeds_seen) < MAX_DISTINCT_WORDS:
+                self._speeds_seen.add(s)
+                summary.spindle_speeds.append(s)
+        d = params.get(b'D')
+        if d is not None and self.flags & FLAG_CSS:
+            summary.css_max_rpm = d
+        f = params.get(b'F')
+        if f is not None:
+            self.feed = f
+            if f > summary.max_feed:
+                summary.max_feed = f
+            if f not in self._feeds_seen and len(self._feeds_seen) < MAX_DISTINCT_WORDS:
+                self._feeds_seen.add(f)
+                summary.feed_rates.append(f)
+
+    def _offset_setting(self, params, x, y, z, lineno):
+        """
+        Records a G10 L2/L20 coordinate system setting.
+        """
+        l_word = params.get(b'L')
+        if l_word not in (2, 20) or len(self.summary.offset_settings) >= MAX_OFFSET_SETTINGS:
+            return
+        values = {}
+        for axis, value in (('X', x), ('Y', y), ('Z', z)):
+            if value is not None:
+                values[axis] = value * self.scale
+        self.summary.offset_settings.append((lineno, int(l_word), int(params.get(b'P', 0)), values))
+
+    def _dwell(self, params, lineno):
+        seconds = params.get(b'P')
+        if seconds is None:
+            return
+        self.summary.dwell_time += seconds
+        if self.builder is not None:
+            self.builder.add_dwell(lineno, seconds)
+
+    def _mcodes(self, mcodes, lineno):
+        for m in mcodes:
+            if m == 6:
+                self.spindle_tool = self.tool
+                self.summary.tool_changes.append((lineno, self.tool))
+            elif m in (2, 30):
+                self.ended = True
+
+    def _move(self, x, y, z, params, lineno):
+        summary = self.summary
+        start = self.pos
+        scale = self.scale
+        ex, ey, ez = start
+        if self.absolute:
+            if x is not None:
+                ex = x * scale / 2.0 if self.diameter_mode else x * scale
+            if y is not None:
+                ey = y * scale
+            if z is not None:
+                ez = z * scale
+        else:
+            if x is not None:
+                ex += x * scale / 2.0 if self.diameter_mode else x * scale
+            if y is not None:
+                ey += y * scale
+            if z is not None:
+                ez += z * scale
+        end = (ex, ey, ez)
+        motion = self.motion
+        builder = self.builder
+        center = None
+        if motion == 0:
+            summary.rapid_count += 1
+            summary.rapid_distance += math.dist(start, end)
+        elif motion == 10 or motion > 300:
+            summary.feed_count += 1
+            summary.feed_distance += math.dist(start, end)
+        else:
+            clockwise = motion == 20
+            center = self.arc_center(start, end, params, clockwise)
+            if center is None:
+                # Unresolvable arc (e.g. centre given as expression); treat as line
+                length = math.dist(start, end)
+            else:
+                length = self._arc(start, end, center, params, clockwise)
+            summary.arc_count += 1
+            summary.feed_count += 1
+            summary.feed_distance += length
+        if builder is not None:
+            tool = self.spindle_tool if self.spindle_tool is not None else self.tool
+            tool = -1 if tool is None else tool
+            feed = self.feed if self.flags & FLAG_INVERSE_TIME else self.feed * scale
+            speed = self.speed
+            if self.flags & FLAG_CSS:
+                # Surface speed from m/min or ft/min to mm/min
+                speed *= SURFACE_FOOT if scale != 1.0 else 1000.0
+            if center is not None:
+                builder.add_arc(end, center, _PLANE_CODES[self.plane], motion == 20,
+                                params.get(b'P', 1), lineno, feed, speed, self.flags, tool)
+            else:
+                builder.add(end, RAPID if motion == 0 else FEED, lineno, feed, speed, self.flags, tool)
+        if not self._moved:
+            self._moved = True
+            self._extend(start)
+        mn = self._min
+        mx = self._max
+        if ex < mn[0]:
+            mn[0] = ex
+        if ex > mx[0]:
+            mx[0] = ex
+        if ey < mn[1]:
+            mn[1] = ey
+        if ey > mx[1]:
+            mx[1] = ey
+        if ez < mn[2]:
+            mn[2] = ez
+        if ez > mx[2]:
+            mx[2] = ez
+        self.pos = end
+
+    def arc_center(self, start, end, params, clockwise):
+        """
+        Returns the arc centre for the current plane as a 3-list, or None if
+        the arc cannot be resolved from the words on the line.
+        """
+        a1, a2, _, l1, l2 = _PLANES[self.plane]
+        scale = self.scale
+        r = params.get(b'R')
+        if r is not None:
+            r *= scale
+            s1, s2 = start[a1], start[a2]
+            e1, e2 = end[a1], end[a2]
+            d1, d2 = e1 - s1, e2 - s2
+            chord = math.hypot(d1, d2)
+            if chord == 0.0 or abs(r) < chord / 2.0 - 1e-9:
+                return None
+            h = math.sqrt(max(r * r - chord * chord / 4.0, 0.0))
+            # Perpendicular to the chord; side picked by direction and sign of R
+            side = -1.0 if clockwise else 1.0
+            if r < 0:
+                side = -side
+            m1, m2 = (s1 + e1) / 2.0, (s2 + e2) / 2.0
+            c1 = m1 - side * h * d2 / chord
+            c2 = m2 + side * h * d1 / chord
+        else:
+            o1 = params.get(l1.encode())
+            o2 = params.get(l2.encode())
+            if o1 is None and o2 is None:
+                return None
+            o1 = (o1 or 0.0) * scale
+            o2 = (o2 or 0.0) * scale
+            if self.arc_absolute:
+                c1, c2 = o1, o2
+            else:
+                c1, c2 = start[a1] + o1, start[a2] + o2
+        center = list(start)
+        center[a1] = c1
+        center[a2] = c2
+        return center
+
+    def _arc(self, start, end, center, params, clockwise):
+        """
+        Extends the extents by the arc's bulge and returns its length.
+        """
+        a1, a2, an, _, _ = _PLANES[self.plane]
+        c1, c2 = center[a1], center[a2]
+        radius = math.hypot(start[a1] - c1, start[a2] - c2)
+        sweep = arc_sweep(start[a1] - c1, start[a2] - c2, end[a1] - c1, end[a2] - c2,
+                          clockwise, int(params.get(b'P', 1)))
+        # Axis-aligned extremes passed by the arc
+        a0 = math.atan2(start[a2] - c2, start[a1] - c1)
+        for k in range(4):
+            ang = k * math.pi / 2.0
+            rel = (ang - a0) % (2 * math.pi)
+            if clockwise:
+                rel = (a0 - ang) % (2 * math.pi)
+            if rel <= abs(sweep):
+                p = list(start)
+                p[a1] = c1 + radius * math.cos(ang)
+                p[a2] = c2 + radius * math.sin(ang)
+                self._extend(p)
+        return math.hypot(radius * sweep, end[an] - start[an])
+
+    def finish(self):
+        summary = self.summary
+        if self._min[0] != math.inf:
+            summary.extents_min = tuple(self._min)
+            summary.extents_max = tuple(self._max)
+        return summary
+
+
+def arc_sweep(s1, s2, e1, e2, clockwise, turns=1):
+    """
+    Signed sweep angle (radians) from start to end vectors relative to the
+    centre; negative for clockwise arcs.  Equal start and end angles form a
+    full circle.  Extra turns (P word) add whole revolutions.
+    """
+    a0 = math.atan2(s2, s1)
+    a1 = math.atan2(e2, e1)
+    if clockwise:
+        sweep = (a0 - a1) % (2 * math.pi)
+    else:
+        sweep = (a1 - a0) % (2 * math.pi)
+    if sweep < 1e-9:
+        sweep = 2 * math.pi
+    sweep += 2 * math.pi * max(turns - 1, 0)
+    return -sweep if clockwise else sweep
+
+
+def analyze_file(path, progress=None, cancelled=None, toolpath=False, chunk=None, exact=False):
+    """
+    Analyzes the program at path in one streaming pass and returns a
+    ProgramSummary.  The file is read in binary mode block by block, so the
+    whole program is never held in memory.  With toolpath=True the same pass
+    builds the compact toolpath buffer (summary.toolpath).
+
+    progress(fraction) is called periodically with the share of the file
+    read; if cancelled() returns True the pass stops with AnalysisCancelled.
+    chunk(toolpath) (implies toolpath=True) receives the toolpath in pieces
+    as the file is parsed, each starting where the one before ended.
+    With exact=True the pass stops with InexactProgram at the first block
+    holding a construct the analyzer does not execute (summary.unsupported),
+    before any of that block's toolpath reaches chunk().
+    """
+    builder = ToolpathBuilder() if toolpath or chunk is not None else None
+    analyzer = GCodeAnalyzer(path, builder)
+    st = os.stat(path)
+    size = max(st.st_size, 1)
+    with open(path, 'rb') as f:
+        lineno = 0
+        rest = b''
+        running = True
+        while running:
+            data = f.read(BLOCK_SIZE)
+            cut = data.rfind(b'\n') + 1
+            if data and not cut:
+                # Still inside one long line
+                rest += data
+                continue
+            block = rest + data[:cut] if data else rest
+            rest = data[cut:]
+            if block:
+                if not block.endswith(b'\n'):
+                    block += b'\n'
+                count, running = analyzer.feed_block(block, lineno + 1)
+                lineno += count
+                if exact and analyzer.summary.unsupported is not None:
+                    raise InexactProgram(path, *analyzer.summary.unsupported)
+            if not data:
+                break
+            if cancelled is not None and cancelled():
+                raise AnalysisCancelled(path)
+            if progress is not None:
+                progress(f.tell() / size)
+            if chunk is not None:
+                chunk(builder.take())
+    if chunk is not None:
+        chunk(builder.take())
+    if progress is not None:
+        progress(1.0)
+    summary = analyzer.finish()
+    summary.size = st.st_size
+    summary.mtime = st.st_mtime
+    summary.line_count = lineno
+    if builder is not None:
+        summary.toolpath = builder.finish()
+    LOG.debug('Analyzed {}: {} lines, tools {}'.format(path, lineno, summary.tools))
+    return summary
+
+
+def analyze_program(path, progress=None, cancelled=None):
+    """
+    Worker job: analyze_file() including the toolpath buffer.
+    """
+    return analyze_file(path, progress, cancelled, toolpath=True)
+
+
+def store_analysis(cache, summary):
+    """
+    Writes a summary and its toolpath (if any) to an AnalysisCache.
+    """
+    cache.put_json(summary.path, SUMMARY_BLOB, summary.to_dict())
+    if summary.toolpath is not None:
+        cache.put(summary.path, TOOLPATH_BLOB, summary.toolpath.to_bytes())
+
+
+def load_analysis(cache, path, toolpath=True, rehash=True):
+    """
+    Returns the cached summary of path (with its toolpath if requested),
+    or None if the cache does not hold a complete result.  With
+    rehash=False a file that changed identity is not hashed (for the GUI
+    thread; see AnalysisCache).
+    """
+    data = cache.get_json(path, SUMMARY_BLOB, rehash)
+    if data is None:
+        return None
+    summary = ProgramSummary.from_dict(data)
+    summary.path = path
+    if toolpath:
+        blob = cache.blob_path(path, TOOLPATH_BLOB, rehash)
+        if blob is None:
+            return None
+        try:
+            summary.toolpath = Toolpath.load(blob)
+        except (OSError, ValueError, KeyError) as e:
+            LOG.warning('Cached toolpath of {} unreadable: {}'.format(path, e))
+            return None
+    return summary
+
+
+def cached_analysis(cache, path, progress=None, cancelled=None):
+    """
+    Thread job: load_analysis() of path, content hash lookup included, or
+    None on a miss.
+    """
+    return load_analysis(cache, path)
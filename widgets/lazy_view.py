@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+# Build-on-first-show holder for expensive views.
+#
+# Watches a container widget: the view is built the first time the
+# container is shown, paused (its refresh timer stopped) while the
+# container is hidden, and torn down if it stays hidden for teardown_delay
+# ms, to be built again on the next show.
+
+from PyQt5.QtCore import QObject, QEvent, QTimer
+
+from qtvcp import logger
+
+LOG = logger.getLogger(__name__)
+
+# How long a hidden view is kept before it is torn down, ms
+DEFAULT_TEARDOWN_DELAY = 60000
+
+
+class LazyView(QObject):
+    def __init__(self, container, build, teardown=None, teardown_delay=DEFAULT_TEARDOWN_DELAY, parent=None):
+        """
+        build(container) creates the view inside container and returns it;
+        teardown(view) is called before the view is deleted.  A
+        teardown_delay of None keeps hidden views (paused) for good.
+        """
+        super(LazyView, self).__init__(parent or container)
+        self.container = container
+        self._build = build
+        self._teardown = teardown
+        self.view = None
+        self._teardownTimer = QTimer(self)
+        self._teardownTimer.setSingleShot(True)
+        self._teardownTimer.timeout.connect(self.teardown)
+        self._teardownDelay = teardown_delay
+        container.installEventFilter(self)
+        if container.isVisible():
+            self.show()
+
+    def eventFilter(self, obj, event):
+        if obj is self.container:
+            if event.type() == QEvent.Show:
+                self.show()
+            elif event.type() == QEvent.Hide:
+                self.hide()
+        return False
+
+    def show(self):
+        self._teardownTimer.stop()
+        if self.view is None:
+            try:
+                self.view = self._build(self.container)
+            except Exception as e:
+                LOG.exception('Building view in {} failed: {}'.format(self.container.objectName(), e))
+            return
+        timer = getattr(self.view, 'timer', None)
+        if timer is not None and not timer.isActive():
+            timer.start()
+
+    def hide(self):
+        if self.view is None:
+            return
+        timer = getattr(self.view, 'timer', None)
+        if timer is not None:
+            timer.stop()
+        if self._teardownDelay is not None:
+            self._teardownTimer.start(self._teardownDelay)
+
+    def teardown(self):
+        view, self.view = self.view, None
+        if view is None:
+            return
+        if self._teardown is not None:
+            self._teardown(view)
+        layout = self.container.layout()
+        if layout is not None:
+            layout.removeWidget(view)
+        view.deleteLater()
+        LOG.debug('Tore down view in {}'.format(self.container.objectName()))
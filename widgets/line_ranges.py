@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+# G-code line -> segment range table.
+#
+# Built once per load from the line number of every segment, so the
+# segments of any line are found with two array lookups instead of a scan
+# of the program.  Segment lists in line order (the usual case) map a line
+# to a contiguous slice; lists that jump back (subroutines, loops) go
+# through a stable sort order.
+
+import numpy as np
+
+from qtvcp import logger
+
+LOG = logger.getLogger(__name__)
+
+
+class LineRanges:
+    def __init__(self, lines, line_count=None):
+        """
+        lines: G-code line of each segment.  line_count bounds the table
+        (default: largest line + 1).
+        """
+        lines = np.asarray(lines, dtype=np.int64)
+        self.size = len(lines)
+        top = int(lines.max()) + 1 if self.size else 0
+        count = max(line_count or 0, top)
+        if self.size and np.any(lines[1:] < lines[:-1]):
+            self.order = np.argsort(lines, kind='stable')
+            lines = lines[self.order]
+        else:
+            self.order = None
+        dtype = np.int32 if self.size < 2 ** 31 else np.int64
+        # Segments of line n: positions first[n] to first[n + 1] of the sorted list
+        self.first = np.searchsorted(lines, np.arange(count + 1)).astype(dtype)
+
+    def __len__(self):
+        return len(self.first) - 1
+
+    @classmethod
+    def from_canon(cls, canon, names=('traverse', 'feed', 'arcfeed'), line_count=None):
+        """
+        Returns {name: LineRanges} for the segment lists (line, ...) of a glcanon canon.
+        """
+        return {name: cls([s[0] for s in getattr(canon, name, None) or ()], line_count) for name in names}
+
+    def count(self, line):
+        if not 0 <= line < len(self.first) - 1:
+            return 0
+        return int(self.first[line + 1] - self.first[line])
+
+    def segments(self, line):
+        """
+        Segments of line: a slice for lists in line order, else an index array.
+        """
+        if not 0 <= line < len(self.first) - 1:
+            return slice(0, 0)
+        start, stop = int(self.first[line]), int(self.first[line + 1])
+        if self.order is None:
+            return slice(start, stop)
+        return self.order[start:stop]
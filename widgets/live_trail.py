@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+# Bounded live plot of the tool's path.
+#
+# Positions go into a fixed-capacity float32 buffer drawn as one line
+# strip.  A new point that continues the last segment in a straight line
+# (within MERGE_TOLERANCE, same motion kind) replaces the last point instead
+# of adding one.  When the buffer fills up, every other point of its older
+# half is dropped, so the oldest history gets coarser with every pass while
+# memory and draw cost stay fixed however long the job runs.
+
+import numpy as np
+from OpenGL import GL
+
+from qtvcp import logger
+
+LOG = logger.getLogger(__name__)
+
+DEFAULT_CAPACITY = 200000
+# Deviation (drawing units) below which a point is merged into the segment before it
+MERGE_TOLERANCE = 1e-4
+
+
+class LiveTrail:
+    def __init__(self, capacity=DEFAULT_CAPACITY, tolerance=MERGE_TOLERANCE, line_width=3.0):
+        self.capacity = max(int(capacity), 4)
+        self.tolerance = tolerance
+        self.line_width = line_width
+        self.points = np.zeros((self.capacity, 3), dtype=np.float32)
+        # RGBA of the segment ending at each point
+        self.colors = np.zeros((self.capacity, 4), dtype=np.uint8)
+        self.count = 0
+        self.merged = 0
+        self.decimations = 0
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+
+    def append(self, point, color):
+        """
+        Adds a position (x, y, z) reached along a move drawn in color (RGBA
+        bytes).  Returns False if the position is the last one already.
+        """
+        p = np.asarray(point, dtype=np.float32)
+        n = self.count
+        if n and np.array_equal(self.points[n - 1], p):
+            return False
+        if n >= 2 and np.array_equal(self.colors[n - 1], color) and self._straight(n, p):
+            self.points[n - 1] = p
+            self.merged += 1
+            return True
+        if n == self.capacity:
+            n = self._decimate()
+        self.points[n] = p
+        self.colors[n] = color
+        self.count = n + 1
+        return True
+
+    def _straight(self, n, p):
+        a = self.points[n - 2].astype(np.float64)
+        b = self.points[n - 1] - a
+        c = p - a
+        cc = float(c @ c)
+        if cc == 0.0 or float(b @ c) <= 0.0:
+            return False
+        # Distance of the last point from the chord to the new one
+        off = b - c * (float(b @ c) / cc)
+        return float(off @ off) <= self.tolerance * self.tolerance
+
+    def _decimate(self):
+        half = self.capacity // 2
+        # Keep the even points of the older half, and its last point so the
+        # strip still joins the newer half
+        keep = np.arange(0, half, 2)
+        if keep[-1] != half - 1:
+            keep = np.append(keep, half - 1)
+        n = len(keep)
+        self.points[:n] = self.points[keep]
+        self.colors[:n] = self.colors[keep]
+        rest = self.capacity - half
+        self.points[n:n + rest] = self.points[half:]
+        self.colors[n:n + rest] = self.colors[half:]
+        self.decimations += 1
+        return n + rest
+
+    def draw(self):
+        if self.count < 2:
+            return
+        GL.glPushAttrib(GL.GL_ENABLE_BIT | GL.GL_LINE_BIT | GL.GL_LIGHTING_BIT | GL.GL_CURRENT_BIT)
+        GL.glPushClientAttrib(GL.GL_CLIENT_VERTEX_ARRAY_BIT)
+        try:
+            GL.glDisable(GL.GL_LIGHTING)
+            GL.glShadeModel(GL.GL_FLAT)
+            GL.glLineWidth(self.line_width)
+            GL.glEnableClientState(GL.GL_VERTEX_ARRAY)
+            GL.glEnableClientState(GL.GL_COLOR_ARRAY)
+            GL.glVertexPointer(3, GL.GL_FLOAT, 0, self.points)
+            GL.glColorPointer(4, GL.GL_UNSIGNED_BYTE, 0, self.colors)
+            GL.glDrawArrays(GL.GL_LINE_STRIP, 0, self.count)
+        finally:
+            GL.glPopClientAttrib()
+            GL.glPopAttrib()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+
+# Static geometry batching for Vismach models.
+#
+# Boxes and Z cylinders (the shapes of Vismach's Box and CylinderZ) are
+# tessellated once, transformed by their Translate/Rotate matrices and
+# merged into one triangle array per colour, so a static part of a model is
+# a handful of glDrawArrays calls instead of a walk over its primitive
+# tree every frame.  A MeshBatch is a Vismach drawable: put it into a
+# Collection, or under a HalRotate for parts that move as one.  Batches can
+# be saved and loaded again, so a model is not rebuilt on every start.
+
+import math
+import os
+
+import numpy as np
+from OpenGL import GL
+
+from qtvcp import logger
+
+LOG = logger.getLogger(__name__)
+
+CYLINDER_SLICES = 32
+# Bump to invalidate saved batches when tessellation changes
+FORMAT_VERSION = 1
+
+
+def translation(x, y, z):
+    m = np.eye(4)
+    m[:3, 3] = (x, y, z)
+    return m
+
+
+def rotation(angle, x, y, z):
+    """
+    Rotation by angle degrees about axis (x, y, z), as glRotate.
+    """
+    axis = np.array((x, y, z), dtype=np.float64)
+    axis /= np.linalg.norm(axis)
+    c, s = math.cos(math.radians(angle)), math.sin(math.radians(angle))
+    x, y, z = axis
+    m = np.eye(4)
+    m[:3, :3] = [[c + x * x * (1 - c), x * y * (1 - c) - z * s, x * z * (1 - c) + y * s],
+                 [y * x * (1 - c) + z * s, c + y * y * (1 - c), y * z * (1 - c) - x * s],
+                 [z * x * (1 - c) - y * s, z * y * (1 - c) + x * s, c + z * z * (1 - c)]]
+    return m
+
+
+def _box(x1, y1, z1, x2, y2, z2):
+    lo = np.minimum((x1, y1, z1), (x2, y2, z2))
+    hi = np.maximum((x1, y1, z1), (x2, y2, z2))
+    corners = np.array([[(hi if i & (1 << k) else lo)[k] for k in range(3)] for i in range(8)])
+    # Two triangles per face, counter-clockwise seen from outside
+    faces = [((0, 2, 6, 4), (-1, 0, 0)), ((1, 5, 7, 3), (1, 0, 0)),
+             ((0, 4, 5, 1), (0, -1, 0)), ((2, 3, 7, 6), (0, 1, 0)),
+             ((0, 1, 3, 2), (0, 0, -1)), ((4, 6, 7, 5), (0, 0, 1))]
+    vertices, normals = [], []
+    for (a, b, c, d), normal in faces:
+        vertices.extend(corners[[a, c, b, a, d, c]])
+        normals.extend([normal] * 6)
+    return np.array(vertices, dtype=np.float64), np.array(normals, dtype=np.float64)
+
+
+def _cylinder_z(z1, r1, z2, r2, slices):
+    angle = np.linspace(0.0, 2 * math.pi, slices + 1)
+    cos, sin = np.cos(angle), np.sin(angle)
+    a = np.stack((cos[:-1], sin[:-1]), axis=1)
+    b = np.stack((cos[1:], sin[1:]), axis=1)
+    n = slices
+    slope = (r1 - r2) / (z2 - z1) if z2 != z1 else 0.0
+
+    def ring(xy, r, z):
+        return np.column_stack((xy * r, np.full(n, z)))
+
+    def side_normal(xy):
+        normal = np.column_stack((xy, np.full(n, slope)))
+        return normal / np.linalg.norm(normal, axis=1)[:, None]
+
+    a1, b1, a2, b2 = ring(a, r1, z1), ring(b, r1, z1), ring(a, r2, z2), ring(b, r2, z2)
+    na, nb = side_normal(a), side_normal(b)
+    vertices = [np.stack((a1, b1, b2, a1, b2, a2), axis=1).reshape(-1, 3)]
+    normals = [np.stack((na, nb, nb, na, nb, na), axis=1).reshape(-1, 3)]
+    for r, z, sign, ends in ((r1, z1, -1.0, (b1, a1)), (r2, z2, 1.0, (a2, b2))):
+        if r <= 0:
+            continue
+        centre = np.tile((0.0, 0.0, z), (n, 1))
+        vertices.append(np.stack((centre,) + ends, axis=1).reshape(-1, 3))
+        normals.append(np.tile((0.0, 0.0, sign), (3 * n, 1)))
+    return np.concatenate(vertices), np.concatenate(normals)
+
+
+class MeshBatch:
+    def __init__(self):
+        # colour (RGBA tuple) -> lists of vertex and normal arrays
+        self._parts = {}
+        self.vertices = {}
+        self.normals = {}
+
+    def __repr__(self):
+        return '<MeshBatch {} colours, {} triangles>'.format(
+            len(self.vertices), sum(len(v) for v in self.vertices.values()) // 3)
+
+    def _add(self, vertices, normals, color, matrix):
+        if matrix is not None:
+            vertices = vertices @ matrix[:3, :3].T + matrix[:3, 3]
+            normals = normals @ np.linalg.inv(matrix[:3, :3])
+            normals /= np.linalg.norm(normals, axis=1)[:, None]
+        parts = self._parts.setdefault(tuple(float(c) for c in color), ([], []))
+        parts[0].append(vertices)
+        parts[1].append(normals)
+        self.vertices = self.normals = None
+
+    def add_box(self, x1, y1, z1, x2, y2, z2, color, matrix=None):
+        """
+        Adds Box(x1, y1, z1, x2, y2, z2) in color, transformed by matrix (4x4).
+        """
+        self._add(*_box(x1, y1, z1, x2, y2, z2), color, matrix)
+
+    def add_cylinder_z(self, z1, r1, z2, r2, color, matrix=None, slices=CYLINDER_SLICES):
+        """
+        Adds CylinderZ(z1, r1, z2, r2) with end caps in color, transformed by matrix.
+        """
+        self._add(*_cylinder_z(z1, r1, z2, r2, slices), color, matrix)
+
+    def finish(self):
+        """
+        Merges the added shapes into one array per colour; done on first draw.
+        """
+        if self.vertices is not None:
+            return self
+        self.vertices = {c: np.ascontiguousarray(np.concatenate(v), dtype=np.float32)
+                         for c, (v, n) in self._parts.items()}
+        self.normals = {c: np.ascontiguousarray(np.concatenate(n), dtype=np.float32)
+                        for c, (v, n) in self._parts.items()}
+        return self
+
+    def save(self, filename, key=''):
+        self.finish()
+        arrays = {}
+        for i, color in enumerate(self.vertices):
+            arrays['color{}'.format(i)] = np.array(color, dtype=np.float32)
+            arrays['vertices{}'.format(i)] = self.vertices[color]
+            arrays['normals{}'.format(i)] = self.normals[color]
+        tmp = filename + '.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(f, key=np.array('{}:{}'.format(FORMAT_VERSION, key)), **arrays)
+        os.replace(tmp, filename)
+
+    @classmethod
+    def load(cls, filename, key=''):
+        """
+        Returns the batch saved in filename under key, or None.
+        """
+        try:
+            with np.load(filename) as data:
+                if str(data['key']) != '{}:{}'.format(FORMAT_VERSION, key):
+                    return None
+                batch = cls()
+                batch.vertices, batch.normals = {}, {}
+                i = 0
+                while 'color{}'.format(i) in data:
+                    color = tuple(data['color{}'.format(i)].tolist())
+                    batch.vertices[color] = data['vertices{}'.format(i)]
+                    batch.normals[color] = data['normals{}'.format(i)]
+                    i += 1
+                return batch
+        except (OSError, KeyError, ValueError) as e:
+            LOG.debug('No saved mesh batch in {}: {}'.format(filename, e))
+            return None
+
+    @classmethod
+    def cached(cls, filename, key, build):
+        """
+        Loads the batch saved under key, or fills a new one with build(batch)
+        and saves it.
+        """
+        batch = cls.load(filename, key)
+        if batch is not None:
+            return batch
+        batch = cls()
+        build(batch)
+        batch.finish()
+        try:
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            batch.save(filename, key)
+        except OSError as e:
+            LOG.warning('Could not save mesh batch to {}: {}'.format(filename, e))
+        return batch
+
+    def draw(self):
+        self.finish()
+        GL.glPushAttrib(GL.GL_LIGHTING_BIT | GL.GL_CURRENT_BIT)
+        GL.glPushClientAttrib(GL.GL_CLIENT_VERTEX_ARRAY_BIT)
+        try:
+            GL.glEnableClientState(GL.GL_VERTEX_ARRAY)
+            GL.glEnableClientState(GL.GL_NORMAL_ARRAY)
+            for color, vertices in self.vertices.items():
+                GL.glColor4f(*color)
+                GL.glMaterialfv(GL.GL_FRONT_AND_BACK, GL.GL_AMBIENT_AND_DIFFUSE, color)
+                GL.glVertexPointer(3, GL.GL_FLOAT, 0, vertices)
+                GL.glNormalPointer(GL.GL_FLOAT, 0, self.normals[color])
+                GL.glDrawArrays(GL.GL_TRIANGLES, 0, len(vertices))
+        finally:
+            GL.glPopClientAttrib()
+            GL.glPopAttrib()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+# Name -> page registry for a QStackedWidget, with deferred page building.
+#
+# Pages are looked up by objectName through a dict instead of a scan of
+# the stack.  A page can have a builder that fills it in the first time it
+# is shown, so heavy widgets are not constructed at startup; prewarm()
+# builds the remaining pages one per event loop turn once the UI is idle.
+
+import time
+
+from PyQt5.QtCore import QObject, QTimer
+
+from qtvcp import logger
+
+LOG = logger.getLogger(__name__)
+
+
+class PageRegistry(QObject):
+    def __init__(self, stack, parent=None):
+        super(PageRegistry, self).__init__(parent)
+        self.stack = stack
+        self._index = {}
+        self._builders = {}
+        self._prewarm = []
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._prewarm_next)
+        self.refresh()
+
+    def refresh(self):
+        """
+        Re-reads the pages of the stack, after pages were added or removed.
+        """
+        self._index = {self.stack.widget(i).objectName(): i for i in range(self.stack.count())}
+
+    def index(self, name):
+        index = self._index.get(name)
+        if index is None or self.stack.widget(index) is None \
+                or self.stack.widget(index).objectName() != name:
+            self.refresh()
+            index = self._index.get(name)
+        return index
+
+    def page(self, name):
+        index = self.index(name)
+        return None if index is None else self.stack.widget(index)
+
+    def add_builder(self, name, builder):
+        """
+        builder(page) fills the page named name the first time it is needed.
+        """
+        self._builders[name] = builder
+
+    def is_built(self, name):
+        return name not in self._builders
+
+    def build(self, name):
+        """
+        Runs the builder of the page named name, if it has one.  A builder
+        that fails stays registered, so the next visit tries again.
+        """
+        builder = self._builders.get(name)
+        if builder is None:
+            return
+        page = self.page(name)
+        if page is None:
+            LOG.warning('No page {} to build'.format(name))
+            return
+        start = time.perf_counter()
+        try:
+            builder(page)
+        except Exception as e:
+            LOG.exception('Building page {} failed: {}'.format(name, e))
+            return
+        del self._builders[name]
+        LOG.debug('Built page {} in {:.0f} ms'.format(name, (time.perf_counter() - start) * 1000))
+
+    def show(self, name):
+        """
+        Shows the page named name, building it first if needed.  Returns
+        False if there is no such page.
+        """
+        index = self.index(name)
+        if index is None:
+            LOG.warning('No page named {}'.format(name))
+            return False
+        self.build(name)
+        self.stack.setCurrentIndex(index)
+        return True
+
+    def prewarm(self, delay_ms=0):
+        """
+        Builds the pages not built yet in the background, one per event loop
+        turn, starting delay_ms from now.
+        """
+        self._prewarm = list(self._builders)
+        if self._prewarm:
+            self._timer.start(delay_ms)
+
+    def _prewarm_next(self):
+        while self._prewarm:
+            name = self._prewarm.pop(0)
+            if not self.is_built(name):
+                self.build(name)
+                break
+        if self._prewarm:
+            self._timer.start(0)
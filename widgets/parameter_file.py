@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+# Reader for the LinuxCNC numbered parameter file (e.g. sim.var).
+#
+# The file is parsed once into a table indexed by parameter number and only
+# read again when its modification time changes.  It is never written here:
+# the file belongs to LinuxCNC, so offsets are changed through the
+# interpreter (G10 L2) and LinuxCNC writes the file itself.
+
+import os
+
+from qtvcp import logger
+
+LOG = logger.getLogger(__name__)
+
+AXES = 'XYZABCUVW'
+
+# Parameter holding the active coordinate system (1 = G54 ... 9 = G59.3)
+ACTIVE_SYSTEM = 5220
+# First parameter of the G54 offsets; each further system is 20 higher
+G54_BASE = 5221
+SYSTEM_STRIDE = 20
+
+WORK_OFFSET_NAMES = ('G54', 'G55', 'G56', 'G57', 'G58', 'G59', 'G59.1', 'G59.2', 'G59.3')
+
+
+def work_offset_param(system, axis):
+    """
+    Returns the parameter number of an axis (letter) of a coordinate system (1-9).
+    """
+    return G54_BASE + (system - 1) * SYSTEM_STRIDE + AXES.index(axis)
+
+
+class ParameterFile:
+    def __init__(self, path):
+        self.path = path
+        self.params = {}
+        self.reads = 0
+        self._mtime = None
+
+    def refresh(self):
+        """
+        Re-reads the file if it changed since the last read.
+        Returns True if the table was reloaded.
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except (OSError, TypeError):
+            if self._mtime is not None:
+                self.params = {}
+                self._mtime = None
+            return False
+        if mtime == self._mtime:
+            return False
+        params = {}
+        with open(self.path, 'r') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 2:
+                    continue
+                try:
+                    params[int(fields[0])] = float(fields[1])
+                except ValueError:
+                    continue
+        self.params = params
+        self._mtime = mtime
+        self.reads += 1
+        LOG.debug('Read {} parameters from {}'.format(len(params), self.path))
+        return True
+
+    def get(self, number, default=0.0):
+        self.refresh()
+        return self.params.get(number, default)
+
+    def active_system(self):
+        """
+        Returns the active coordinate system, 1 (G54) to 9 (G59.3).
+        """
+        system = int(self.get(ACTIVE_SYSTEM, 1.0))
+        return system if 1 <= system <= 9 else 1
+
+    def work_offset(self, system):
+        """
+        Returns the offsets of a coordinate system as a tuple over AXES.
+        """
+        self.refresh()
+        base = G54_BASE + (system - 1) * SYSTEM_STRIDE
+        return tuple(self.params.get(base + i, 0.0) for i in range(len(AXES)))
+
+
+def zero_point(summary, parameters):
+    """
+    Resolves the program zero (x, y, z) in machine units: the first work
+    offset the program selects (or the active one if it selects none),
+    taken from the parameter file and overridden by G10 L2 words in the
+    program that set that system.
+    """
+    system = parameters.active_system()
+    if summary is not None and summary.work_offsets:
+        system = WORK_OFFSET_NAMES.index(summary.work_offsets[0]) + 1
+    offset = list(parameters.work_offset(system)[:3])
+    settings = summary.offset_settings if summary is not None else []
+    for lineno, l_word, p_word, values in settings:
+        if p_word not in (0, system):
+            continue
+        if l_word == 2:
+            for axis, value in values.items():
+                if axis in 'XYZ':
+                    offset['XYZ'.index(axis)] = value
+        elif l_word == 20:
+            LOG.warning('G10 L20 on line {} depends on the machine position; '
+                        'using the stored offset'.format(lineno))
+    return tuple(offset)
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+# Level-of-detail pyramid for backplot segment lists.
+#
+# The segment lists of a glcanon canon (feed, arcfeed, traverse) are tuples
+# (line, start, end, ...).  Consecutive segments that join up form
+# polylines, and each pyramid level simplifies them with a bounded error.
+# A pass drops every other vertex whose removal keeps the error of the
+# merged span below the level's tolerance.  The error of a merged span is
+# bounded by the larger error of its two halves plus the dropped vertex's
+# distance from the new chord, so the bound holds for every original point.
+# Chain ends are never dropped.
+#
+# Tolerances are in the units of the segments; a glcanon canon is always in
+# inches, whatever the machine units are.
+
+import numpy as np
+
+from qtvcp import logger
+
+LOG = logger.getLogger(__name__)
+
+# Tolerance of the first simplified level, canon units (0.002 in, about
+# 0.05 mm); each further level is LEVEL_STEP times coarser
+BASE_TOLERANCE = 0.002
+LEVEL_STEP = 4.0
+MAX_LEVELS = 10
+# Stop adding levels once a level keeps more than this share of the vertices
+# of the level below
+MIN_REDUCTION = 0.9
+# Bound on simplification passes per level
+MAX_PASSES = 200
+
+
+def _segment_distance(p, a, b):
+    """
+    Distance of points p from segments a-b (all (N, 3)).
+    """
+    ab = b - a
+    denom = np.einsum('ij,ij->i', ab, ab)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.where(denom > 0, np.einsum('ij,ij->i', p - a, ab) / denom, 0.0)
+    t = np.clip(t, 0.0, 1.0)
+    d = p - (a + ab * t[:, None])
+    return np.sqrt(np.einsum('ij,ij->i', d, d))
+
+
+def simplify(vertices, fixed, keep, error, tolerance):
+    """
+    Simplifies the polyline through vertices[keep] (span errors in error)
+    to tolerance.  Returns the new (keep, error).
+    """
+    idle = 0
+    for parity in range(MAX_PASSES):
+        if len(keep) < 3 or idle == 2:
+            break
+        # Odd and even positions take turns, so neighbours are never both dropped
+        pos = np.arange(1 + parity % 2, len(keep) - 1, 2)
+        k = keep[pos]
+        dev = _segment_distance(vertices[k], vertices[keep[pos - 1]], vertices[keep[pos + 1]])
+        merged = np.maximum(error[pos - 1], error[pos]) + dev
+        drop = (merged <= tolerance) & ~fixed[k]
+        if not drop.any():
+            idle += 1
+            continue
+        idle = 0
+        error = error.copy()
+        error[pos[drop] - 1] = merged[drop]
+        mask = np.ones(len(keep), dtype=bool)
+        mask[pos[drop]] = False
+        keep = keep[mask]
+        error = error[mask[:-1]]
+    return keep, error
+
+
+class PolylineLod:
+    """
+    Simplification levels of one canon segment list.  Level 0 is the list
+    itself; level k > 0 stays within tolerance(k) of it.
+    """
+
+    def __init__(self, segments, base_tolerance=BASE_TOLERANCE, step=LEVEL_STEP, max_levels=MAX_LEVELS):
+        self.segments = segments
+        self.base_tolerance = base_tolerance
+        self.step = step
+        self._levels = [None]
+        self._lists = {0: segments}
+        n = len(segments)
+        if n < 2:
+            return
+        starts = np.array([s[1][:3] for s in segments], dtype=np.float64)
+        ends = np.array([s[2][:3] for s in segments], dtype=np.float64)
+        # A vertex for every segment end, plus one for the start of each chain
+        chain_start = np.ones(n, dtype=bool)
+        chain_start[1:] = np.any(starts[1:] != ends[:-1], axis=1)
+        end_pos = np.arange(n) + np.cumsum(chain_start)
+        vertices = np.empty((end_pos[-1] + 1, 3))
+        vertices[end_pos] = ends
+        vertices[end_pos[chain_start] - 1] = starts[chain_start]
+        # Vertex -> segment whose end it is (-1: start of a chain)
+        owner = np.full(len(vertices), -1, dtype=np.int64)
+        owner[end_pos] = np.arange(n)
+        self._vertex_chain_start = np.zeros(len(vertices), dtype=np.int64)
+        self._vertex_chain_start[end_pos[chain_start] - 1] = np.flatnonzero(chain_start)
+        fixed = owner < 0
+        fixed[end_pos[chain_start][1:] - 2] = True
+        fixed[-1] = True
+        self._owner = owner
+        keep = np.arange(len(vertices))
+        error = np.zeros(len(vertices) - 1)
+        for level in range(1, max_levels + 1):
+            tolerance = self.tolerance(level)
+            new_keep, error = simplify(vertices, fixed, keep, error, tolerance)
+            if len(new_keep) > MIN_REDUCTION * len(keep):
+                break
+            keep = new_keep
+            self._levels.append(keep)
+        LOG.debug('Backplot LOD: {} segments, levels {}'.format(
+            n, [n] + [len(k) - int(chain_start.sum()) for k in self._levels[1:]]))
+
+    def __len__(self):
+        return len(self._levels)
+
+    def tolerance(self, level):
+        return 0.0 if level == 0 else self.base_tolerance * self.step ** (level - 1)
+
+    def level_for(self, max_error):
+        """
+        Returns the coarsest level whose error stays below max_error
+        (in the units of the segments).
+        """
+        level = 0
+        for k in range(1, len(self._levels)):
+            if self.tolerance(k) <= max_error:
+                level = k
+        return level
+
+    def segments_at(self, level):
+        """
+        Returns the segment list of a level, in the canon's tuple format.
+        """
+        level = min(level, len(self._levels) - 1)
+        if level not in self._lists:
+            keep = self._levels[level]
+            segments = self.segments
+            owner = self._owner
+            result = []
+            for a, b in zip(keep[:-1].tolist(), keep[1:].tolist()):
+                seg = owner[b]
+                if seg < 0:
+                    # b starts a new chain; no segment across the gap
+                    continue
+                src = owner[a]
+                start = segments[src][2] if src >= 0 else segments[self._vertex_chain_start[a]][1]
+                entry = segments[seg]
+                result.append((entry[0], start) + tuple(entry[2:]))
+            self._lists[level] = result
+        return self._lists[level]
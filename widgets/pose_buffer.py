@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+# Timestamped machine pose samples for smooth rendering.
+#
+# Poses (X, Z, spindle rpm) come in at the status poll rate or slower; views
+# render at display rate.  PoseBuffer keeps the last few samples with their
+# time and answers "where is the tool now" by interpolating between them,
+# rendered one sample interval behind so there is usually a sample on both
+# sides, and extrapolating briefly past the last one when samples are late.
+# The spindle angle is integrated from rpm and time, not read per poll, so
+# it turns smoothly whatever the poll rate.
+
+import bisect
+import time
+from collections import deque
+
+from qtvcp import logger
+
+LOG = logger.getLogger(__name__)
+
+DEFAULT_SIZE = 16
+# Longest time (s) a pose is extrapolated past the last sample
+MAX_EXTRAPOLATION = 0.25
+# Bounds of the render delay (s), which follows the sample interval
+MIN_DELAY = 0.0
+MAX_DELAY = 0.5
+
+
+class PoseBuffer:
+    def __init__(self, size=DEFAULT_SIZE, max_extrapolation=MAX_EXTRAPOLATION, clock=time.monotonic):
+        self.max_extrapolation = max_extrapolation
+        self.clock = clock
+        self._times = deque(maxlen=size)
+        self._poses = deque(maxlen=size)
+        self.delay = 0.0
+        self._rpm = 0.0
+        self._rpm_time = None
+        self._angle = 0.0
+
+    def __len__(self):
+        return len(self._times)
+
+    def clear(self):
+        self._times.clear()
+        self._poses.clear()
+        self._rpm = 0.0
+        self._rpm_time = None
+
+    def push(self, x, z, rpm=None, t=None):
+        """
+        Records the pose at time t (default now).  rpm None keeps the spindle speed.
+        """
+        t = self.clock() if t is None else t
+        if self._times and t <= self._times[-1]:
+            # Same or older timestamp: the newer pose wins
+            self._poses[-1] = (x, z)
+        else:
+            if self._times:
+                # Render delay follows the sample interval
+                interval = t - self._times[-1]
+                self.delay += 0.2 * (min(max(interval, MIN_DELAY), MAX_DELAY) - self.delay)
+            self._times.append(t)
+            self._poses.append((x, z))
+        if rpm is not None:
+            self.set_rpm(rpm, t)
+
+    def set_rpm(self, rpm, t=None):
+        t = self.clock() if t is None else t
+        self._angle = self.angle(t)
+        self._rpm = rpm
+        self._rpm_time = t
+
+    def position(self, t=None):
+        """
+        Interpolated (x, z) at time t (default now), or None without samples.
+        """
+        if not self._times:
+            return None
+        t = (self.clock() if t is None else t) - self.delay
+        times = self._times
+        if t <= times[0] or len(times) == 1:
+            return self._poses[0] if t <= times[0] else self._poses[-1]
+        i = bisect.bisect_right(times, t)
+        if i == len(times):
+            # Past the last sample: continue its motion for a short while
+            i -= 1
+            t = min(t, times[i] + self.max_extrapolation)
+        t0, t1 = times[i - 1], times[i]
+        (x0, z0), (x1, z1) = self._poses[i - 1], self._poses[i]
+        f = (t - t0) / (t1 - t0)
+        return x0 + (x1 - x0) * f, z0 + (z1 - z0) * f
+
+    def angle(self, t=None):
+        """
+        Spindle angle in degrees at time t (default now).
+        """
+        if self._rpm_time is None:
+            return self._angle
+        t = self.clock() if t is None else t
+        return (self._angle + 6.0 * self._rpm * (t - self._rpm_time)) % 360.0
+
+    def moving(self, t=None):
+        """
+        True while the rendered pose still changes.
+        """
+        if self._rpm:
+            return True
+        if not self._times:
+            return False
+        t = self.clock() if t is None else t
+        return t - self._times[-1] < self.delay + self.max_extrapolation
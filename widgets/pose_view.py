@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+# Vismach nodes driven by a PoseBuffer.
+#
+# PoseRotate turns its parts by the buffer's spindle angle and
+# PoseTranslate moves them to the buffer's interpolated tool position, both
+# evaluated when the frame is drawn.  PoseAnimator repaints the view at
+# display rate while the pose changes and stops when it settles.  Import
+# this module only where Vismach is wanted; it loads qt_vismach.
+
+from PyQt5.QtCore import QObject, QTimer
+from OpenGL import GL
+
+from qtvcp import logger
+from qtvcp.lib.qt_vismach.qt_vismach import Collection
+
+LOG = logger.getLogger(__name__)
+
+DEFAULT_FPS = 60
+
+
+class PoseRotate(Collection):
+    def __init__(self, parts, pose, x, y, z):
+        super(PoseRotate, self).__init__(parts)
+        self.pose = pose
+        self.axis = (x, y, z)
+
+    def apply(self):
+        GL.glPushMatrix()
+        GL.glRotatef(self.pose.angle(), *self.axis)
+
+    def unapply(self):
+        GL.glPopMatrix()
+
+
+class PoseTranslate(Collection):
+    def __init__(self, parts, pose, place):
+        """
+        place(x, z) maps the pose's tool position to model coordinates.
+        """
+        super(PoseTranslate, self).__init__(parts)
+        self.pose = pose
+        self.place = place
+
+    def apply(self):
+        GL.glPushMatrix()
+        position = self.pose.position()
+        if position is not None:
+            GL.glTranslatef(*self.place(*position))
+
+    def unapply(self):
+        GL.glPopMatrix()
+
+
+class PoseAnimator(QObject):
+    def __init__(self, widget, pose, fps=DEFAULT_FPS, parent=None):
+        super(PoseAnimator, self).__init__(parent or widget)
+        self.widget = widget
+        self.pose = pose
+        self._timer = QTimer(self)
+        self._timer.setInterval(int(1000 / fps))
+        self._timer.timeout.connect(self._frame)
+
+    def poke(self):
+        """
+        A new pose arrived; animate until it settles.
+        """
+        if not self._timer.isActive() and self.widget.isVisible():
+            self._timer.start()
+
+    def stop(self):
+        self._timer.stop()
+
+    def _frame(self):
+        if not self.widget.isVisible():
+            self._timer.stop()
+            return
+        self.widget.update()
+        if not self.pose.moving():
+            self._timer.stop()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+# Remaining time of a running program.
+#
+# LineTimeIndex turns the per-line estimate of a CycleTime into cumulative
+# times, so the estimated time at any program line is one array lookup.
+# EtaTracker follows the running program's current line and corrects the
+# estimate by how long the program actually took so far (overrides, pauses
+# in feed hold, estimate error).
+
+import time
+
+import numpy as np
+
+from qtvcp import logger
+
+LOG = logger.getLogger(__name__)
+
+
+class LineTimeIndex:
+    def __init__(self, per_line):
+        # start[n]: estimated time spent before line n starts
+        self.start = np.concatenate(([0.0], np.cumsum(per_line, dtype=np.float64)))
+        self.total = float(self.start[-1])
+
+    def __len__(self):
+        return len(self.start) - 1
+
+    def elapsed(self, line):
+        """
+        Estimated seconds from program start to the start of line.
+        """
+        if line <= 0:
+            return 0.0
+        if line >= len(self.start):
+            return self.total
+        return float(self.start[line])
+
+    def line_time(self, line):
+        if 0 <= line < len(self.start) - 1:
+            return float(self.start[line + 1] - self.start[line])
+        return 0.0
+
+    def remaining(self, line):
+        return self.total - self.elapsed(line)
+
+
+class EtaTracker:
+    """
+    Remaining time of the running program from its current line.
+
+    The ratio of actual to estimated elapsed time is smoothed and applied to
+    the rest of the program once min_elapsed seconds of estimate have passed.
+    """
+
+    def __init__(self, smoothing=0.2, min_elapsed=5.0, clock=time.monotonic):
+        self.smoothing = smoothing
+        self.min_elapsed = min_elapsed
+        self.clock = clock
+        self.index = None
+        self.factor = 1.0
+        self.line = 0
+        self._started = None
+        self._line_started = None
+        self._paused_at = None
+        self._paused = 0.0
+
+    @property
+    def running(self):
+        return self._started is not None
+
+    def start(self, index):
+        self.index = index
+        self.factor = 1.0
+        self.line = 0
+        self._started = self._line_started = self.clock()
+        self._paused_at = None
+        self._paused = 0.0
+
+    def stop(self):
+        self._started = None
+
+    def pause(self, paused):
+        """
+        Feed hold started (paused True) or ended; ignored unless running.
+        """
+        if self._started is None:
+            return
+        now = self.clock()
+        if paused and self._paused_at is None:
+            self._paused_at = now
+        elif not paused and self._paused_at is not None:
+            self._paused += now - self._paused_at
+            self._line_started += now - self._paused_at
+            self._paused_at = None
+
+    def actual(self, now=None):
+        """
+        Seconds the program has been running, without pauses.
+        """
+        if self._started is None:
+            return 0.0
+        now = self.clock() if now is None else now
+        if self._paused_at is not None:
+            now = self._paused_at
+        return now - self._started - self._paused
+
+    def update(self, line):
+        """
+        The program reached line; refreshes the correction factor.
+        """
+        if self.index is None or self._started is None:
+            return
+        now = self.clock()
+        self.line = line
+        self._line_started = now
+        estimated = self.index.elapsed(line)
+        if estimated >= self.min_elapsed:
+            measured = self.actual(now) / estimated
+            self.factor += self.smoothing * (measured - self.factor)
+            self.factor = min(max(self.factor, 0.2), 5.0)
+
+    def remaining(self, now=None):
+        """
+        Corrected remaining seconds, or None without an estimate.
+        """
+        if self.index is None or self._started is None:
+            return None
+        now = self.clock() if now is None else now
+        if self._paused_at is not None:
+            now = self._paused_at
+        # Time already spent in the current line counts against it
+        in_line = min(now - self._line_started, self.index.line_time(self.line) * self.factor)
+        return max(self.index.remaining(self.line) * self.factor - in_line, 0.0)
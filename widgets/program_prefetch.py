@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+# Speculative background analysis of the program the operator is looking at.
+#
+# As soon as a file is highlighted in the file manager its analysis starts in
+# low priority worker processes, so the CAM wizard usually finds the result
+# ready when it gets to the tool list.  A new highlight cancels the previous
+# prefetch.  The worker pool bounds how many prefetches run at once: a
+# cancelled worker keeps its process until it notices, and newer requests
+# queue behind it.  Each prefetch first looks the program up in the analysis
+# cache on a worker thread (hashing it if it was touched or copied) and only
+# parses it on a miss.
+#
+# Results are kept by path together with the size and modification time the
+# file had when its prefetch started; a file saved over since then is
+# analyzed again rather than answered with the old summary.
+
+import os
+from collections import OrderedDict
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from qtvcp import logger
+from qtvcp.widgets.analysis_worker import AnalysisRunner, THREAD
+from qtvcp.widgets.gcode_analyzer import analyze_program, cached_analysis, store_analysis
+
+LOG = logger.getLogger(__name__)
+
+PREFETCH_CHANNEL = 1
+
+
+def file_stamp(path):
+    """
+    Returns (size, mtime) identifying the current contents of path, or None.
+    """
+    try:
+        st = os.stat(path)
+    except (OSError, TypeError):
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+
+class ProgramPrefetcher(QObject):
+    # path, ProgramSummary
+    ready = pyqtSignal(str, object)
+    # path, fraction read
+    progress = pyqtSignal(str, float)
+    # path, error message
+    failed = pyqtSignal(str, str)
+
+    def __init__(self, cache, parent=None, max_jobs=2, nice=10, keep=2):
+        super(ProgramPrefetcher, self).__init__(parent)
+        self.cache = cache
+        self.max_jobs = max_jobs
+        self.keep = keep
+        self.runner = AnalysisRunner(self, processes=max_jobs, threads=1, nice=nice)
+        self.runner.finished.connect(self._on_finished)
+        self.runner.progress.connect(self._on_progress)
+        self.runner.failed.connect(self._on_failed)
+        # job id -> (path, stamp at submission) of submitted, not cancelled jobs
+        self._jobs = {}
+        # ids of the jobs among them that look up the cache
+        self._lookups = set()
+        # path -> (stamp, summary), oldest first
+        self._results = OrderedDict()
+        self.started = 0
+        self.hits = 0
+
+    def result(self, path):
+        """
+        Returns the prefetched summary of path, or None.  A result for
+        contents the file no longer has is dropped.
+        """
+        entry = self._results.get(path)
+        if entry is None:
+            return None
+        stamp, summary = entry
+        if stamp != file_stamp(path):
+            del self._results[path]
+            return None
+        self._results.move_to_end(path)
+        return summary
+
+    def pending(self, path):
+        """
+        Returns True while path is being (or waiting to be) prefetched
+        and has not changed since.
+        """
+        stamp = file_stamp(path)
+        return (path, stamp) in self._jobs.values()
+
+    def prefetch(self, path):
+        """
+        Starts analyzing path unless its result is already known.
+        Prefetches of other files are cancelled.
+        """
+        if self.result(path) is not None or self.pending(path):
+            return
+        self.cancel()
+        self._lookup(path)
+
+    def _lookup(self, path):
+        job = self.runner.submit(cached_analysis, self.cache, path, kind=THREAD, channel=PREFETCH_CHANNEL)
+        self._jobs[job] = (path, file_stamp(path))
+        self._lookups.add(job)
+
+    def cancel(self):
+        """
+        Cancels all prefetches; running workers stop within a few thousand lines.
+        """
+        if self._jobs:
+            self.runner.cancel(PREFETCH_CHANNEL)
+            self._jobs.clear()
+            self._lookups.clear()
+
+    def _on_progress(self, job, fraction):
+        path, stamp = self._jobs.get(job, (None, None))
+        if path is not None:
+            self.progress.emit(path, fraction)
+
+    def _on_finished(self, job, summary):
+        path, stamp = self._jobs.pop(job, (None, None))
+        if path is None:
+            return
+        if stamp != file_stamp(path):
+            # Saved over while it was analyzed: start again on the new contents
+            self._lookups.discard(job)
+            self._lookup(path)
+            return
+        if job in self._lookups:
+            self._lookups.discard(job)
+            if summary is None:
+                job = self.runner.submit(analyze_program, path, channel=PREFETCH_CHANNEL)
+                self._jobs[job] = (path, stamp)
+                self.started += 1
+                LOG.debug('Prefetching analysis of {}'.format(path))
+                return
+            self.hits += 1
+        else:
+            self.runner.background(store_analysis, self.cache, summary)
+        self._results[path] = (stamp, summary)
+        while len(self._results) > self.keep:
+            self._results.popitem(last=False)
+        self.ready.emit(path, summary)
+
+    def _on_failed(self, job, message):
+        path, stamp = self._jobs.pop(job, (None, None))
+        self._lookups.discard(job)
+        if path is not None:
+            self.failed.emit(path, message)
+
+    def shutdown(self):
+        self.cancel()
+        self.runner.shutdown()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+
+# Shared, reference-counted store of loaded program geometry.
+#
+# Every backplot that shows a program acquires it here.  The first view to
+# ask for a program starts its (cached or progressive) load; views asking
+# for the same file meanwhile or later get the same ProgramEntry, so a
+# program is parsed and held in memory once however many views show it.
+# The entry is dropped, and a load still running cancelled, when the last
+# view releases it.  A program the analyzer cannot preview exactly ends up
+# with entry.unsupported set instead of a summary; the first view then
+# runs the interpreter and leaves its output in entry.canon for the others.
+# Views that always interpret acquire entries without a load and share
+# entry.canon the same way.  What views derive from the geometry (detail
+# levels, picking index) is kept in the entry too.
+
+import os
+import threading
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from qtvcp import logger
+from qtvcp.widgets.gcode_analyzer import load_analysis
+from qtvcp.widgets.progressive_loader import ProgressiveLoader
+from qtvcp.widgets.toolpath import Toolpath
+
+LOG = logger.getLogger(__name__)
+
+
+class ProgramEntry(QObject):
+    # Same signals as ProgressiveLoader; finished is also emitted for a
+    # program served from the cache
+    chunk = pyqtSignal(object)
+    progress = pyqtSignal(float)
+    finished = pyqtSignal(object, object)
+    failed = pyqtSignal(str)
+    inexact = pyqtSignal(int, str)
+
+    def __init__(self, path, key, parent=None):
+        super(ProgramEntry, self).__init__(parent)
+        self.path = path
+        self.key = key
+        self.refs = 0
+        self.summary = None
+        self.run_time = None
+        self.error = None
+        # (line number, word) stopping an exact preview, see ProgressiveLoader
+        self.unsupported = None
+        # CanonSnapshot of the interpreter's output, left by the first view
+        # that interpreted the program
+        self.canon = None
+        self.fraction = 0.0
+        self._parts = []
+        self._loader = None
+        self._requested = False
+        self._derived = {}
+
+    def __repr__(self):
+        return '<ProgramEntry {} refs={} {}>'.format(
+            self.path, self.refs, 'loading' if self.loading else 'loaded')
+
+    @property
+    def loading(self):
+        return self._loader is not None
+
+    def toolpath(self):
+        """
+        The toolpath loaded so far (all of it once finished), or None.
+        """
+        if self.summary is not None:
+            return self.summary.toolpath
+        if not self._parts:
+            return None
+        if len(self._parts) > 1:
+            self._parts = [Toolpath.concatenate(self._parts)]
+        return self._parts[0]
+
+    def derived(self, name, build):
+        """
+        Returns build() for the program, built once for all views holding it.
+        """
+        if name not in self._derived:
+            self._derived[name] = build()
+        return self._derived[name]
+
+    def _start(self, loader):
+        self._loader = loader
+        loader.chunk.connect(self._on_chunk)
+        loader.progress.connect(self._on_progress)
+        loader.finished.connect(self._on_finished)
+        loader.failed.connect(self._on_failed)
+        loader.inexact.connect(self._on_inexact)
+        loader.start()
+
+    def _cancel(self):
+        if self._loader is not None:
+            self._loader.cancel()
+            self._loader = None
+
+    def _on_chunk(self, part):
+        if self.sender() is not self._loader:
+            return
+        self._parts.append(part)
+        self.chunk.emit(part)
+
+    def _on_progress(self, fraction):
+        if self.sender() is self._loader:
+            self.fraction = fraction
+            self.progress.emit(fraction)
+
+    def _on_finished(self, summary, run_time):
+        if self.sender() is not self._loader:
+            return
+        self._loader = None
+        self._parts = []
+        self.fraction = 1.0
+        self.summary = summary
+        self.run_time = run_time
+        self.finished.emit(summary, run_time)
+
+    def _on_failed(self, message):
+        if self.sender() is not self._loader:
+            return
+        self._loader = None
+        self.error = message
+        self.failed.emit(message)
+
+    def _on_inexact(self, lineno, word):
+        if self.sender() is not self._loader:
+            return
+        self._loader = None
+        self._parts = []
+        self.unsupported = (lineno, word)
+        self.inexact.emit(lineno, word)
+
+
+class ProgramStore(QObject):
+    def __init__(self, parent=None):
+        super(ProgramStore, self).__init__(parent)
+        self._entries = {}
+
+    def acquire(self, path, limits=None, cache=None, info_blob=None, load=True, config=None):
+        """
+        Returns the ProgramEntry of path, loading it if no view did yet.
+        limits, cache and info_blob are as for ProgressiveLoader; entries are
+        shared between views using the same info_blob and config (a digest
+        of the configuration the views interpret the program with).  With
+        load=False the entry only shares what the views interpret
+        themselves.  Pair with release().
+        """
+        try:
+            st = os.stat(path)
+            stamp = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            stamp = None
+        key = (os.path.realpath(path), stamp, info_blob, config)
+        entry = self._entries.get(key)
+        if entry is None or entry.error is not None:
+            entry = self._entries[key] = ProgramEntry(path, key, self)
+        if load and not entry._requested:
+            self._load(entry, limits, cache, info_blob)
+        entry.refs += 1
+        LOG.debug('Acquired {}'.format(entry))
+        return entry
+
+    def release(self, entry):
+        if entry is None:
+            return
+        entry.refs -= 1
+        if entry.refs > 0:
+            return
+        entry._cancel()
+        if self._entries.get(entry.key) is entry:
+            del self._entries[entry.key]
+        LOG.debug('Released {}'.format(entry))
+
+    def _load(self, entry, limits, cache, info_blob):
+        entry._requested = True
+        if entry.canon is not None:
+            # Interpreted by a view already
+            return
+        if cache is not None and info_blob:
+            # Identity lookup only; the loader thread does the content hash lookup
+            summary = load_analysis(cache, entry.path, rehash=False)
+            if summary is not None and summary.unsupported is not None:
+                LOG.debug('Program {} cannot be previewed exactly'.format(entry.path))
+                entry.unsupported = summary.unsupported
+                return
+            info = cache.get_json(entry.path, info_blob, rehash=False) if summary is not None else None
+            if info is not None:
+                # Unchanged program and configuration: nothing to parse or estimate
+                LOG.debug('Program {} loaded from the cache'.format(entry.path))
+                entry.summary = summary
+                entry.run_time = info.get('run_time')
+                entry.fraction = 1.0
+                return
+        entry._start(ProgressiveLoader(entry.path, limits, cache, info_blob, entry))
+
+    def entries(self):
+        return list(self._entries.values())
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def program_store():
+    """
+    Returns the process-wide ProgramStore.  Use it from the GUI thread.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ProgramStore()
+        return _store
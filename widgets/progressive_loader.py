@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+# Background, chunked parsing of a program for preview.
+#
+# The file is analyzed on a worker thread and its toolpath is handed to the
+# GUI thread in pieces while parsing goes on, so a preview can show the
+# beginning of a large program right away.  With an AnalysisCache a program
+# analyzed before is memory-mapped from the cache instead of parsed.  A
+# program using constructs the analyzer does not execute (O-words,
+# parameters, canned cycles...) stops the load with the inexact signal
+# before any of its toolpath is shown, so the view can use the interpreter
+# instead.  All signals are queued to the thread the loader lives in.
+
+import threading
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from qtvcp import logger
+from qtvcp.widgets.gcode_analyzer import (analyze_file, AnalysisCancelled, InexactProgram, load_analysis,
+                                          store_analysis)
+from qtvcp.widgets.cycle_time import estimate_cycle_time
+
+LOG = logger.getLogger(__name__)
+
+
+class ProgressiveLoader(QObject):
+    # Toolpath piece, continuing the previous one
+    chunk = pyqtSignal(object)
+    # fraction of the file read
+    progress = pyqtSignal(float)
+    # ProgramSummary (with the whole toolpath), estimated run time in seconds or None
+    finished = pyqtSignal(object, object)
+    # error message
+    failed = pyqtSignal(str)
+    # line number and word of the first construct the preview cannot follow
+    inexact = pyqtSignal(int, str)
+
+    def __init__(self, path, limits=None, cache=None, info_blob=None, parent=None):
+        """
+        limits (MachineLimits) adds a run time estimate to the result.
+        cache (AnalysisCache) supplies and stores the analysis; the run
+        time is stored there as JSON blob info_blob.
+        """
+        super(ProgressiveLoader, self).__init__(parent)
+        self.path = path
+        self.limits = limits
+        self.cache = cache
+        self.info_blob = info_blob
+        self._cancelled = False
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='preview-loader', daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        self._cancelled = True
+
+    def cancelled(self):
+        return self._cancelled
+
+    def _run(self):
+        try:
+            summary = load_analysis(self.cache, self.path) if self.cache is not None else None
+            if summary is None:
+                summary = analyze_file(self.path, progress=self.progress.emit,
+                                       cancelled=self.cancelled, chunk=self.chunk.emit, exact=True)
+                if self.cache is not None:
+                    store_analysis(self.cache, summary)
+            elif summary.unsupported is not None:
+                raise InexactProgram(self.path, *summary.unsupported)
+            else:
+                self.chunk.emit(summary.toolpath)
+            run_time = None
+            if self.limits is not None and not self._cancelled:
+                run_time = estimate_cycle_time(summary.toolpath, self.limits,
+                                               summary.line_count + 1, summary.css_max_rpm).total
+                if self.cache is not None and self.info_blob:
+                    self.cache.put_json(self.path, self.info_blob, {'run_time': run_time})
+        except AnalysisCancelled:
+            LOG.debug('Preview load of {} cancelled'.format(self.path))
+            return
+        except InexactProgram as e:
+            LOG.debug('Preview load of {} stopped at line {}: {}'.format(self.path, e.lineno, e.word))
+            if not self._cancelled:
+                self.inexact.emit(e.lineno, e.word)
+            return
+        except (OSError, ValueError) as e:
+            if not self._cancelled:
+                LOG.error('Preview load of {} failed: {}'.format(self.path, e))
+                self.failed.emit(str(e))
+            return
+        if not self._cancelled:
+            self.finished.emit(summary, run_time)
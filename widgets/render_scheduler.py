@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+# Frame-coalescing repaint scheduler.
+#
+# Input handlers record what changed and call request(); the scheduler
+# calls its flush callback at most once per frame (at the FPS cap), which
+# applies everything that piled up since the last frame and repaints once.
+# Counters tell how many requests were coalesced into a frame, how many
+# were dropped because they netted out to nothing, and how long frames took.
+
+import time
+
+from PyQt5.QtCore import QObject, QTimer
+
+from qtvcp import logger
+
+LOG = logger.getLogger(__name__)
+
+DEFAULT_FPS = 30
+
+
+class RenderScheduler(QObject):
+    def __init__(self, flush, fps=DEFAULT_FPS, parent=None):
+        """
+        flush() applies the pending changes and returns True if a repaint
+        was issued, False if there was nothing to draw.
+        """
+        super(RenderScheduler, self).__init__(parent)
+        self._flush = flush
+        self._interval = 1.0 / fps
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._on_frame)
+        self._last_frame = 0.0
+        self._waiting = 0
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.requests = 0
+        self.frames = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.frame_time = 0.0
+        self.max_frame_time = 0.0
+
+    @property
+    def fps(self):
+        return 1.0 / self._interval
+
+    @fps.setter
+    def fps(self, value):
+        self._interval = 1.0 / max(value, 1)
+
+    def request(self):
+        """
+        Asks for a repaint; requests within the same frame are merged.
+        """
+        self.requests += 1
+        self._waiting += 1
+        if self._timer.isActive():
+            self.coalesced += 1
+            return
+        wait = self._last_frame + self._interval - time.perf_counter()
+        self._timer.start(max(int(wait * 1000), 0))
+
+    def _on_frame(self):
+        self._last_frame = time.perf_counter()
+        waiting, self._waiting = self._waiting, 0
+        if not self._flush():
+            self.dropped += waiting
+            return
+        self.frames += 1
+
+    def frame_done(self, elapsed):
+        """
+        Records the duration (seconds) of a repaint.
+        """
+        # Exponential moving average over roughly the last ten frames
+        self.frame_time += 0.1 * (elapsed - self.frame_time)
+        self.max_frame_time = max(self.max_frame_time, elapsed)
+
+    def stats(self):
+        return {'requests': self.requests, 'frames': self.frames, 'coalesced': self.coalesced,
+                'dropped': self.dropped, 'frame_time': self.frame_time,
+                'max_frame_time': self.max_frame_time}
+
+    def stop(self):
+        self._timer.stop()
+        self._waiting = 0
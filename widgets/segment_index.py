@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+
+# Spatial index of backplot segments for picking.
+#
+# Segments are sorted along a Morton curve of their midpoints and grouped
+# into leaves of LEAF_SIZE; bounding boxes of the leaves are merged pairwise
+# into an implicit bounding volume hierarchy.  A pick ray walks the tree one
+# level at a time with the boxes grown by the pick radius, so only the few
+# leaves near the ray are tested exactly.
+
+import numpy as np
+
+from qtvcp import logger
+
+LOG = logger.getLogger(__name__)
+
+LEAF_SIZE = 16
+# Morton grid resolution per axis, bits
+MORTON_BITS = 10
+
+
+def _spread_bits(v):
+    """
+    Spreads the low 10 bits of v so there are two zero bits between each.
+    """
+    v = v.astype(np.uint32)
+    v = (v * np.uint32(0x00010001)) & np.uint32(0xFF0000FF)
+    v = (v * np.uint32(0x00000101)) & np.uint32(0x0F00F00F)
+    v = (v * np.uint32(0x00000011)) & np.uint32(0xC30C30C3)
+    v = (v * np.uint32(0x00000005)) & np.uint32(0x49249249)
+    return v
+
+
+def _ray_hits_boxes(origin, direction, lo, hi):
+    """
+    Which of the boxes lo-hi (N, 3) the ray origin + t * direction (t >= 0) crosses.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inv = 1.0 / direction
+        t1 = (lo - origin) * inv
+        t2 = (hi - origin) * inv
+    near = np.minimum(t1, t2)
+    far = np.maximum(t1, t2)
+    # Axes the ray runs parallel to: inside the slab or not at all
+    flat = direction == 0
+    if flat.any():
+        inside = (lo[:, flat] <= origin[flat]) & (origin[flat] <= hi[:, flat])
+        near[:, flat] = np.where(inside, -np.inf, np.inf)
+        far[:, flat] = np.where(inside, np.inf, -np.inf)
+    return np.maximum(near.max(axis=1), 0.0) <= far.min(axis=1)
+
+
+def _ray_segment_distance(origin, direction, a, b):
+    """
+    Distance between the ray (unit direction) and segments a-b (N, 3), and
+    the ray parameter of the closest point.
+    """
+    u = b - a
+    w = a - origin
+    uu = np.einsum('ij,ij->i', u, u)
+    du = u @ direction
+    dw = w @ direction
+    uw = np.einsum('ij,ij->i', u, w)
+    denom = uu - du * du
+    with np.errstate(divide='ignore', invalid='ignore'):
+        s = np.where(denom > 1e-12, (du * dw - uw) / denom, 0.0)
+    s = np.clip(s, 0.0, 1.0)
+    t = np.maximum(dw + s * du, 0.0)
+    d = w + u * s[:, None] - direction * t[:, None]
+    return np.sqrt(np.einsum('ij,ij->i', d, d)), t
+
+
+class SegmentIndex:
+    def __init__(self, starts, ends, lines):
+        """
+        starts, ends: (N, 3) segment end points; lines: G-code line per segment.
+        """
+        self.starts = np.asarray(starts, dtype=np.float64)
+        self.ends = np.asarray(ends, dtype=np.float64)
+        self.lines = np.asarray(lines)
+        n = len(self.lines)
+        self._levels = []
+        if not n:
+            self.order = np.zeros(0, dtype=np.intp)
+            return
+        lo = np.minimum(self.starts, self.ends)
+        hi = np.maximum(self.starts, self.ends)
+        mid = (lo + hi) / 2.0
+        low, span = mid.min(axis=0), np.ptp(mid, axis=0)
+        scale = np.where(span > 0, ((1 << MORTON_BITS) - 1) / np.where(span > 0, span, 1.0), 0.0)
+        cell = ((mid - low) * scale).astype(np.uint32)
+        code = (_spread_bits(cell[:, 0]) << np.uint32(2)) | (_spread_bits(cell[:, 1]) << np.uint32(1)) \
+            | _spread_bits(cell[:, 2])
+        self.order = np.argsort(code, kind='stable')
+        first = np.arange(0, n, LEAF_SIZE)
+        level = (np.minimum.reduceat(lo[self.order], first), np.maximum.reduceat(hi[self.order], first))
+        self._levels.append(level)
+        while len(level[0]) > 1:
+            lo, hi = level
+            if len(lo) % 2:
+                lo = np.concatenate((lo, lo[-1:]))
+                hi = np.concatenate((hi, hi[-1:]))
+            level = (np.minimum(lo[0::2], lo[1::2]), np.maximum(hi[0::2], hi[1::2]))
+            self._levels.append(level)
+
+    def __len__(self):
+        return len(self.lines)
+
+    @classmethod
+    def from_toolpath(cls, toolpath):
+        return cls(toolpath.points[:-1], toolpath.points[1:], toolpath.line)
+
+    @classmethod
+    def from_canon(cls, canon, names=('traverse', 'feed', 'arcfeed')):
+        """
+        Indexes the segment lists (line, start, end, ...) of a glcanon canon.
+        """
+        segments = [s for name in names for s in getattr(canon, name, None) or ()]
+        if not segments:
+            return cls(np.zeros((0, 3)), np.zeros((0, 3)), np.zeros(0, dtype=np.int64))
+        return cls([s[1][:3] for s in segments], [s[2][:3] for s in segments],
+                   [s[0] for s in segments])
+
+    def pick(self, origin, direction, radius):
+        """
+        Returns (line, segment) of the segment closest to the ray within
+        radius, or None.  Among segments at the same distance the one nearer
+        the ray origin wins.
+        """
+        if not self._levels:
+            return None
+        origin = np.asarray(origin, dtype=np.float64)
+        direction = np.asarray(direction, dtype=np.float64)
+        norm = np.linalg.norm(direction)
+        if norm == 0:
+            return None
+        direction = direction / norm
+        nodes = np.zeros(1, dtype=np.intp)
+        for depth in range(len(self._levels) - 1, -1, -1):
+            lo, hi = self._levels[depth]
+            nodes = nodes[nodes < len(lo)]
+            nodes = nodes[_ray_hits_boxes(origin, direction, lo[nodes] - radius, hi[nodes] + radius)]
+            if not len(nodes):
+                return None
+            if depth:
+                nodes = np.concatenate((2 * nodes, 2 * nodes + 1))
+        # Segments of the leaves the ray passes
+        candidates = (nodes[:, None] * LEAF_SIZE + np.arange(LEAF_SIZE)).ravel()
+        candidates = self.order[candidates[candidates < len(self.order)]]
+        distance, t = _ray_segment_distance(origin, direction, self.starts[candidates], self.ends[candidates])
+        close = distance <= radius
+        if not close.any():
+            return None
+        candidates, distance, t = candidates[close], distance[close], t[close]
+        best = np.lexsort((t, distance))[0]
+        segment = int(candidates[best])
+        return int(self.lines[segment]), segment
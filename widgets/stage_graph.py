@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+# Small memoizing dependency graph.
+#
+# Inputs are plain values set from outside; stages are functions of inputs and
+# other stages.  A stage's result is kept until one of its (transitive) inputs
+# changes, so asking for it again is free.  The graph records which stages
+# were recomputed by the last request and how long each one took.
+
+import time
+
+from qtvcp import logger
+
+LOG = logger.getLogger(__name__)
+
+_UNSET = object()
+
+
+class StageGraph:
+    def __init__(self):
+        self._deps = {}
+        self._funcs = {}
+        self._values = {}
+        self._dependents = {}
+        # Duration (seconds) of the last computation of each stage
+        self.timings = {}
+        # (stage, seconds) of every stage recomputed by the last get()
+        self.last_recomputed = []
+
+    def add_input(self, name, value=_UNSET):
+        self._deps[name] = ()
+        self._dependents.setdefault(name, set())
+        if value is not _UNSET:
+            self._values[name] = value
+
+    def add_stage(self, name, func, deps=()):
+        """
+        Adds a stage computed as func(*values_of_deps).
+        """
+        for dep in deps:
+            if dep not in self._deps:
+                raise ValueError('Stage {} depends on unknown node {}'.format(name, dep))
+            self._dependents[dep].add(name)
+        self._deps[name] = tuple(deps)
+        self._funcs[name] = func
+        self._dependents.setdefault(name, set())
+
+    def set_input(self, name, value):
+        """
+        Sets an input; stages depending on it are invalidated if it changed.
+        Returns True if the value changed.
+        """
+        if self._values.get(name, _UNSET) == value:
+            return False
+        self._values[name] = value
+        for dep in self._dependents[name]:
+            self.invalidate(dep)
+        return True
+
+    def invalidate(self, name):
+        if name in self._funcs and self._values.pop(name, _UNSET) is _UNSET:
+            # Not computed, so nothing downstream can be either
+            return
+        for dep in self._dependents[name]:
+            self.invalidate(dep)
+
+    def invalidate_all(self):
+        for name in self._funcs:
+            self._values.pop(name, None)
+
+    def is_valid(self, name):
+        return name in self._values
+
+    def value(self, name, default=None):
+        """
+        Returns the memoized value of a node without computing it.
+        """
+        return self._values.get(name, default)
+
+    def plan(self, name):
+        """
+        Returns the stale stages needed for name, in dependency order.
+        Lets a caller compute some stages elsewhere and put() their values.
+        """
+        order = []
+        self._plan(name, order, set())
+        return order
+
+    def _plan(self, name, order, seen):
+        if name in seen or name in self._values:
+            return
+        seen.add(name)
+        if name not in self._funcs:
+            raise KeyError('Input {} has no value'.format(name))
+        for dep in self._deps[name]:
+            self._plan(dep, order, seen)
+        order.append(name)
+
+    def put(self, name, value, elapsed=0.0):
+        """
+        Stores a stage value computed outside of the graph.
+        """
+        self._values[name] = value
+        self.timings[name] = elapsed
+        self.last_recomputed.append((name, elapsed))
+
+    def get(self, name):
+        """
+        Returns the value of a node, computing it and any stale dependencies.
+        """
+        self.last_recomputed = []
+        return self._get(name)
+
+    def _get(self, name):
+        value = self._values.get(name, _UNSET)
+        if value is not _UNSET:
+            return value
+        if name not in self._funcs:
+            raise KeyError('Input {} has no value'.format(name))
+        args = [self._get(dep) for dep in self._deps[name]]
+        start = time.perf_counter()
+        value = self._funcs[name](*args)
+        elapsed = time.perf_counter() - start
+        self.put(name, value, elapsed)
+        LOG.debug('Stage {} computed in {:.1f} ms'.format(name, elapsed * 1000))
+        return value
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+# Background linuxcnc.stat polling with change-only delivery.
+#
+# A dedicated thread polls NML at a fixed rate and compares the fields of
+# interest with the previous snapshot.  Only the fields that changed are
+# sent to the GUI thread, as one dict per poll cycle, and dispatched there to
+# the callbacks subscribed to them.  A cycle without changes costs the GUI
+# thread nothing, so the poll rate can go up without taking frame time.
+
+import threading
+import time
+
+import linuxcnc
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from qtvcp import logger
+
+LOG = logger.getLogger(__name__)
+
+DEFAULT_INTERVAL = 0.1
+
+# linuxcnc.stat attributes delivered by default
+DEFAULT_FIELDS = ('task_state', 'task_mode', 'exec_state', 'interp_state', 'paused', 'estop', 'enabled',
+                  'homed', 'file', 'current_line', 'motion_line', 'actual_position', 'position',
+                  'dtg', 'g5x_offset', 'g5x_index', 'g92_offset', 'tool_offset', 'tool_in_spindle',
+                  'current_vel', 'motion_type', 'feedrate', 'spindle', 'limit', 'program_units',
+                  'gcodes', 'mcodes')
+
+
+def cycle_time(ini, default=DEFAULT_INTERVAL):
+    """
+    [DISPLAY] CYCLE_TIME in seconds; like qtvcp, values above 1 are taken as ms.
+    """
+    try:
+        value = float(ini.find('DISPLAY', 'CYCLE_TIME'))
+    except (TypeError, ValueError):
+        return default
+    if value <= 0:
+        return default
+    return value / 1000.0 if value > 1 else value
+
+
+class StatusService(QObject):
+    # {field: new value} of the fields that changed in one poll cycle
+    changed = pyqtSignal(dict)
+    # error message; polling goes on
+    failed = pyqtSignal(str)
+
+    def __init__(self, interval=DEFAULT_INTERVAL, fields=DEFAULT_FIELDS, parent=None):
+        super(StatusService, self).__init__(parent)
+        self.interval = interval
+        self.fields = tuple(fields)
+        self.snapshot = {}
+        self._subscribers = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self.polls = 0
+        self.deliveries = 0
+        # Queued to the GUI thread: the signal is emitted from the poll thread
+        self.changed.connect(self._deliver)
+
+    def subscribe(self, fields, callback):
+        """
+        Calls callback(value) in the GUI thread whenever one of fields (a
+        name or a sequence of names) changes, and once with the current
+        value if it is known already.
+        """
+        if isinstance(fields, str):
+            fields = (fields,)
+        for field in fields:
+            if field not in self.fields:
+                raise ValueError('StatusService does not poll {}'.format(field))
+            self._subscribers.setdefault(field, []).append(callback)
+            if field in self.snapshot:
+                callback(self.snapshot[field])
+
+    def unsubscribe(self, callback):
+        for callbacks in self._subscribers.values():
+            while callback in callbacks:
+                callbacks.remove(callback)
+
+    def get(self, field, default=None):
+        return self.snapshot.get(field, default)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='status-service', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def _run(self):
+        stat = linuxcnc.stat()
+        previous = {}
+        failing = False
+        next_poll = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                stat.poll()
+                current = {field: getattr(stat, field) for field in self.fields}
+                failing = False
+            except linuxcnc.error as e:
+                if not failing:
+                    LOG.error('Status poll failed: {}'.format(e))
+                    self.failed.emit(str(e))
+                failing = True
+                current = previous
+            self.polls += 1
+            changes = {field: value for field, value in current.items() if previous.get(field) != value}
+            if changes:
+                previous = current
+                self.changed.emit(changes)
+            next_poll += self.interval
+            now = time.monotonic()
+            if next_poll < now:
+                # Fell behind; do not try to catch up with a burst of polls
+                next_poll = now
+            self._stop.wait(next_poll - now)
+
+    def _deliver(self, changes):
+        self.deliveries += 1
+        self.snapshot.update(changes)
+        for field in changes:
+            for callback in self._subscribers.get(field, ()):
+                try:
+                    callback(changes[field])
+                except Exception as e:
+                    LOG.exception('Status subscriber for {} failed: {}'.format(field, e))
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+
+# Compact, array-backed toolpath representation.
+#
+# A program's motion is stored as one polyline: points[i] -> points[i + 1] is
+# segment i.  Vertices are contiguous float32 triples and every segment has
+# entries in small side arrays (motion kind, source line, feed, spindle,
+# modal flags, tool).  Lengths are in mm and feeds in mm/min (mm/rev with
+# FLAG_FEED_PER_REV, 1/min with FLAG_INVERSE_TIME); spindle is the speed in
+# rpm, or the surface speed in mm/min with FLAG_CSS.  Arcs are collected
+# while the program is parsed and tessellated afterwards in one vectorized
+# pass.  The same buffer feeds the 3D preview, the time estimator and
+# picking.
+#
+# The serialized form is a small JSON header followed by the raw, aligned
+# arrays, so a stored toolpath can be memory-mapped instead of read.
+
+import json
+import math
+import mmap
+import struct
+from array import array
+
+import numpy as np
+
+from qtvcp import logger
+
+LOG = logger.getLogger(__name__)
+
+# Segment kinds
+RAPID = 0
+FEED = 1
+ARC = 2
+
+# Segment flag bits (modal state that affects timing)
+FLAG_FEED_PER_REV = 1
+FLAG_CSS = 2
+FLAG_INVERSE_TIME = 4
+
+# Plane codes used by the arc table: (first axis, second axis, normal axis)
+PLANE_AXES = np.array([(0, 1, 2), (2, 0, 1), (1, 2, 0)], dtype=np.intp)
+PLANE_XY = 0
+PLANE_XZ = 1
+PLANE_YZ = 2
+
+# Default maximum chord deviation (mm) when tessellating arcs
+ARC_TOLERANCE = 0.01
+# Bounds on the number of segments per arc
+ARC_MIN_SEGMENTS = 4
+ARC_MAX_SEGMENTS = 720
+
+_FIELDS = ('points', 'kind', 'line', 'feed', 'spindle', 'flags', 'tool',
+           'dwell_line', 'dwell_time')
+
+_MAGIC = b'TOOLPTH1'
+_ALIGN = 64
+
+
+def _aligned(n):
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def pack_arrays(magic, arrays):
+    """
+    Serializes (name, array) pairs: magic, a JSON header, then each array
+    at an aligned offset.
+    """
+    fields = {}
+    offset = 0
+    contiguous = []
+    for name, a in arrays:
+        a = np.ascontiguousarray(a)
+        fields[name] = (a.dtype.str, a.shape, offset)
+        contiguous.append(a)
+        offset = _aligned(offset + a.nbytes)
+    header = json.dumps(fields).encode()
+    start = _aligned(len(magic) + 4 + len(header))
+    out = bytearray(start + offset)
+    out[:len(magic)] = magic
+    struct.pack_into('<I', out, len(magic), len(header))
+    out[len(magic) + 4:len(magic) + 4 + len(header)] = header
+    for a, (_, _, pos) in zip(contiguous, fields.values()):
+        out[start + pos:start + pos + a.nbytes] = a.tobytes()
+    return bytes(out)
+
+
+def unpack_arrays(magic, source):
+    """
+    Returns {name: array} written by pack_arrays() from bytes or a file
+    name.  Files are memory-mapped read-only.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        buf = source
+    else:
+        with open(source, 'rb') as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if bytes(buf[:len(magic)]) != magic:
+        raise ValueError('not a {} file'.format(magic.decode('ascii', 'replace')))
+    size, = struct.unpack_from('<I', buf, len(magic))
+    fields = json.loads(bytes(buf[len(magic) + 4:len(magic) + 4 + size]).decode())
+    start = _aligned(len(magic) + 4 + size)
+    arrays = {}
+    for name, (dtype, shape, pos) in fields.items():
+        count = int(np.prod(shape))
+        arrays[name] = np.frombuffer(buf, dtype=dtype, count=count, offset=start + pos).reshape(shape)
+    return arrays
+
+
+class Toolpath:
+    """
+    Array-backed toolpath.  All arrays are numpy arrays; N is the number of
+    segments and points has N + 1 rows.
+    """
+
+    def __init__(self, points=None, kind=None, line=None, feed=None, spindle=None,
+                 flags=None, tool=None, dwell_line=None, dwell_time=None):
+        self.points = _or_empty(points, np.float32, (0, 3))
+        self.kind = _or_empty(kind, np.uint8)
+        self.line = _or_empty(line, np.int32)
+        self.feed = _or_empty(feed, np.float32)
+        self.spindle = _or_empty(spindle, np.float32)
+        self.flags = _or_empty(flags, np.uint8)
+        self.tool = _or_empty(tool, np.int32)
+        self.dwell_line = _or_empty(dwell_line, np.int32)
+        self.dwell_time = _or_empty(dwell_time, np.float32)
+
+    def __len__(self):
+        return len(self.kind)
+
+    def __repr__(self):
+        return '<Toolpath {} segments, {} kB>'.format(len(self), self.nbytes // 1024)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in _FIELDS)
+
+    @property
+    def starts(self):
+        return self.points[:-1]
+
+    @property
+    def ends(self):
+        return self.points[1:]
+
+    def lengths(self):
+        """
+        Returns the length of every segment (float64).
+        """
+        if not len(self):
+            return np.zeros(0)
+        d = np.diff(self.points.astype(np.float64), axis=0)
+        return np.sqrt(np.einsum('ij,ij->i', d, d))
+
+    def bounds(self):
+        """
+        Returns (min, max) of all points as float64 arrays, or None if empty.
+        """
+        if not len(self.points):
+            return None
+        return self.points.min(axis=0).astype(np.float64), self.points.max(axis=0).astype(np.float64)
+
+    def to_bytes(self):
+        """
+        Serializes all arrays, see pack_arrays().
+        """
+        return pack_arrays(_MAGIC, [(name, getattr(self, name)) for name in _FIELDS])
+
+    @classmethod
+    def concatenate(cls, parts):
+        """
+        Joins toolpaths where each part starts at the end point of the one before.
+        """
+        parts = [p for p in parts if len(p) or len(p.dwell_line)] or parts[:1]
+        if len(parts) == 1:
+            return parts[0]
+        fields = {name: np.concatenate([getattr(p, name) for p in parts]) for name in _FIELDS[1:]}
+        points = np.concatenate([parts[0].points] + [p.points[1:] for p in parts[1:]])
+        return cls(points=points, **fields)
+
+    @classmethod
+    def load(cls, source):
+        """
+        Loads a toolpath written by to_bytes() from bytes or a file name.
+        Files are memory-mapped read-only: nothing is read or copied until
+        the arrays are used.
+        """
+        return cls(**unpack_arrays(_MAGIC, source))
+
+
+def _or_empty(value, dtype, shape=(0,)):
+    if value is None:
+        return np.zeros(shape, dtype=dtype)
+    return np.ascontiguousarray(value, dtype=dtype)
+
+
+class ToolpathBuilder:
+    """
+    Collects moves while a program is parsed, in compact stdlib arrays, and
+    turns them into a Toolpath with finish().
+    """
+
+    def __init__(self, start=(0.0, 0.0, 0.0), tolerance=ARC_TOLERANCE):
+        self.tolerance = tolerance
+        # Toolpaths handed out by take()
+        self._parts = []
+        self._reset(start)
+
+    def _reset(self, start):
+        self._points = array('d', start)
+        self._kind = array('B')
+        self._line = array('i')
+        self._feed = array('f')
+        self._spindle = array('f')
+        self._flags = array('B')
+        self._tool = array('i')
+        # Arc table: record index, centre, plane code, clockwise, turns
+        self._arc_record = array('q')
+        self._arc_center = array('d')
+        self._arc_plane = array('B')
+        self._arc_cw = array('B')
+        self._arc_turns = array('i')
+        self._dwell_line = array('i')
+        self._dwell_time = array('f')
+
+    def add(self, end, kind, line, feed, spindle, flags, tool):
+        self._points.extend(end)
+        self._kind.append(kind)
+        self._line.append(line)
+        self._feed.append(feed)
+        self._spindle.append(spindle)
+        self._flags.append(flags)
+        self._tool.append(tool)
+
+    def add_arc(self, end, center, plane, clockwise, turns, line, feed, spindle, flags, tool):
+        self._arc_record.append(len(self._kind))
+        self._arc_center.extend(center)
+        self._arc_plane.append(plane)
+        self._arc_cw.append(1 if clockwise else 0)
+        self._arc_turns.append(max(int(turns), 1))
+        self.add(end, ARC, line, feed, spindle, flags, tool)
+
+    def extend(self, ends, kind, line, feed, spindle, flags, tool, arcs=None):
+        """
+        Adds a batch of moves: ends is (n, 3), the side fields are arrays of
+        n or scalars.  arcs is (index, center, plane, clockwise, turns) for
+        the moves of the batch that are arcs, index counted within the batch.
+        """
+        n = len(ends)
+        base = len(self._kind)
+
+        def column(values, dtype):
+            return np.ascontiguousarray(np.broadcast_to(np.asarray(values, dtype=dtype), (n,))).tobytes()
+
+        self._points.frombytes(np.ascontiguousarray(ends, dtype=np.float64).tobytes())
+        self._kind.frombytes(column(kind, np.uint8))
+        self._line.frombytes(column(line, np.int32))
+        self._feed.frombytes(column(feed, np.float32))
+        self._spindle.frombytes(column(spindle, np.float32))
+        self._flags.frombytes(column(flags, np.uint8))
+        self._tool.frombytes(column(tool, np.int32))
+        if arcs is not None and len(arcs[0]):
+            index, center, plane, clockwise, turns = arcs
+            n = len(index)
+            self._arc_record.frombytes(column(np.asarray(index) + base, np.int64))
+            self._arc_center.frombytes(np.ascontiguousarray(center, dtype=np.float64).tobytes())
+            self._arc_plane.frombytes(column(plane, np.uint8))
+            self._arc_cw.frombytes(column(clockwise, np.uint8))
+            self._arc_turns.frombytes(column(np.maximum(np.asarray(turns, dtype=np.int32), 1), np.int32))
+
+    def add_dwell(self, line, seconds):
+        self._dwell_line.append(line)
+        self._dwell_time.append(seconds)
+
+    def take(self):
+        """
+        Returns the moves added since the last take() as a Toolpath, e.g. to
+        show a program while it is still being parsed.  finish() still
+        returns the whole toolpath.
+        """
+        part = self._build()
+        self._parts.append(part)
+        self._reset(self._points[-3:])
+        return part
+
+    def finish(self):
+        part = self._build()
+        if self._parts:
+            return Toolpath.concatenate(self._parts + [part])
+        return part
+
+    def _build(self):
+        points = np.frombuffer(self._points, dtype=np.float64).reshape(-1, 3)
+        side = dict(kind=np.frombuffer(self._kind, dtype=np.uint8),
+                    line=np.frombuffer(self._line, dtype=np.int32),
+                    feed=np.frombuffer(self._feed, dtype=np.float32),
+                    spindle=np.frombuffer(self._spindle, dtype=np.float32),
+                    flags=np.frombuffer(self._flags, dtype=np.uint8),
+                    tool=np.frombuffer(self._tool, dtype=np.int32))
+        if len(self._arc_record):
+            points, side = tessellate_arcs(
+                points, side,
+                np.frombuffer(self._arc_record, dtype=np.int64),
+                np.frombuffer(self._arc_center, dtype=np.float64).reshape(-1, 3),
+                np.frombuffer(self._arc_plane, dtype=np.uint8),
+                np.frombuffer(self._arc_cw, dtype=np.uint8).astype(bool),
+                np.frombuffer(self._arc_turns, dtype=np.int32),
+                self.tolerance)
+        return Toolpath(points=points, dwell_line=np.frombuffer(self._dwell_line, dtype=np.int32),
+                        dwell_time=np.frombuffer(self._dwell_time, dtype=np.float32), **side)
+
+
+def tessellate_arcs(points, side, record, center, plane, clockwise, turns, tolerance=ARC_TOLERANCE):
+    """
+    Replaces the arc records of a polyline by chords.
+
+    points (R + 1, 3) float64 holds the record end points, side the per
+    record arrays.  The arc table gives for each arc its record index,
+    centre, plane code, direction and number of turns.  Each arc is split
+    into enough chords to stay within tolerance; the side arrays are
+    repeated for the chords.  Returns the new (points, side).
+    """
+    axes = PLANE_AXES[plane]                          # (A, 3)
+    start = points[record]
+    end = points[record + 1]
+    rows = np.arange(len(record))
+    c1 = center[rows, axes[:, 0]]
+    c2 = center[rows, axes[:, 1]]
+    s1 = start[rows, axes[:, 0]] - c1
+    s2 = start[rows, axes[:, 1]] - c2
+    e1 = end[rows, axes[:, 0]] - c1
+    e2 = end[rows, axes[:, 1]] - c2
+    radius = np.hypot(s1, s2)
+    a0 = np.arctan2(s2, s1)
+    a1 = np.arctan2(e2, e1)
+    two_pi = 2 * math.pi
+    sweep = np.where(clockwise, (a0 - a1) % two_pi, (a1 - a0) % two_pi)
+    sweep = np.where(sweep < 1e-9, two_pi, sweep) + two_pi * np.maximum(turns - 1, 0)
+    sweep = np.where(clockwise, -sweep, sweep)
+
+    # Angle per chord that keeps the sagitta within tolerance
+    ratio = np.clip(1.0 - tolerance / np.maximum(radius, 1e-12), -1.0, 1.0)
+    step = np.maximum(2.0 * np.arccos(ratio), 1e-6)
+    count = np.clip(np.ceil(np.abs(sweep) / step), ARC_MIN_SEGMENTS, ARC_MAX_SEGMENTS).astype(np.int64)
+
+    counts = np.ones(len(points) - 1, dtype=np.int64)
+    counts[record] = count
+    last = np.cumsum(counts)                          # output index of each record's end point
+    out = np.empty((last[-1] + 1, 3), dtype=np.float64)
+    out[0] = points[0]
+    out[last] = points[1:]
+
+    # Interior chord vertices of all arcs at once
+    arc_of = np.repeat(rows, count)
+    k = np.arange(len(arc_of)) - np.repeat(np.cumsum(count) - count, count) + 1
+    interior = k < count[arc_of]
+    arc_of = arc_of[interior]
+    frac = k[interior] / count[arc_of]
+    ang = a0[arc_of] + sweep[arc_of] * frac
+    idx = last[record][arc_of] - count[arc_of] + k[interior]
+    ax = axes[arc_of]
+    vert = np.empty((len(arc_of), 3), dtype=np.float64)
+    vert[np.arange(len(arc_of)), ax[:, 0]] = c1[arc_of] + radius[arc_of] * np.cos(ang)
+    vert[np.arange(len(arc_of)), ax[:, 1]] = c2[arc_of] + radius[arc_of] * np.sin(ang)
+    sn = start[arc_of, ax[:, 2]]
+    vert[np.arange(len(arc_of)), ax[:, 2]] = sn + (end[arc_of, ax[:, 2]] - sn) * frac
+    out[idx] = vert
+
+    side = {name: np.repeat(values, counts) for name, values in side.items()}
+    return out, side
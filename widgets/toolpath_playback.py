@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+
+# Time-scaled playback of a parsed toolpath.
+#
+# PlaybackTimeline places every toolpath segment on the estimated program
+# clock (segment times and dwells from a CycleTime), so the tool position at
+# any time is one binary search and a linear interpolation; times can be
+# passed as arrays to sample many at once.  ToolpathPlayback is the clock:
+# it plays the timeline at 1x-100x, pauses, seeks, and emits the program
+# time once per frame for the views to follow.
+
+import math
+import time
+
+import numpy as np
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+from qtvcp import logger
+from qtvcp.widgets.toolpath import FLAG_CSS
+
+LOG = logger.getLogger(__name__)
+
+# Playback frame interval, ms
+FRAME_MS = 33
+MIN_SPEED = 1.0
+MAX_SPEED = 100.0
+
+
+class PlaybackTimeline:
+    def __init__(self, toolpath, segment_time, rpm_cap=math.inf):
+        """
+        segment_time holds the estimated seconds of every toolpath segment;
+        dwells are taken from the toolpath.  rpm_cap limits the spindle
+        speed of constant surface speed (G96) moves.
+        """
+        self.toolpath = toolpath
+        n = len(toolpath)
+        self.segment_time = np.asarray(segment_time, dtype=np.float64)
+        self.starts = toolpath.starts.astype(np.float64)
+        self.delta = toolpath.ends.astype(np.float64) - self.starts
+
+        # Dwells stop the clock before the first segment after their line
+        pause = np.zeros(n + 1)
+        if len(toolpath.dwell_line):
+            index = np.searchsorted(toolpath.line, toolpath.dwell_line, side='right')
+            np.add.at(pause, index, toolpath.dwell_time.astype(np.float64))
+        # begin[i]: program time at which segment i starts
+        self.begin = np.concatenate(([0.0], np.cumsum(self.segment_time)))[:n] + np.cumsum(pause)[:n]
+        self.total = float(self.segment_time.sum() + pause.sum())
+
+        self.rpm = toolpath.spindle.astype(np.float64)
+        css = (toolpath.flags & FLAG_CSS) != 0
+        if css.any():
+            # rpm from surface speed at the segment's mean radius (X)
+            radius = np.abs(self.starts[:, 0] + 0.5 * self.delta[:, 0])
+            with np.errstate(divide='ignore'):
+                self.rpm = np.where(css, np.minimum(self.rpm / (2 * math.pi * radius), rpm_cap), self.rpm)
+
+    def __len__(self):
+        return len(self.begin)
+
+    def __repr__(self):
+        return '<PlaybackTimeline {} segments, {:.1f} s>'.format(len(self), self.total)
+
+    @classmethod
+    def from_cycle(cls, toolpath, cycle, limits=None, css_max_rpm=None):
+        """
+        Timeline from the CycleTime estimated for toolpath.
+        """
+        rpm_cap = min(css_max_rpm or math.inf, limits.max_spindle if limits is not None else math.inf)
+        return cls(toolpath, cycle.segment_time, rpm_cap)
+
+    def segment(self, t):
+        """
+        Index of the segment running at time t (scalar or array), or -1
+        for an empty toolpath.
+        """
+        t = np.asarray(t, dtype=np.float64)
+        if not len(self):
+            return np.full(t.shape, -1, dtype=np.intp)
+        index = np.searchsorted(self.begin, t, side='right') - 1
+        return np.clip(index, 0, len(self) - 1)
+
+    def sample(self, t):
+        """
+        Returns (points, segments) at time t (scalar or array): the
+        interpolated tool position(s) and the running segment(s).
+        """
+        t = np.clip(np.asarray(t, dtype=np.float64), 0.0, self.total)
+        index = self.segment(t)
+        if not len(self):
+            points = self.toolpath.points[:1].astype(np.float64)
+            point = points[0] if len(points) else np.zeros(3)
+            return np.broadcast_to(point, t.shape + (3,)), index
+        duration = self.segment_time[index]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fraction = np.where(duration > 0, (t - self.begin[index]) / duration, 1.0)
+        fraction = np.clip(fraction, 0.0, 1.0)
+        return self.starts[index] + fraction[..., None] * self.delta[index], index
+
+    def line(self, segment):
+        return int(self.toolpath.line[segment]) if segment >= 0 else 0
+
+    def spindle(self, segment):
+        return float(self.rpm[segment]) if segment >= 0 else 0.0
+
+
+class ToolpathPlayback(QObject):
+    # Program time (s) of the current frame
+    advanced = pyqtSignal(float)
+    finished = pyqtSignal()
+
+    def __init__(self, clock=time.monotonic, parent=None):
+        super(ToolpathPlayback, self).__init__(parent)
+        self.clock = clock
+        self.timeline = None
+        self.running = False
+        self._speed = MIN_SPEED
+        self._time = 0.0
+        self._since = None
+        self._timer = QTimer(self)
+        self._timer.setInterval(FRAME_MS)
+        self._timer.timeout.connect(self._frame)
+
+    @property
+    def playing(self):
+        return self._since is not None
+
+    @property
+    def total(self):
+        return self.timeline.total if self.timeline is not None else 0.0
+
+    def load(self, timeline):
+        """
+        Plays timeline from the start; the old one is stopped.
+        """
+        self.stop()
+        self.timeline = timeline
+
+    def time(self):
+        """
+        Current program time, in seconds.
+        """
+        if self._since is None:
+            return self._time
+        return min(self._time + (self.clock() - self._since) * self._speed, self.total)
+
+    def speed(self):
+        return self._speed
+
+    def set_speed(self, speed):
+        self._rebase()
+        self._speed = min(max(float(speed), MIN_SPEED), MAX_SPEED)
+
+    def play(self):
+        if self.timeline is None:
+            return
+        if self._time >= self.total:
+            self._time = 0.0
+        self.running = True
+        self._since = self.clock()
+        self._timer.start()
+        self.advanced.emit(self._time)
+
+    def pause(self):
+        self._rebase()
+        self._since = None
+        self._timer.stop()
+
+    def stop(self):
+        self.pause()
+        self._time = 0.0
+        self.running = False
+
+    def seek(self, t):
+        """
+        Jumps to program time t; playback continues from there if playing.
+        """
+        if self.timeline is None:
+            return
+        self._time = min(max(float(t), 0.0), self.total)
+        if self._since is not None:
+            self._since = self.clock()
+        self.running = True
+        self.advanced.emit(self._time)
+
+    def _rebase(self):
+        if self._since is not None:
+            self._time = self.time()
+            self._since = self.clock()
+
+    def _frame(self):
+        t = self.time()
+        self.advanced.emit(t)
+        if t >= self.total:
+            self.pause()
+            self._time = self.total
+            LOG.debug('Playback finished at {:.1f} s'.format(t))
+            self.finished.emit()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+# Vismach drawable for a Toolpath.
+#
+# The toolpath's float32 vertex array is handed to OpenGL as-is and drawn as
+# a single line strip, with one colour per segment taken from its motion
+# kind.  Put it into a Vismach Collection like any other primitive.  Plots
+# of the same toolpath share its vertex and colour arrays.
+
+import weakref
+
+import numpy as np
+from OpenGL import GL
+
+from qtvcp import logger
+from qtvcp.widgets.toolpath import RAPID, FEED, ARC
+
+LOG = logger.getLogger(__name__)
+
+# RGBA per segment kind
+KIND_COLORS = np.zeros((256, 4), dtype=np.uint8)
+KIND_COLORS[RAPID] = (255, 220, 0, 255)
+KIND_COLORS[FEED] = (255, 255, 255, 255)
+KIND_COLORS[ARC] = (80, 200, 255, 255)
+
+# Toolpath -> colour array, shared by all plots showing it
+_colors = weakref.WeakKeyDictionary()
+
+
+def vertex_colors(toolpath):
+    colors = _colors.get(toolpath)
+    if colors is None:
+        # With flat shading a strip segment takes the colour of its end vertex
+        colors = np.empty((len(toolpath) + 1, 4), dtype=np.uint8)
+        colors[1:] = KIND_COLORS[toolpath.kind]
+        colors[0] = colors[1]
+        _colors[toolpath] = colors
+    return colors
+
+
+class ToolpathPlot:
+    def __init__(self, toolpath=None, line_width=1.5):
+        self.line_width = line_width
+        self.toolpath = None
+        self._vertices = None
+        self._colors = None
+        self.set_toolpath(toolpath)
+
+    def set_toolpath(self, toolpath):
+        """
+        Shows toolpath (a Toolpath or None); the view must be redrawn.
+        """
+        self.toolpath = toolpath
+        if toolpath is None or not len(toolpath):
+            self._vertices = self._colors = None
+            return
+        self._vertices = np.ascontiguousarray(toolpath.points, dtype=np.float32)
+        self._colors = vertex_colors(toolpath)
+        LOG.debug('Toolpath plot: {}'.format(toolpath))
+
+    def draw(self):
+        if self._vertices is None:
+            return
+        GL.glPushAttrib(GL.GL_ENABLE_BIT | GL.GL_LINE_BIT | GL.GL_LIGHTING_BIT | GL.GL_CURRENT_BIT)
+        GL.glPushClientAttrib(GL.GL_CLIENT_VERTEX_ARRAY_BIT)
+        try:
+            GL.glDisable(GL.GL_LIGHTING)
+            GL.glShadeModel(GL.GL_FLAT)
+            GL.glLineWidth(self.line_width)
+            GL.glEnableClientState(GL.GL_VERTEX_ARRAY)
+            GL.glEnableClientState(GL.GL_COLOR_ARRAY)
+            GL.glVertexPointer(3, GL.GL_FLOAT, 0, self._vertices)
+            GL.glColorPointer(4, GL.GL_UNSIGNED_BYTE, 0, self._colors)
+            GL.glDrawArrays(GL.GL_LINE_STRIP, 0, len(self._vertices))
+        finally:
+            GL.glPopClientAttrib()
+            GL.glPopAttrib()
@@ -2,7 +2,7 @@
 import os
 import sys
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QListView, QPushButton, QApplication, QFileSystemModel
-from PyQt5.QtCore import QDir, Qt
+from PyQt5.QtCore import QDir, Qt, pyqtSignal
 from PyQt5.QtGui import QFont
 from qtvcp import logger
 from qtvcp.core import Action, Status, Info
@@ -20,6 +20,11 @@ class TouchFileManager(QWidget):
     within a given starting directory. It prevents navigating above the starting directory.
     When a file is double-clicked, it loads the file into LinuxCNC using ACTION.OPEN_PROGRAM.
     """
+    # Emitted with the path as soon as a file is chosen, before it is loaded
+    fileSelected = pyqtSignal(str)
+    # Emitted with the path when a file is highlighted (tapped or moved to)
+    fileHighlighted = pyqtSignal(str)
+
     def __init__(self, parent=None):
         super(TouchFileManager, self).__init__(parent)
         self.setWindowTitle("Touch File Manager")
@@ -58,8 +63,18 @@ class TouchFileManager(QWidget):
         self.listView.setSelectionMode(QListView.SingleSelection)
         # Connect double-click signal to file/directory action
         self.listView.doubleClicked.connect(self.onFileDoubleClicked)
+        self.listView.selectionModel().currentChanged.connect(self.onCurrentChanged)
         mainLayout.addWidget(self.listView)
 
+    def onCurrentChanged(self, current, previous):
+        """
+        Called when the highlighted entry changes; announces files so their
+        analysis can start before the operator commits to one.
+        """
+        path = self.model.filePath(current)
+        if path and os.path.isfile(path):
+            self.fileHighlighted.emit(path)
+
     def onFileDoubleClicked(self, index):
         """
         Called when an item is double-clicked.
@@ -69,6 +84,7 @@ class TouchFileManager(QWidget):
         path = self.model.filePath(index)
         if os.path.isfile(path):
             LOG.info("G-code file selected: " + path)
+            self.fileSelected.emit(path)
             self.loadFile(path)
         else:
             # Navigate into the directory if it is within the starting directory.
@@ -7,6 +7,34 @@
 #  - Pinch gesture to zoom (and rotate around the Z-axis)
 #  - Two-finger swipe gesture to simulate right-mouse-button drag for pan/tilt/roll (rotate)
 #  - Double-click (or double-tap) to reset the view to its original settings
+#  - Gesture and wheel input is coalesced: at most one repaint per frame at
+#    the maxFps cap
+#  - Level-of-detail backplot: the program is drawn from the coarsest
+#    simplification level whose error stays below a pixel at the current zoom
+#  - Progressive loading (progressiveLoad property): the program is parsed on
+#    a background thread and drawn chunk by chunk with a progress bar.  The
+#    parsed toolpath is kept in the analysis cache next to the INI file, so
+#    reloading an unchanged program maps it from disk without parsing.
+#    Programs using O-words, parameters, canned cycles or other constructs
+#    the background parser does not execute are loaded through the
+#    interpreter instead, so the preview always matches what will run
+#  - All views showing the same program share it through the program store,
+#    progressive or not: what one view parsed or interpreted, and the detail
+#    levels and picking index built from it, the others take over
+#  - What the interpreter produced is kept in the analysis cache as well,
+#    for the program, INI, tool table and parameter file it came from; a
+#    later load or reload of the same program maps it instead of running
+#    the interpreter again
+#  - Tapping the backplot selects the nearest segment's G-code line through a
+#    spatial index of the program instead of GL selection
+#  - The highlighted line's segments come from a line -> segment range table
+#    built at load, so highlighting the running line does not scan the program
+#  - The live plot is kept in a bounded buffer (LiveTrail) with collinear
+#    points merged and old history decimated, so long jobs keep a flat
+#    memory and draw cost
+#  - Adaptive polling: fast while the machine moves, slow when idle, stopped
+#    while the widget is hidden, and no repaint when nothing changed.  With a
+#    StatusService attached, machine changes wake an idle poll at once
 #  - Only basic mouse handling (mode 0) is kept  the extra modes and DRO/HUD features
 #    have been removed.
 #
@@ -14,16 +42,31 @@
 
 import sys
 import os
+import time
+import hashlib
+import threading
+import numpy as np
 import gcode
 import linuxcnc
 
 from PyQt5.QtCore import pyqtProperty, QTimer, Qt, QEvent, QPointF
 from PyQt5.QtGui import QColor
-from PyQt5.QtWidgets import QApplication
+from PyQt5.QtWidgets import QApplication, QProgressBar
+from OpenGL import GL
 # Note: QPinchGesture and QPanGesture types are used via the Qt gesture framework.
 
 from qt5_graphics import Lcnc_3dGraphics
 from qtvcp.widgets.widget_baseclass import _HalWidgetBase
+from qtvcp.widgets.render_scheduler import RenderScheduler, DEFAULT_FPS
+from qtvcp.widgets.polyline_lod import PolylineLod
+from qtvcp.widgets.program_store import program_store
+from qtvcp.widgets.segment_index import SegmentIndex
+from qtvcp.widgets.line_ranges import LineRanges
+from qtvcp.widgets.live_trail import LiveTrail
+from qtvcp.widgets.analysis_cache import shared_cache, DIRECTORY_NAME
+from qtvcp.widgets.canon_snapshot import CanonSnapshot, load_canon, store_canon
+from qtvcp.widgets.toolpath_view import ToolpathPlot
+from qtvcp.widgets.cycle_time import MachineLimits, format_duration
 from qtvcp.core import Status, Info
 from qtvcp import logger
 
@@ -32,6 +75,87 @@ STATUS = Status()
 INFO = Info()
 LOG = logger.getLogger(__name__)
 
+# canon segment lists drawn with level of detail
+LOD_LISTS = ('traverse', 'feed', 'arcfeed')
+# Largest allowed on-screen deviation of the simplified backplot, pixels
+LOD_PIXEL_ERROR = 1.0
+# Minimum time between two redraws of a growing progressive preview, ms
+STREAM_REDRAW_MS = 250
+# The canon draws in inches; toolpaths are in mm
+CANON_UNITS_PER_MM = 1 / 25.4
+# Distance from a tap within which a segment is picked, pixels
+PICK_RADIUS = 8.0
+# Poll interval while idle (ms), and how long nothing must change before
+# polling slows down to it (s)
+IDLE_POLL_MS = 500
+IDLE_DELAY = 2.0
+# StatusService fields that wake up an idle poll
+WAKE_FIELDS = ('actual_position', 'interp_state', 'motion_line', 'g5x_offset', 'g92_offset',
+               'tool_offset', 'homed', 'tool_in_spindle')
+# Live plot colour per linuxcnc motion type (stat.motion_type); others are jogs
+LIVE_PLOT_COLORS = {1: 'backplottraverse', 2: 'backplotfeed', 3: 'backplotarc',
+                    4: 'backplottoolchange', 5: 'backplotprobing'}
+
+
+def config_digest(*options):
+    """
+    Digest of the INI file and of the files it names in options, (section,
+    option) pairs.
+    """
+    ini = os.environ.get('INI_FILE_NAME', '')
+    digest = hashlib.blake2b(digest_size=8)
+    paths = [ini]
+    for section, option in options:
+        name = INFO.INI.find(section, option)
+        if name:
+            paths.append(os.path.join(os.path.dirname(ini), os.path.expanduser(name)))
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        except OSError:
+            digest.update(b'-')
+    return digest.hexdigest()
+
+
+def preview_key():
+    """
+    Digest of the INI file and the tool table: the run time stored with a
+    cached preview is only valid for the configuration it was estimated with.
+    """
+    return config_digest(('EMCIO', 'TOOL_TABLE'))
+
+
+def canon_key():
+    """
+    Digest of the INI file, the tool table and the parameter file: what the
+    interpreter produces depends on tool lengths and work offsets too.
+    """
+    return config_digest(('EMCIO', 'TOOL_TABLE'), ('RS274NGC', 'PARAMETER_FILE'))
+
+
+def toolpath_properties(summary, run_time=None):
+    """
+    gcode properties (as emitted with 'graphics-gcode-properties') of an
+    analyzed program, for previews loaded without the canon.
+    """
+    metric = INFO.MACHINE_IS_METRIC
+    conv, units = (1.0, 'mm') if metric else (1 / 25.4, 'in')
+    props = {'name': os.path.basename(summary.path or ''),
+             'size': '{} bytes\n{} gcode lines'.format(summary.size, summary.line_count),
+             'lines': summary.line_count,
+             'machine_unit_sys': 'Metric' if metric else 'Imperial',
+             'gcode_units': units,
+             'toollist': list(summary.tools),
+             'toolchanges': len(summary.tool_changes)}
+    if summary.extents_min is not None:
+        for i, axis in enumerate('xyz'):
+            lo, hi = summary.extents_min[i] * conv, summary.extents_max[i] * conv
+            props[axis] = '{:f} to {:f} = {:f} {}'.format(lo, hi, hi - lo, units)
+    if run_time is not None:
+        props['run_time'] = format_duration(run_time)
+    return props
+
 
 class TouchGCodeGraphics(Lcnc_3dGraphics, _HalWidgetBase):
     def __init__(self, parent=None):
@@ -55,12 +179,481 @@ class TouchGCodeGraphics(Lcnc_3dGraphics, _HalWidgetBase):
         # For simulating right-mouse drag (rotation control)
         self._simulatedRotatePos = None
 
+        # View changes waiting for the next frame
+        self._pendingRotatePos = None
+        self._pendingZoom = None
+        self._pendingZRot = None
+        self._pendingWheel = 0
+        self._maxFps = DEFAULT_FPS
+        self.renderScheduler = RenderScheduler(self.applyPendingView, self._maxFps, self)
+
+        # Level-of-detail pyramids of the loaded program, per canon list
+        self._lod = {}
+        self._lodLevel = 0
+        self._projection = None
+        self._modelview = None
+
+        # Spatial index of the loaded program for picking; the progressive
+        # preview is indexed in mm, without the offset it is drawn at
+        self._segmentIndex = None
+        self._streamOffset = (0.0, 0.0, 0.0)
+        # Line -> segment ranges per canon list, or of the preview toolpath
+        self._lineRanges = {}
+
+        # Live plot, drawn in canon units
+        self.liveTrail = LiveTrail()
+        self._liveColors = {}
+
+        # Adaptive polling; repaints asked for by the base class' poll are
+        # held back and only issued when the polled state changed
+        self._deferUpdate = False
+        self._fingerprint = None
+        self._lastChange = 0.0
+
+        # Progressive loading: background parser, preview of what it has
+        # parsed so far, and the progress bar shown meanwhile
+        self._progressive = False
+        self._entry = None
+        self._streamPlot = ToolpathPlot()
+        self.programSummary = None
+        self.runTime = None
+        self._cache = None
+        # Interpreted preview to give the next canon instead of interpreting,
+        # and the one the last interpreter run produced
+        self._pendingCanon = None
+        self._loadedCanon = None
+        self._streamTimer = QTimer(self)
+        self._streamTimer.setSingleShot(True)
+        self._streamTimer.timeout.connect(self.updateStreamPreview)
+        self._loadProgress = QProgressBar(self)
+        self._loadProgress.setRange(0, 100)
+        self._loadProgress.setTextVisible(True)
+        self._loadProgress.hide()
+
     def initializeGL(self):
         # Call parent's initializeGL to set up OpenGL and the view.
         super(TouchGCodeGraphics, self).initializeGL()
         # Once the GL scene is ready, record the initial view settings.
         self._initialViewSettings = self.getCurrentViewSettings()
 
+    def paintGL(self):
+        start = time.perf_counter()
+        self.selectDetailLevel()
+        super(TouchGCodeGraphics, self).paintGL()
+        # Kept for the pixel size of the next frame and for picking
+        self._projection = GL.glGetDoublev(GL.GL_PROJECTION_MATRIX)
+        self._modelview = GL.glGetDoublev(GL.GL_MODELVIEW_MATRIX)
+        if self.get_show_live_plot():
+            self.liveTrail.draw()
+        self.renderScheduler.frame_done(time.perf_counter() - start)
+
+    def buildDetailLevels(self):
+        """
+        Builds the level-of-detail pyramids of the loaded program.
+        """
+        canon = getattr(self, 'canon', None)
+        self._lod = {}
+        self._lodLevel = 0
+        if canon is None:
+            return
+        start = time.perf_counter()
+        self._lod = self.derived('canon-lod', lambda: {name: PolylineLod(getattr(canon, name))
+                                                       for name in LOD_LISTS if getattr(canon, name, None)})
+        LOG.debug('Built backplot detail levels in {:.0f} ms'.format((time.perf_counter() - start) * 1000))
+
+    def derived(self, name, build):
+        """
+        Returns build() for the loaded program, built once for all views
+        sharing it through the program store.
+        """
+        if self._entry is None:
+            return build()
+        return self._entry.derived(name, build)
+
+    def buildSegmentIndex(self):
+        """
+        Indexes the loaded program (canon or progressive preview) for picking.
+        """
+        start = time.perf_counter()
+        canon, summary = self.canon, self.programSummary
+        if canon is not None:
+            self._segmentIndex = self.derived('canon-index', lambda: SegmentIndex.from_canon(canon))
+        elif summary is not None and summary.toolpath is not None:
+            self._segmentIndex = self.derived('toolpath-index', lambda: SegmentIndex.from_toolpath(summary.toolpath))
+        else:
+            self._segmentIndex = None
+            return
+        LOG.debug('Indexed {} backplot segments in {:.0f} ms'.format(
+            len(self._segmentIndex), (time.perf_counter() - start) * 1000))
+
+    def buildLineRanges(self):
+        """
+        Builds the line -> segment range table of the loaded program.
+        """
+        canon, summary = self.canon, self.programSummary
+        if canon is not None:
+            self._lineRanges = self.derived('canon-ranges', lambda: LineRanges.from_canon(canon))
+        elif summary is not None and summary.toolpath is not None:
+            self._lineRanges = self.derived('toolpath-ranges', lambda: {
+                'toolpath': LineRanges(summary.toolpath.line, summary.line_count + 1)})
+        else:
+            self._lineRanges = {}
+
+    def highlight(self, lineno, geometry):
+        """
+        Draws the segments of lineno in the selection colour, looked up in
+        the line range table, and returns their centre like the base class.
+        """
+        if not self._lineRanges:
+            if self.canon is not None:
+                return super(TouchGCodeGraphics, self).highlight(lineno, geometry)
+            return 0.0, 0.0, 0.0
+        GL.glLineWidth(3)
+        GL.glColor3f(*self.colors['selected'])
+        if self.canon is not None:
+            coords = []
+            GL.glBegin(GL.GL_LINES)
+            for name, ranges in self._lineRanges.items():
+                segments = getattr(self.canon, name)
+                selected = ranges.segments(lineno)
+                if isinstance(selected, slice):
+                    selected = segments[selected]
+                else:
+                    selected = [segments[i] for i in selected.tolist()]
+                for line in selected:
+                    linuxcnc.line9(geometry, line[1], line[2])
+                    coords.append(line[1][:3])
+                    coords.append(line[2][:3])
+            GL.glEnd()
+            coords = np.array(coords, dtype=np.float64).reshape(-1, 3)
+        else:
+            selected = self._lineRanges['toolpath'].segments(lineno)
+            if isinstance(selected, slice):
+                selected = np.arange(selected.start, selected.stop)
+            points = self.programSummary.toolpath.points
+            # Same placement as the preview display list
+            coords = np.empty((2 * len(selected), 3), dtype=np.float64)
+            coords[0::2] = points[selected]
+            coords[1::2] = points[selected + 1]
+            coords = (coords + np.asarray(self._streamOffset)) * CANON_UNITS_PER_MM
+            if len(coords):
+                GL.glPushClientAttrib(GL.GL_CLIENT_VERTEX_ARRAY_BIT)
+                GL.glEnableClientState(GL.GL_VERTEX_ARRAY)
+                GL.glVertexPointer(3, GL.GL_DOUBLE, 0, coords)
+                GL.glDrawArrays(GL.GL_LINES, 0, len(coords))
+                GL.glPopClientAttrib()
+        GL.glLineWidth(1)
+        if not len(coords):
+            return 0.0, 0.0, 0.0
+        return tuple(coords.mean(axis=0).tolist())
+
+    def pickRay(self, x, y):
+        """
+        Ray (origin, direction) in drawing units through widget position
+        x, y, from the matrices of the last frame; None before the first frame.
+        """
+        if self._projection is None or self._modelview is None or not self.width() or not self.height():
+            return None
+        ndc_x = 2.0 * x / self.width() - 1.0
+        ndc_y = 1.0 - 2.0 * y / self.height()
+        # GL matrices read back column-major: row vectors times modelview, projection
+        try:
+            inverse = np.linalg.inv(np.asarray(self._modelview) @ np.asarray(self._projection))
+        except np.linalg.LinAlgError:
+            return None
+        near = np.array([ndc_x, ndc_y, -1.0, 1.0]) @ inverse
+        far = np.array([ndc_x, ndc_y, 1.0, 1.0]) @ inverse
+        near, far = near[:3] / near[3], far[:3] / far[3]
+        return near, far - near
+
+    def select(self, x, y):
+        """
+        Picks the program line nearest to widget position x, y and selects it
+        for every view with 'gcode-line-selected'.
+        """
+        if self._segmentIndex is None:
+            if self.canon is not None:
+                super(TouchGCodeGraphics, self).select(x, y)
+            return
+        ray = self.pickRay(x, y)
+        size = self.pixelSize()
+        if ray is None or size is None:
+            return
+        origin, direction = ray
+        radius = PICK_RADIUS * size
+        if self.canon is None:
+            # Preview toolpath: mm, drawn shifted by the work offsets
+            origin = origin / CANON_UNITS_PER_MM - np.asarray(self._streamOffset)
+            direction = direction / CANON_UNITS_PER_MM
+            radius /= CANON_UNITS_PER_MM
+        hit = self._segmentIndex.pick(origin, direction, radius)
+        if hit is None:
+            return
+        LOG.debug('Picked line {} (segment {})'.format(*hit))
+        STATUS.emit('gcode-line-selected', hit[0])
+
+    def pixelSize(self):
+        """
+        Size in canon units (inches) of one pixel at the view's focus, from
+        the projection of the last frame; None before the first frame.
+        """
+        p = self._projection
+        if p is None or not self.height():
+            return None
+        if p[3][3] == 1.0:
+            # Orthographic: units per pixel from the x scale
+            scale = p[0][0] * self.width() / 2.0
+        else:
+            scale = p[1][1] * self.height() / (2.0 * max(self.distance, 1e-6))
+        return 1.0 / scale if scale > 0 else None
+
+    def selectDetailLevel(self):
+        """
+        Picks the coarsest detail level that stays within LOD_PIXEL_ERROR
+        pixels; the program display list is rebuilt when the level changes.
+        """
+        if not self._lod:
+            return
+        size = self.pixelSize()
+        if size is None:
+            return
+        # Lists with fewer levels use their coarsest one (segments_at clamps)
+        level = max(lod.level_for(LOD_PIXEL_ERROR * size) for lod in self._lod.values())
+        if level != self._lodLevel:
+            self._lodLevel = level
+            for name in ('program_rapids', 'program_norapids'):
+                self.stale_dlist(name)
+
+    def make_main_list(self, *args, **kwargs):
+        if self.canon is None and self._entry is not None:
+            self.makeStreamList(args[0])
+            return
+        # Compile the program display list from the current detail level;
+        # the canon keeps its full lists for highlighting and picking.
+        canon = self.canon
+        full = {name: getattr(canon, name) for name in self._lod}
+        try:
+            for name, lod in self._lod.items():
+                setattr(canon, name, lod.segments_at(self._lodLevel))
+            return super(TouchGCodeGraphics, self).make_main_list(*args, **kwargs)
+        finally:
+            for name, segments in full.items():
+                setattr(canon, name, segments)
+
+    def applyPendingView(self):
+        """
+        Applies the gesture and wheel input collected since the last frame
+        and schedules one repaint.  Returns False if nothing changed.
+        """
+        changed = False
+        if self._pendingRotatePos is not None:
+            pos, self._pendingRotatePos = self._pendingRotatePos, None
+            # Simulate right-mouse drag: call set_prime() and rotateOrTranslate() with the new position.
+            self.set_prime(pos.x(), pos.y())
+            self.rotateOrTranslate(pos.x(), pos.y())
+            changed = True
+        # The base setters normalise the angle and emit zRotationChanged
+        if self._pendingZoom is not None:
+            zoom, self._pendingZoom = self._pendingZoom, None
+            self.setZoom(zoom * 100)
+            changed = True
+        if self._pendingZRot is not None:
+            zrot, self._pendingZRot = self._pendingZRot, None
+            self.setZRotation(zrot)
+            changed = True
+        steps, self._pendingWheel = self._pendingWheel, 0
+        for _ in range(abs(steps)):
+            if steps > 0:
+                self.zoomin()
+            else:
+                self.zoomout()
+        if changed or steps:
+            self.update()
+            return True
+        return False
+
+    def makeStreamList(self, n):
+        """
+        Compiles the progressive preview into display list n, in canon
+        units and shifted by the active work offsets like the canon.
+        """
+        offset = [0.0, 0.0, 0.0]
+        stat = getattr(self, 'stat', None)
+        if stat is not None:
+            to_mm = 1.0 if INFO.MACHINE_IS_METRIC else 25.4
+            offset = [(stat.g5x_offset[i] + stat.g92_offset[i]) * to_mm for i in range(3)]
+        self._streamOffset = tuple(offset)
+        GL.glNewList(n, GL.GL_COMPILE)
+        GL.glPushMatrix()
+        GL.glScaled(CANON_UNITS_PER_MM, CANON_UNITS_PER_MM, CANON_UNITS_PER_MM)
+        GL.glTranslated(*offset)
+        self._streamPlot.draw()
+        GL.glPopMatrix()
+        GL.glEndList()
+
+    def startProgressiveLoad(self, fname):
+        """
+        Shows fname from the shared program store; a program no other view
+        holds is parsed in the background and drawn chunk by chunk.
+        """
+        entry = self.acquireProgram(fname)
+        self._streamPlot.set_toolpath(None)
+        self.programSummary = None
+        self.runTime = None
+        self._lod = {}
+        self._segmentIndex = None
+        self._lineRanges = {}
+        self.canon = None
+        self._current_file = fname
+        self.stale_dlist('program_rapids')
+        self.stale_dlist('program_norapids')
+        if entry.unsupported is not None:
+            self.loadInterpreted(fname, *entry.unsupported)
+            return
+        if entry.canon is not None:
+            # Interpreted by a view that does not load progressively
+            self.loadProgram(fname)
+            return
+        if entry.summary is not None:
+            self._loadProgress.hide()
+            self.showPreview(entry.summary, entry.run_time)
+            return
+        entry.chunk.connect(self.onStreamChunk)
+        entry.progress.connect(self.onStreamProgress)
+        entry.finished.connect(self.onStreamFinished)
+        entry.failed.connect(self.onStreamFailed)
+        entry.inexact.connect(self.onStreamInexact)
+        # Another view may have started this load already
+        self._loadProgress.setValue(int(entry.fraction * 100))
+        self._loadProgress.show()
+        self.updateStreamPreview()
+        self.update()
+
+    def analysisCache(self):
+        """
+        The analysis cache next to the INI file.
+        """
+        if self._cache is None:
+            ini = os.environ.get('INI_FILE_NAME', '')
+            self._cache = shared_cache(os.path.join(os.path.dirname(ini), DIRECTORY_NAME))
+        return self._cache
+
+    def acquireProgram(self, fname, load=True):
+        """
+        Holds fname in the program store in place of the program shown so
+        far, and returns its entry.  load is as for ProgramStore.acquire().
+        """
+        # Acquired before the old one is released, so reloading the same
+        # program keeps its entry
+        entry = program_store().acquire(fname, MachineLimits.from_ini(INFO.INI), self.analysisCache(),
+                                        'preview.{}.json'.format(preview_key()), load, canon_key())
+        self.releaseProgram()
+        self._entry = entry
+        return entry
+
+    def releaseProgram(self):
+        entry, self._entry = self._entry, None
+        if entry is None:
+            return
+        for signal, slot in ((entry.chunk, self.onStreamChunk), (entry.progress, self.onStreamProgress),
+                             (entry.finished, self.onStreamFinished), (entry.failed, self.onStreamFailed),
+                             (entry.inexact, self.onStreamInexact)):
+            try:
+                signal.disconnect(slot)
+            except TypeError:
+                pass
+        self._streamTimer.stop()
+        program_store().release(entry)
+
+    def resizeEvent(self, event):
+        super(TouchGCodeGraphics, self).resizeEvent(event)
+        self._loadProgress.setGeometry(10, self.height() - 30, max(self.width() - 20, 50), 20)
+
+    def onStreamChunk(self, part):
+        if self.sender() is not self._entry:
+            return
+        if self._streamPlot.toolpath is None:
+            # Show the start of the program at once
+            self.updateStreamPreview()
+        elif not self._streamTimer.isActive():
+            self._streamTimer.start(STREAM_REDRAW_MS)
+
+    def updateStreamPreview(self):
+        toolpath = self._entry.toolpath() if self._entry is not None else None
+        if toolpath is None or toolpath is self._streamPlot.toolpath:
+            return
+        self._streamPlot.set_toolpath(toolpath)
+        self.stale_dlist('program_rapids')
+        self.stale_dlist('program_norapids')
+        self.update()
+
+    def onStreamProgress(self, fraction):
+        if self.sender() is self._entry:
+            self._loadProgress.setValue(int(fraction * 100))
+
+    def onStreamFinished(self, summary, run_time):
+        if self.sender() is not self._entry:
+            return
+        self._streamTimer.stop()
+        self._loadProgress.hide()
+        self.showPreview(summary, run_time)
+
+    def showPreview(self, summary, run_time):
+        self.programSummary = summary
+        self.runTime = run_time
+        self.updateStreamPreview()
+        self.buildSegmentIndex()
+        self.buildLineRanges()
+        self.gcode_properties = toolpath_properties(summary, run_time)
+        STATUS.emit('graphics-gcode-properties', self.gcode_properties)
+        self.set_current_view()
+
+    def onStreamFailed(self, message):
+        if self.sender() is not self._entry:
+            return
+        self._loadProgress.hide()
+        LOG.error('Error loading file {}: {}'.format(self._current_file, message))
+
+    def onStreamInexact(self, lineno, word):
+        if self.sender() is not self._entry:
+            return
+        self._loadProgress.hide()
+        self.loadInterpreted(self._current_file, lineno, word)
+
+    def loadInterpreted(self, fname, lineno, word):
+        """
+        Drops the progressive preview of fname, which uses word on line
+        lineno, and loads it through the interpreter like a normal load;
+        the first view to get here interprets it for all of them.
+        """
+        LOG.info('{} line {}: {} is not handled by the preview parser, loading through the interpreter'.format(
+            fname, lineno, word))
+        self._streamPlot.set_toolpath(None)
+        self.loadProgram(fname)
+
+    def getProgressiveLoad(self):
+        return self._progressive
+
+    def setProgressiveLoad(self, state):
+        self._progressive = bool(state)
+
+    def resetProgressiveLoad(self):
+        self._progressive = False
+
+    progressiveLoad = pyqtProperty(bool, getProgressiveLoad, setProgressiveLoad, resetProgressiveLoad)
+
+    def getMaxFps(self):
+        return self._maxFps
+
+    def setMaxFps(self, fps):
+        self._maxFps = max(int(fps), 1)
+        self.renderScheduler.fps = self._maxFps
+
+    def resetMaxFps(self):
+        self.setMaxFps(DEFAULT_FPS)
+
+    maxFps = pyqtProperty(int, getMaxFps, setMaxFps, resetMaxFps)
+
     def event(self, event):
         # Intercept gesture events.
         if event.type() == QEvent.Gesture:
@@ -82,12 +675,12 @@ class TouchGCodeGraphics(Lcnc_3dGraphics, _HalWidgetBase):
             self._initialZoom = self.distance    # store current zoom level
             self._initialZRot = self.zRot         # store current Z-rotation
         elif gesture.state() == Qt.GestureUpdated:
-            # Use totalScaleFactor for cumulative zoom change.
-            newZoom = self._initialZoom / gesture.totalScaleFactor()
-            self.setZoom(newZoom * 100)
+            # Use totalScaleFactor for cumulative zoom change; only the latest
+            # values matter, they are applied with the next frame.
+            self._pendingZoom = self._initialZoom / gesture.totalScaleFactor()
             # Update rotation around Z-axis.
-            newZRot = self._initialZRot + int(gesture.totalRotationAngle() * 16)
-            self.setZRotation(newZRot)
+            self._pendingZRot = self._initialZRot + int(gesture.totalRotationAngle() * 16)
+            self.renderScheduler.request()
 
     def handleRotateGesture(self, gesture):
         """
@@ -102,10 +695,10 @@ class TouchGCodeGraphics(Lcnc_3dGraphics, _HalWidgetBase):
             # Update simulated position using the gesture's delta.
             delta = gesture.delta()  # incremental QPointF movement
             self._simulatedRotatePos += delta
-            # Simulate right-mouse drag: call set_prime() and rotateOrTranslate() with the new position.
-            self.set_prime(self._simulatedRotatePos.x(), self._simulatedRotatePos.y())
-            self.rotateOrTranslate(self._simulatedRotatePos.x(), self._simulatedRotatePos.y())
-            self.updateGL()
+            # The drag is relative to the last applied position, so moving
+            # straight to the latest one covers all updates of this frame.
+            self._pendingRotatePos = QPointF(self._simulatedRotatePos)
+            self.renderScheduler.request()
 
     def mouseDoubleClickEvent(self, event):
         """
@@ -118,18 +711,115 @@ class TouchGCodeGraphics(Lcnc_3dGraphics, _HalWidgetBase):
     def wheelEvent(self, event):
         """
         Use the mouse wheel to zoom in or out (basic mode 0 functionality).
+        Steps are summed and applied with the next frame.
         """
         a = event.angleDelta().y() / 200
-        if a < 0:
-            self.zoomout()
-        else:
-            self.zoomin()
+        self._pendingWheel += -1 if a < 0 else 1
+        self.renderScheduler.request()
         event.accept()
 
+    def poll(self):
+        if not self.isVisible():
+            # showEvent() starts polling again
+            self.timer.stop()
+            return False
+        self._deferUpdate = True
+        try:
+            result = super(TouchGCodeGraphics, self).poll()
+        finally:
+            self._deferUpdate = False
+        self.logLivePosition()
+        now = time.monotonic()
+        fingerprint = self.pollFingerprint()
+        if fingerprint != self._fingerprint:
+            self._fingerprint = fingerprint
+            self._lastChange = now
+            self.update()
+        stat = getattr(self, 'stat', None)
+        moving = stat is not None and (stat.current_vel > 0 or stat.interp_state != linuxcnc.INTERP_IDLE)
+        fast = moving or now - self._lastChange < IDLE_DELAY
+        interval = INFO.GRAPHICS_CYCLE_TIME if fast else max(IDLE_POLL_MS, INFO.GRAPHICS_CYCLE_TIME)
+        if self.timer.interval() != interval:
+            self.timer.setInterval(interval)
+        return result
+
+    def attachStatusService(self, service):
+        """
+        Lets a StatusService wake the poll up when the machine changes, so
+        polling can stay slow while idle without lagging behind.
+        """
+        service.changed.connect(self.onStatusChanged)
+
+    def onStatusChanged(self, changes):
+        if not self.isVisible() or not any(field in changes for field in WAKE_FIELDS):
+            return
+        self._lastChange = time.monotonic()
+        timer = getattr(self, 'timer', None)
+        if timer is not None and timer.interval() != INFO.GRAPHICS_CYCLE_TIME:
+            timer.setInterval(INFO.GRAPHICS_CYCLE_TIME)
+            self.poll()
+
+    def pollFingerprint(self):
+        """
+        The polled state the backplot depends on.
+        """
+        stat = getattr(self, 'stat', None)
+        if stat is None:
+            return None
+        return (stat.actual_position, stat.joint_actual_position, stat.g5x_offset, stat.g92_offset,
+                stat.tool_offset, stat.tool_in_spindle, stat.homed, stat.limit, stat.motion_mode,
+                stat.rotation_xy, getattr(self, 'highlight_line', None), len(self.liveTrail),
+                self.liveTrail.merged)
+
+    def update(self, *args):
+        if self._deferUpdate:
+            return
+        super(TouchGCodeGraphics, self).update(*args)
+
+    def showEvent(self, event):
+        super(TouchGCodeGraphics, self).showEvent(event)
+        timer = getattr(self, 'timer', None)
+        if timer is not None and not timer.isActive():
+            # Catch up at once, then at the rate poll() picks
+            self._lastChange = time.monotonic()
+            timer.start(INFO.GRAPHICS_CYCLE_TIME)
+
+    def hideEvent(self, event):
+        super(TouchGCodeGraphics, self).hideEvent(event)
+        timer = getattr(self, 'timer', None)
+        if timer is not None:
+            timer.stop()
+
+    def logLivePosition(self):
+        """
+        Adds the current tool position to the live plot.
+        """
+        stat = getattr(self, 'stat', None)
+        if stat is None:
+            return
+        scale = 1 / 25.4 if INFO.MACHINE_IS_METRIC else 1.0
+        pos = [(stat.actual_position[i] - stat.tool_offset[i]) * scale for i in range(3)]
+        key = LIVE_PLOT_COLORS.get(stat.motion_type, 'backplotjog')
+        color = self._liveColors.get(key)
+        if color is None:
+            rgb = self.colors.get(key, (1.0, 1.0, 1.0))
+            color = self._liveColors[key] = bytes(int(c * 255) for c in rgb[:3]) + b'\xff'
+        if not self.liveTrail.append(pos, np.frombuffer(color, dtype=np.uint8)):
+            return
+        # The base class' unbounded logger only keeps the latest points
+        logger_ = getattr(self, 'logger', None)
+        if logger_ is not None and len(self.liveTrail) > 1:
+            logger_.clear()
+
+    def clear_live_plotter(self):
+        self.liveTrail.clear()
+        super(TouchGCodeGraphics, self).clear_live_plotter()
+
     # --- File Loading and Status Signal Functions (kept intact) ---
     def addTimer(self):
         self.timer = QTimer()
         self.timer.timeout.connect(self.poll)
+        # poll() slows the timer down when idle and stops it while hidden
         self.timer.start(INFO.GRAPHICS_CYCLE_TIME)
 
     def _hal_init(self):
@@ -143,6 +833,9 @@ class TouchGCodeGraphics(Lcnc_3dGraphics, _HalWidgetBase):
                                                 lambda w, l: self.highlight_graphics(l))
 
     def _hal_cleanup(self):
+        self.renderScheduler.stop()
+        self.releaseProgram()
+        LOG.debug('{} render stats: {}'.format(self.HAL_NAME_, self.renderScheduler.stats()))
         if self.PREFS_:
             v, z, x, y, lat, lon = self.getRecordedViewSettings()
             LOG.debug('Saving {} data to file.'.format(self.HAL_NAME_))
@@ -156,16 +849,70 @@ class TouchGCodeGraphics(Lcnc_3dGraphics, _HalWidgetBase):
     def load_program(self, g, fname):
         LOG.debug('Loading display from file: {}'.format(fname))
         self._reload_filename = fname
-        self.load(fname)
+        if self._progressive:
+            self.startProgressiveLoad(fname)
+            return
+        self.loadProgram(fname)
+
+    def loadProgram(self, fname):
+        """
+        Loads fname through the interpreter, unless another view holding it
+        in the program store interpreted it already or the analysis cache
+        has what the interpreter produced for it before.
+        """
+        key = canon_key()
+        cache = self.analysisCache()
+        entry = self.acquireProgram(fname, load=False)
+        self._pendingCanon = entry.canon
+        if self._pendingCanon is None:
+            # Identity lookup only: a touched file is interpreted and stored again
+            self._pendingCanon = entry.canon = load_canon(cache, fname, key, rehash=False)
+        self._loadedCanon = None
+        try:
+            self.load(fname)
+        finally:
+            self._pendingCanon = None
+        snapshot, self._loadedCanon = self._loadedCanon, None
+        if snapshot is not None:
+            entry.canon = snapshot
+            # Hashing and writing a large program takes a while; not here
+            threading.Thread(target=store_canon, args=(cache, fname, key, snapshot),
+                             name='preview-store', daemon=True).start()
+        self.buildDetailLevels()
+        self.buildSegmentIndex()
+        self.buildLineRanges()
         STATUS.emit('graphics-gcode-properties', self.gcode_properties)
         self.set_current_view()
 
+    def load_preview(self, f, canon, *args):
+        """
+        Runs the interpreter for load() and keeps what it produced, or gives
+        canon the interpreted preview being restored instead.
+        """
+        snapshot, self._pendingCanon = self._pendingCanon, None
+        if snapshot is None:
+            result, seq = super(TouchGCodeGraphics, self).load_preview(f, canon, *args)
+            if result <= gcode.MIN_ERROR:
+                self._loadedCanon = CanonSnapshot.from_canon(canon)
+            return result, seq
+        LOG.debug('Preview of {} restored without the interpreter: {}'.format(f, snapshot))
+        self.set_canon(canon)
+        snapshot.apply(canon)
+        canon.calc_extents()
+        for name in ('program_rapids', 'program_norapids', 'select_rapids', 'select_norapids'):
+            self.stale_dlist(name)
+        # INTERP_OK, as from a clean interpreter run
+        return 0, 0
+
     def reloadfile(self, w):
         LOG.debug('Reloading display: {}'.format(self._reload_filename))
+        if self._progressive:
+            self.clear_live_plotter()
+            self.startProgressiveLoad(self._reload_filename)
+            return
         try:
-            self.load(self._reload_filename)
+            self.loadProgram(self._reload_filename)
             self.clear_live_plotter()
-            STATUS.emit('graphics-gcode-properties', self.gcode_properties)
         except Exception as e:
             LOG.error('Error reloading file {}: {}'.format(self._reload_filename, e))
             pass
@@ -213,6 +960,12 @@ class TouchGCodeGraphics(Lcnc_3dGraphics, _HalWidgetBase):
     def highlight_graphics(self, line):
         if self._current_file is None:
             return
+        if self.canon is None and not self._lineRanges:
+            # Progressive preview still loading: nothing to highlight from yet
+            self.highlight_line = line
+            STATUS.emit('graphics-line-selected', line)
+            return
+        # Only the highlight display list is recompiled
         self.set_highlight_line(line)
         STATUS.emit('graphics-line-selected', line)
 